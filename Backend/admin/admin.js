@@ -45,6 +45,7 @@ function init() {
     if (token) {
         showAdminDashboard();
         loadCurrentUser();
+        startIncidentFeed();
         loadDashboardStats();
         loadIncidents();
     } else {
@@ -56,7 +57,7 @@ function init() {
     logoutBtn.addEventListener('click', handleLogout);
     logoutDropdownBtn.addEventListener('click', handleLogout);
     incidentSearch.addEventListener('input', filterIncidents);
-    statusFilter.addEventListener('change', filterIncidents);
+    statusFilter.addEventListener('change', () => loadIncidents());
     userSearch.addEventListener('input', filterUsers);
     generateReportBtn.addEventListener('click', generateReport);
     exportReportBtn.addEventListener('click', exportReportToCSV);
@@ -248,6 +249,7 @@ async function handleLogin() {
         // Show the admin dashboard and load data
         showAdminDashboard();
         loadCurrentUser();
+        startIncidentFeed();
         loadDashboardStats();
         loadIncidents();
         
@@ -262,6 +264,7 @@ async function handleLogin() {
 }
 // Handle logout
 function handleLogout() {
+    stopIncidentFeed();
     token = '';
     currentUserData = null;
     localStorage.removeItem('adminToken');
@@ -283,9 +286,9 @@ function showAdminDashboard() {
     console.log("Admin dashboard shown");
 }
 
-// Load dashboard statistics
-async function loadDashboardStats() {
-    dashboardStats.innerHTML = `
+// Load dashboard statistics (quietly, without the spinner, for live refreshes)
+async function loadDashboardStats(quiet = false) {
+    if (!quiet) dashboardStats.innerHTML = `
         <div class="text-center py-5">
             <div class="spinner-border text-primary" role="status">
                 <span class="visually-hidden">Loading...</span>
@@ -316,19 +319,38 @@ async function loadDashboardStats() {
         dashboardStats.innerHTML = `<div class="alert alert-danger">${error.message}</div>`;
     }
 }
-// Load all incidents with loading indicator
-async function loadIncidents() {
-    incidentsList.innerHTML = `
-        <div class="text-center p-4">
-            <div class="spinner-border" role="status">
-                <span class="visually-hidden">Loading...</span>
+// Load incidents page by page with loading indicator; the status filter
+// is applied by the server, so every page holds matching incidents only
+let loadedIncidents = [];
+let incidentsCursor = null;
+let incidentsTotal = null;
+let incidentsRequest = 0;
+
+async function loadIncidents(append = false) {
+    const request = ++incidentsRequest;
+    if (!append) {
+        loadedIncidents = [];
+        incidentsCursor = null;
+        incidentsList.innerHTML = `
+            <div class="text-center p-4">
+                <div class="spinner-border" role="status">
+                    <span class="visually-hidden">Loading...</span>
+                </div>
+                <p class="mt-2">Loading incidents...</p>
             </div>
-            <p class="mt-2">Loading incidents...</p>
-        </div>
-    `;
+        `;
+    }
     
     try {
-        const response = await fetch(`${API_URL}/admin/incidents`, {
+        let url = `${API_URL}/admin/incidents?limit=100`;
+        if (statusFilter.value !== 'all') {
+            url += `&status=${encodeURIComponent(statusFilter.value)}`;
+        }
+        if (append && incidentsCursor) {
+            url += `&cursor=${encodeURIComponent(incidentsCursor)}`;
+        }
+        
+        const response = await fetch(url, {
             headers: {
                 'Authorization': `Bearer ${token}`
             }
@@ -342,10 +364,22 @@ async function loadIncidents() {
             throw new Error('Failed to load incidents');
         }
         
-        const incidents = await response.json();
-        displayIncidents(incidents);
+        const page = await response.json();
+        if (request !== incidentsRequest) {
+            return; // The filter changed while this page was loading
+        }
+        if (page.approximate_total !== null) {
+            incidentsTotal = page.approximate_total;
+        }
+        loadedIncidents = loadedIncidents.concat(page.items);
+        incidentsCursor = page.next_cursor;
+        displayIncidents(loadedIncidents);
+        filterIncidents();
         
     } catch (error) {
+        if (request !== incidentsRequest) {
+            return;
+        }
         console.error('Error loading incidents:', error);
         incidentsList.innerHTML = `<div class="alert alert-danger">${error.message}</div>`;
     }
@@ -386,6 +420,10 @@ function displayIncidents(incidents) {
                 </tbody>
             </table>
         </div>
+        <div class="d-flex justify-content-between align-items-center">
+            <small class="text-muted">Showing ${incidents.length}${incidentsTotal !== null ? ` of ~${incidentsTotal}` : ''}</small>
+            ${incidentsCursor ? '<button class="btn btn-sm btn-outline-primary" id="loadMoreIncidentsBtn">Load more</button>' : ''}
+        </div>
     `;
     
     incidentsList.innerHTML = html;
@@ -397,11 +435,21 @@ function displayIncidents(incidents) {
             showIncidentDetails(incidentId);
         });
     });
+    
+    const loadMoreBtn = document.getElementById('loadMoreIncidentsBtn');
+    if (loadMoreBtn) {
+        loadMoreBtn.addEventListener('click', () => loadIncidents(true));
+    }
 }
 // Get media icons for incidents - with safety checks
 function getMediaIcons(incident) {
     let icons = '';
     
+    // List thumbnail, with the blur placeholder painted underneath until it loads
+    if (incident.media_variants) {
+        icons += `<img src="${API_URL}${incident.media_variants.thumb}" loading="lazy" width="48" height="48" class="rounded me-2" alt="" style="object-fit: cover; background: url('${API_URL}${incident.media_variants.blur}') center / cover;">`;
+    }
+    
     if (incident.media_url) {
         icons += '<i class="fas fa-image text-primary me-2" title="Has image"></i>';
     }
@@ -448,6 +496,11 @@ async function showIncidentDetails(incidentId) {
         }
         
         const incident = await response.json();
+        // Signed links load without an Authorization header and need no database lookup
+        const mediaSrc = incident.media_signed_url ? `${API_URL}${incident.media_signed_url}` : `${API_URL}/admin/incidents/file/${incident.id}`;
+        const previewSrc = incident.media_variants ? `${API_URL}${incident.media_variants.preview}` : mediaSrc;
+        const videoSrc = incident.video_signed_url ? `${API_URL}${incident.video_signed_url}` : `${API_URL}/admin/incidents/video/${incident.id}`;
+        const videoStream = incident.video_stream && incident.video_stream.status === 'ready' ? incident.video_stream : null;
         
         // Update modal content with incident details, with checks for optional fields
         modalBody.innerHTML = `
@@ -493,8 +546,8 @@ async function showIncidentDetails(incidentId) {
                             <!-- Image evidence -->
                             ${incident.media_url ? `
                                 <div class="text-center mb-3">
-                                    <img src="${API_URL}/admin/incidents/file/${incident.id}" class="img-fluid img-thumbnail" alt="Evidence">
-                                    <a href="${API_URL}/admin/incidents/file/${incident.id}" target="_blank" class="btn btn-sm btn-outline-secondary mt-2 d-block">
+                                    <img src="${previewSrc}" class="img-fluid img-thumbnail" alt="Evidence">
+                                    <a href="${mediaSrc}" target="_blank" class="btn btn-sm btn-outline-secondary mt-2 d-block">
                                         View Original
                                     </a>
                                 </div>
@@ -503,11 +556,11 @@ async function showIncidentDetails(incidentId) {
                             <!-- Video evidence - only if video_url exists -->
                             ${incident.hasOwnProperty('video_url') && incident.video_url ? `
                                 <div class="text-center mb-3">
-                                    <video width="100%" controls>
-                                        <source src="${API_URL}/admin/incidents/video/${incident.id}" type="video/mp4">
+                                    <video id="incidentVideo" width="100%" controls preload="metadata"
+                                        ${videoStream ? `poster="${API_URL}${videoStream.poster_url}"` : ''}>
                                         Your browser does not support the video tag.
                                     </video>
-                                    <a href="${API_URL}/admin/incidents/video/${incident.id}" target="_blank" class="btn btn-sm btn-outline-secondary mt-2 d-block">
+                                    <a href="${videoSrc}" target="_blank" class="btn btn-sm btn-outline-secondary mt-2 d-block">
                                         Download Video
                                     </a>
                                 </div>
@@ -551,11 +604,42 @@ async function showIncidentDetails(incidentId) {
             </div>
         `;
         
+        const videoElement = document.getElementById('incidentVideo');
+        if (videoElement) {
+            playIncidentVideo(videoElement, videoStream, videoSrc);
+        }
     } catch (error) {
         console.error('Error showing incident details:', error);
         modalBody.innerHTML = `<div class="alert alert-danger">${error.message}</div>`;
     }
 }
+// Play the HLS version of a video when it is ready: the first short segment
+// starts playback instead of the whole upload. Safari plays HLS natively,
+// other browsers use hls.js; anything else falls back to the original file.
+function playIncidentVideo(videoElement, videoStream, fallbackSrc) {
+    if (videoStream) {
+        const hlsSrc = `${API_URL}${videoStream.hls_url}`;
+        if (videoElement.canPlayType('application/vnd.apple.mpegurl')) {
+            videoElement.src = hlsSrc;
+            return;
+        }
+        if (window.Hls && Hls.isSupported()) {
+            const hls = new Hls();
+            hls.on(Hls.Events.ERROR, (event, data) => {
+                if (data.fatal) {
+                    hls.destroy();
+                    videoElement.src = fallbackSrc;
+                }
+            });
+            hls.loadSource(hlsSrc);
+            hls.attachMedia(videoElement);
+            document.getElementById('incidentModal').addEventListener('hidden.bs.modal', () => hls.destroy(), { once: true });
+            return;
+        }
+    }
+    videoElement.src = fallbackSrc;
+}
+
 // Load all users
 async function loadUsers() {
     usersList.innerHTML = `
@@ -920,7 +1004,8 @@ async function updateIncidentStatus(incidentId, status) {
         // Refresh incident details
         showIncidentDetails(incidentId);
         
-        // Also refresh the incidents list if it's visible
+        // Also refresh the incidents list if it's visible; the live feed
+        // updates it too, but may be disconnected or reconnecting
         if (document.querySelector('.nav-link[href="#incidents"]').classList.contains('active')) {
             loadIncidents();
         }
@@ -1096,7 +1181,8 @@ async function saveUser() {
     }
 }
 
-// Filter incidents based on search and status filter
+// Filter the loaded incidents by search term. The server already applied the
+// status filter; it is checked again for rows the live feed has changed.
 function filterIncidents() {
     const searchTerm = incidentSearch.value.toLowerCase();
     const statusValue = statusFilter.value;
@@ -1240,5 +1326,121 @@ function displayReport(reportData) {
     
     reportIncidentsList.innerHTML = tableHtml;
 }
+// Live feed: new incidents and status changes pushed from /admin/events
+// (Server-Sent Events, read with fetch so the token goes in a header)
+let feedController = null;
+let lastEventId = null;
+let statsRefreshTimer = null;
+
+async function startIncidentFeed() {
+    stopIncidentFeed();
+    const controller = new AbortController();
+    feedController = controller;
+    let retryDelay = 1000;
+    while (feedController === controller) {
+        try {
+            const headers = { 'Authorization': `Bearer ${token}` };
+            if (lastEventId) {
+                headers['Last-Event-ID'] = lastEventId;
+            }
+            const response = await fetch(`${API_URL}/admin/events`, { headers, signal: controller.signal });
+            if (response.status === 401) {
+                handleLogout();
+                return;
+            }
+            if (!response.ok) {
+                throw new Error(`Live feed unavailable (${response.status})`);
+            }
+            retryDelay = 1000;
+            await readEventStream(response.body, handleFeedEvent);
+        } catch (error) {
+            if (controller.signal.aborted) {
+                return;
+            }
+            console.warn('Live feed disconnected:', error);
+        }
+        // Reconnect with backoff; Last-Event-ID resumes where we left off
+        await new Promise(resolve => setTimeout(resolve, retryDelay));
+        retryDelay = Math.min(retryDelay * 2, 30000);
+    }
+}
+
+function stopIncidentFeed() {
+    if (feedController) {
+        feedController.abort();
+        feedController = null;
+    }
+}
+
+async function readEventStream(body, onEvent) {
+    const reader = body.pipeThrough(new TextDecoderStream()).getReader();
+    let buffer = '';
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) {
+            return;
+        }
+        buffer += value;
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const block = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+            const event = { type: 'message', data: '' };
+            for (const line of block.split('\n')) {
+                if (line.startsWith(':')) {
+                    continue; // Keep-alive
+                }
+                const separator = line.indexOf(':');
+                const field = separator === -1 ? line : line.slice(0, separator);
+                const fieldValue = separator === -1 ? '' : line.slice(separator + 1).replace(/^ /, '');
+                if (field === 'id') {
+                    event.id = fieldValue;
+                } else if (field === 'event') {
+                    event.type = fieldValue;
+                } else if (field === 'data') {
+                    event.data += fieldValue;
+                }
+            }
+            if (event.id) {
+                lastEventId = event.id;
+            }
+            onEvent(event);
+        }
+    }
+}
+
+function handleFeedEvent(event) {
+    if (event.type === 'resync') {
+        // Events were missed (slow connection or server restart): reload
+        loadIncidents();
+        scheduleStatsRefresh();
+        return;
+    }
+    if (event.type !== 'incident.created' && event.type !== 'incident.updated') {
+        return;
+    }
+    const incident = JSON.parse(event.data);
+    scheduleStatsRefresh();
+    const index = loadedIncidents.findIndex(item => item.id === incident.id);
+    if (index !== -1) {
+        loadedIncidents[index] = { ...loadedIncidents[index], ...incident };
+    } else if (event.type === 'incident.created' && (statusFilter.value === 'all' || incident.status === statusFilter.value)) {
+        loadedIncidents.unshift(incident);
+        if (incidentsTotal !== null) {
+            incidentsTotal += 1;
+        }
+    } else {
+        return; // Not on a loaded page
+    }
+    displayIncidents(loadedIncidents);
+    filterIncidents();
+}
+
+// Several changes in a row cost one stats request
+function scheduleStatsRefresh() {
+    clearTimeout(statsRefreshTimer);
+    statsRefreshTimer = setTimeout(() => loadDashboardStats(true), 2000);
+}
+
 // Initialize the app when the DOM is loaded
 document.addEventListener('DOMContentLoaded', init);
\ No newline at end of file
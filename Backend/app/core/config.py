@@ -0,0 +1,102 @@
+# app/core/config.py
+import os
+
+# Media upload settings
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", "uploads")
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", 64 * 1024))  # Bytes per disk write
+UPLOAD_WRITE_CONCURRENCY = int(os.getenv("UPLOAD_WRITE_CONCURRENCY", 4))  # Disk writes in flight per request
+MAX_UPLOAD_SIZE = int(os.getenv("MAX_UPLOAD_SIZE", 250 * 1024 * 1024))  # Per file, in bytes
+MAX_FORM_FIELD_SIZE = int(os.getenv("MAX_FORM_FIELD_SIZE", 1024 * 1024))  # Per text field, in bytes
+# Resumable uploads (/incidents/uploads), sent as a series of PUT chunks
+RESUMABLE_MAX_SIZE = int(os.getenv("RESUMABLE_MAX_SIZE", 1024 * 1024 * 1024))  # Per file, in bytes
+UPLOAD_MAX_CHUNK_SIZE = int(os.getenv("UPLOAD_MAX_CHUNK_SIZE", 16 * 1024 * 1024))  # Per PUT, in bytes
+UPLOAD_SESSION_TTL = int(os.getenv("UPLOAD_SESSION_TTL", 24 * 3600))  # Seconds of inactivity before a session is removed
+# Idempotency-Key header on incident creation: retries within the TTL replay the first result
+IDEMPOTENCY_KEY_TTL = int(os.getenv("IDEMPOTENCY_KEY_TTL", 24 * 3600))  # Seconds a key is remembered
+IDEMPOTENCY_LOCK_TIMEOUT = int(os.getenv("IDEMPOTENCY_LOCK_TIMEOUT", 600))  # Seconds before an unfinished request's key can be retried
+# /incidents/sync watermarks trail the database clock by this much, so rows
+# whose transactions commit late are sent again rather than skipped
+SYNC_WATERMARK_LAG = int(os.getenv("SYNC_WATERMARK_LAG", 30))  # Seconds
+INCIDENT_BATCH_MAX_ITEMS = int(os.getenv("INCIDENT_BATCH_MAX_ITEMS", 100))  # Reports per POST /incidents/batch
+# Uploads are staged, hashed, then moved into the content-addressed store.
+# Both live outside UPLOAD_DIR, which is served publicly for legacy files;
+# media is only reachable through signed /media links.
+DATA_DIR = os.getenv("DATA_DIR", "data")
+UPLOAD_STAGING_DIR = os.getenv("UPLOAD_STAGING_DIR", os.path.join(DATA_DIR, "staging"))
+MEDIA_DIR = os.getenv("MEDIA_DIR", os.path.join(DATA_DIR, "media"))  # Same filesystem as staging, so moves are renames
+MEDIA_CACHE_MAX_AGE = int(os.getenv("MEDIA_CACHE_MAX_AGE", 365 * 24 * 3600))  # Seconds; media files never change once written
+# Signed /media links; expiry is rounded to the TTL so links stay cacheable within a window
+MEDIA_URL_TTL = int(os.getenv("MEDIA_URL_TTL", 3600))  # Seconds; links are valid for one to two TTLs
+MEDIA_URL_SECRET = os.getenv("MEDIA_URL_SECRET")  # Set in production; otherwise derived from JWT_SECRET_KEY
+# Image thumbnails/previews, made by the job worker or on first request
+MEDIA_DERIVATIVE_WORKERS = int(os.getenv("MEDIA_DERIVATIVE_WORKERS", 2))  # Concurrent renders per process
+# Video probing and HLS transcoding by the job worker; skipped if ffmpeg/ffprobe are not installed
+FFMPEG_BINARY = os.getenv("FFMPEG_BINARY", "ffmpeg")
+FFPROBE_BINARY = os.getenv("FFPROBE_BINARY", "ffprobe")
+VIDEO_TRANSCODE_WORKERS = int(os.getenv("VIDEO_TRANSCODE_WORKERS", 1))  # Concurrent transcodes per worker process
+VIDEO_TRANSCODE_TIMEOUT = int(os.getenv("VIDEO_TRANSCODE_TIMEOUT", 1800))  # Seconds per video before giving up
+
+# Authentication - verified principals are cached per token for at most this long
+AUTH_CACHE_TTL = int(os.getenv("AUTH_CACHE_TTL", 60))  # Seconds
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", 10000))  # Tokens
+
+# Password hashing - bcrypt runs on its own pool so login storms can't take
+# every request thread. Workers + queue limit should stay well below the
+# Starlette threadpool size (40) to leave room for other requests.
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", min(4, os.cpu_count() or 1)))
+PASSWORD_HASH_QUEUE_LIMIT = int(os.getenv("PASSWORD_HASH_QUEUE_LIMIT", 16))  # Waiting requests before 503
+
+# Admin dashboard statistics are recomputed at most once per TTL per worker
+ADMIN_STATS_TTL = int(os.getenv("ADMIN_STATS_TTL", 30))  # Seconds
+
+# Live admin feed (/admin/events): per-process broadcaster of incident changes
+EVENTS_BUFFER_SIZE = int(os.getenv("EVENTS_BUFFER_SIZE", 1000))  # Recent events kept for Last-Event-ID resume
+EVENTS_QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE_SIZE", 256))  # Unsent events per connection before it must resync
+EVENTS_MAX_SUBSCRIBERS = int(os.getenv("EVENTS_MAX_SUBSCRIBERS", 500))  # Connections per process before 503
+EVENTS_HEARTBEAT = float(os.getenv("EVENTS_HEARTBEAT", 15))  # Seconds between keep-alive comments
+EVENTS_RETRY_MS = int(os.getenv("EVENTS_RETRY_MS", 3000))  # Reconnect delay suggested to clients
+# Changes committed by other processes are picked up from the incidents table;
+# 0 turns the poll off (a single API process sees all its own writes)
+EVENTS_POLL_INTERVAL = float(os.getenv("EVENTS_POLL_INTERVAL", 2.0))  # Seconds between polls
+EVENTS_POLL_BATCH = int(os.getenv("EVENTS_POLL_BATCH", 500))  # Changes per poll beyond which dashboards resync
+
+# Status-change push notifications to reporters. Sent through PUSH_ENDPOINT_URL
+# if set (e.g. `python fake_push.py` locally), else FCM when firebase_admin is
+# installed and credentials are configured, else not at all.
+PUSH_ENDPOINT_URL = os.getenv("PUSH_ENDPOINT_URL")
+FIREBASE_CREDENTIALS = os.getenv("FIREBASE_CREDENTIALS", os.getenv("GOOGLE_APPLICATION_CREDENTIALS"))  # Service account JSON
+PUSH_COALESCE_SECONDS = float(os.getenv("PUSH_COALESCE_SECONDS", 10))  # Updates within this window send one push
+PUSH_BATCH_SIZE = int(os.getenv("PUSH_BATCH_SIZE", 500))  # Messages per provider request (FCM allows 500)
+PUSH_CONCURRENCY = int(os.getenv("PUSH_CONCURRENCY", 4))  # Provider requests in flight per dispatcher
+PUSH_TIMEOUT = float(os.getenv("PUSH_TIMEOUT", 10))  # Seconds per provider request
+PUSH_MAX_ATTEMPTS = int(os.getenv("PUSH_MAX_ATTEMPTS", 5))
+PUSH_RETRY_BASE_DELAY = float(os.getenv("PUSH_RETRY_BASE_DELAY", 30))  # Seconds, doubled per attempt
+
+# Incident map (/admin/map): clusters per geohash cell, sized to the zoom level
+MAP_MAX_CLUSTERS = int(os.getenv("MAP_MAX_CLUSTERS", 2000))  # Per /admin/map/clusters response; coarser cells beyond this
+MAP_TILE_CACHE_SIZE = int(os.getenv("MAP_TILE_CACHE_SIZE", 5000))  # Encoded tiles kept per process
+MAP_TILE_CACHE_TTL = int(os.getenv("MAP_TILE_CACHE_TTL", 300))  # Seconds; changes are picked up on the next read regardless
+
+# Partner webhooks: incident events are written to an outbox in the same
+# commit as the change and delivered by the job worker, in order per subscription
+WEBHOOK_BATCH_SIZE = int(os.getenv("WEBHOOK_BATCH_SIZE", 100))  # Events per POST
+WEBHOOK_CONCURRENCY = int(os.getenv("WEBHOOK_CONCURRENCY", 8))  # Subscriptions delivered to in parallel per worker
+WEBHOOK_TIMEOUT = float(os.getenv("WEBHOOK_TIMEOUT", 10))  # Seconds per request
+WEBHOOK_POOL_SIZE = int(os.getenv("WEBHOOK_POOL_SIZE", 4))  # Idle keep-alive connections kept per endpoint host
+WEBHOOK_MAX_ATTEMPTS = int(os.getenv("WEBHOOK_MAX_ATTEMPTS", 10))  # Then the batch is dead-lettered
+WEBHOOK_RETRY_BASE_DELAY = float(os.getenv("WEBHOOK_RETRY_BASE_DELAY", 5))  # Seconds, doubled per attempt, with full jitter
+WEBHOOK_RETRY_MAX_DELAY = float(os.getenv("WEBHOOK_RETRY_MAX_DELAY", 3600))  # Seconds
+WEBHOOK_GAP_TIMEOUT = float(os.getenv("WEBHOOK_GAP_TIMEOUT", 30))  # Seconds to wait for a missing outbox id to commit
+OUTBOX_RETENTION_HOURS = int(os.getenv("OUTBOX_RETENTION_HOURS", 24))  # Delivered events are pruned after this
+
+# Background jobs. By default every API process also runs a job worker, which
+# shares that process's CPU with requests (transcodes, image renders, webhook
+# and push sends); with several API workers in production, set
+# JOBS_IN_PROCESS=false and run `python -m app.worker` processes instead.
+JOBS_IN_PROCESS = os.getenv("JOBS_IN_PROCESS", "true").lower() in ("1", "true", "yes")
+JOBS_THREADS = int(os.getenv("JOBS_THREADS", 8))  # Threads for plain (sync) handlers, per worker process
+JOBS_POLL_INTERVAL = float(os.getenv("JOBS_POLL_INTERVAL", 1.0))  # Seconds between polls when idle
+JOBS_VISIBILITY_TIMEOUT = int(os.getenv("JOBS_VISIBILITY_TIMEOUT", 300))  # Seconds without a lease renewal before a job is retried
+JOBS_MAX_ATTEMPTS = int(os.getenv("JOBS_MAX_ATTEMPTS", 5))
+JOBS_RETRY_BASE_DELAY = float(os.getenv("JOBS_RETRY_BASE_DELAY", 5))  # Seconds, doubled per attempt
+JOBS_RETENTION_HOURS = int(os.getenv("JOBS_RETENTION_HOURS", 24))  # Succeeded jobs are pruned after this
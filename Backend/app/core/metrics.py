@@ -0,0 +1,45 @@
+# app/core/metrics.py
+import threading
+from collections import deque
+
+
+class LatencyStats:
+    """
+    Running latency statistics for one operation.
+    Percentiles are computed over the most recent `window` samples.
+    """
+
+    def __init__(self, window: int = 1024):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+            self.count += 1
+            self.total += seconds
+            self.max = max(self.max, seconds)
+
+    def average(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            samples = sorted(self._samples)
+            count, total, maximum = self.count, self.total, self.max
+
+        def percentile(p: float) -> float:
+            if not samples:
+                return 0.0
+            return samples[min(len(samples) - 1, int(p * len(samples)))]
+
+        return {
+            "count": count,
+            "avg_ms": round(total / count * 1000, 3) if count else 0.0,
+            "p50_ms": round(percentile(0.50) * 1000, 3),
+            "p95_ms": round(percentile(0.95) * 1000, 3),
+            "max_ms": round(maximum * 1000, 3),
+        }
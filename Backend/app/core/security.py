@@ -1,8 +1,16 @@
 import os
+import asyncio
+import math
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from fastapi import HTTPException, status
 from passlib.context import CryptContext
 from datetime import datetime, timedelta
 from jose import jwt
 import secrets
+from . import config
+from .metrics import LatencyStats
 
 # JWT settings - use environment variables or generate a secure key
 SECRET_KEY = os.getenv("JWT_SECRET_KEY", secrets.token_hex(32))
@@ -11,13 +19,84 @@ ALGORITHM = "HS256"
 # Password hashing context
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# Dedicated bcrypt pool. A slot is taken per hashing call (running or
+# queued); when none are free the caller fails fast with 503 instead of
+# parking yet another request thread behind CPU-bound work.
+_hash_executor = ThreadPoolExecutor(
+    max_workers=config.PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash"
+)
+_hash_slots = threading.BoundedSemaphore(
+    config.PASSWORD_HASH_WORKERS + config.PASSWORD_HASH_QUEUE_LIMIT
+)
+_hash_queue_wait = LatencyStats()
+_hash_latency = LatencyStats()
+_hash_counters = {"in_flight": 0, "rejected": 0}
+_hash_counters_lock = threading.Lock()
+
+def _retry_after_seconds() -> int:
+    """Rough time until the current backlog drains"""
+    backlog = _hash_counters["in_flight"] / config.PASSWORD_HASH_WORKERS
+    return max(1, math.ceil(backlog * _hash_latency.average()))
+
+def _release_hash_slot(_future):
+    with _hash_counters_lock:
+        _hash_counters["in_flight"] -= 1
+    _hash_slots.release()
+
+def _submit_to_hash_pool(fn, *args) -> Future:
+    if not _hash_slots.acquire(blocking=False):
+        with _hash_counters_lock:
+            _hash_counters["rejected"] += 1
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many authentication requests, please retry shortly",
+            headers={"Retry-After": str(_retry_after_seconds())},
+        )
+
+    submitted = time.perf_counter()
+
+    def task():
+        started = time.perf_counter()
+        _hash_queue_wait.observe(started - submitted)
+        try:
+            return fn(*args)
+        finally:
+            _hash_latency.observe(time.perf_counter() - started)
+
+    with _hash_counters_lock:
+        _hash_counters["in_flight"] += 1
+    future = _hash_executor.submit(task)
+    future.add_done_callback(_release_hash_slot)
+    return future
+
 def hash_password(plain_password: str) -> str:
     """Hash a password using bcrypt"""
-    return pwd_context.hash(plain_password)
+    return _submit_to_hash_pool(pwd_context.hash, plain_password).result()
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash"""
-    return pwd_context.verify(plain_password, hashed_password)
+    return _submit_to_hash_pool(pwd_context.verify, plain_password, hashed_password).result()
+
+async def hash_password_async(plain_password: str) -> str:
+    """hash_password for async code; awaits the pool without holding a thread"""
+    return await asyncio.wrap_future(_submit_to_hash_pool(pwd_context.hash, plain_password))
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """verify_password for async code; awaits the pool without holding a thread"""
+    return await asyncio.wrap_future(
+        _submit_to_hash_pool(pwd_context.verify, plain_password, hashed_password)
+    )
+
+def password_hash_stats() -> dict:
+    """Queue wait and hashing latency for the bcrypt pool"""
+    return {
+        "workers": config.PASSWORD_HASH_WORKERS,
+        "queue_limit": config.PASSWORD_HASH_QUEUE_LIMIT,
+        "in_flight": _hash_counters["in_flight"],
+        "rejected": _hash_counters["rejected"],
+        "queue_wait": _hash_queue_wait.snapshot(),
+        "hash_latency": _hash_latency.snapshot(),
+    }
 
 def create_access_token(data: dict, expires_delta: timedelta = None):
     """Create a JWT access token"""
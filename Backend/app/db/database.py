@@ -1,8 +1,14 @@
 # app/db/database.py
 import os
+import time
+from contextlib import asynccontextmanager
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from ..core.metrics import LatencyStats
 
 # Database configuration from environment variables with defaults
 DB_USER = os.getenv("DB_USER", "root")
@@ -11,12 +17,150 @@ DB_HOST = os.getenv("DB_HOST", "127.0.0.1")
 DB_PORT = os.getenv("DB_PORT", "3306")
 DB_NAME = os.getenv("DB_NAME", "infodb")
 
+# Connection pool settings, per worker process
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 10))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 10))  # Seconds to wait for a free connection
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))  # Keep below MySQL's wait_timeout
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+
+# Request queries run on an AsyncEngine (asyncio driver) when enabled,
+# otherwise on the sync engine in the threadpool. Both modes share the
+# same query code so they can be benchmarked against each other.
+DB_ASYNC = os.getenv("DB_ASYNC", "false").lower() in ("1", "true", "yes")
+ASYNC_DB_DRIVER = os.getenv("ASYNC_DB_DRIVER", "aiomysql")  # Or asyncmy
+
 # Construct database URL
 SQLALCHEMY_DATABASE_URL = f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+ASYNC_SQLALCHEMY_DATABASE_URL = f"mysql+{ASYNC_DB_DRIVER}://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how long callers wait for a connection"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkout_wait = LatencyStats()
+        self.checkout_timeouts = 0
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            self.checkout_timeouts += 1
+            raise
+        finally:
+            self.checkout_wait.observe(time.perf_counter() - started)
+
+    def recreate(self):
+        # Keep the statistics when the engine swaps in a fresh pool
+        pool = super().recreate()
+        pool.checkout_wait = self.checkout_wait
+        pool.checkout_timeouts = self.checkout_timeouts
+        return pool
+
+class InstrumentedAsyncQueuePool(InstrumentedQueuePool, AsyncAdaptedQueuePool):
+    """InstrumentedQueuePool for the asyncio engine"""
+
+POOL_OPTIONS = dict(
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
+    pool_recycle=DB_POOL_RECYCLE,
+    pool_pre_ping=DB_POOL_PRE_PING,
+)
 
 # Create engine and session
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+engine = create_engine(SQLALCHEMY_DATABASE_URL, poolclass=InstrumentedQueuePool, **POOL_OPTIONS)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+async_engine = None
+AsyncSessionLocal = None
+if DB_ASYNC:
+    # Imported here so the asyncio driver is only required when enabled
+    from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+    async_engine = create_async_engine(
+        ASYNC_SQLALCHEMY_DATABASE_URL, poolclass=InstrumentedAsyncQueuePool, **POOL_OPTIONS
+    )
+    # Objects are read after the session's greenlet has returned, so they
+    # must not expire (and lazy-load) on commit
+    AsyncSessionLocal = sessionmaker(
+        bind=async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+    )
+
 # Base class for models
-Base = declarative_base()
\ No newline at end of file
+Base = declarative_base()
+
+def get_db():
+    """
+    Plain request-scoped sync Session, for code that must hold a Session
+    directly rather than going through DbSession.run().
+    A Session only checks a connection out of the pool when it first runs a
+    query, and hands it back on commit/rollback/close, so endpoints that
+    return early never hold a connection.
+    """
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+class DbSession:
+    """
+    Request-scoped database handle used by the routers and services.
+
+    Query code is written against a regular Session and passed to run(),
+    which executes it on the async engine without blocking the event loop
+    (DB_ASYNC=true) or on the sync engine in the threadpool.
+    """
+
+    def __init__(self):
+        self.is_async = DB_ASYNC
+        self._session = AsyncSessionLocal() if self.is_async else SessionLocal()
+
+    async def run(self, fn, *args, **kwargs):
+        """Call fn(session, *args, **kwargs) and return its result"""
+        if self.is_async:
+            return await self._session.run_sync(fn, *args, **kwargs)
+        return await run_in_threadpool(fn, self._session, *args, **kwargs)
+
+    async def close(self):
+        if self.is_async:
+            await self._session.close()
+        else:
+            await run_in_threadpool(self._session.close)
+
+@asynccontextmanager
+async def db_session():
+    """DbSession for code that runs outside a request's dependencies"""
+    db = DbSession()
+    try:
+        yield db
+    finally:
+        await db.close()
+
+async def get_db_session():
+    """Request-scoped DbSession dependency shared by every router"""
+    async with db_session() as db:
+        yield db
+
+def pool_stats() -> dict:
+    """Live connection pool statistics for this worker"""
+    pool = async_engine.pool if DB_ASYNC else engine.pool
+    stats = {"pool_class": type(pool).__name__, "async": DB_ASYNC}
+    if isinstance(pool, QueuePool):
+        stats.update({
+            "size": pool.size(),
+            "max_overflow": DB_MAX_OVERFLOW,
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": pool.overflow(),
+            "timeout_seconds": DB_POOL_TIMEOUT,
+            "recycle_seconds": DB_POOL_RECYCLE,
+            "pre_ping": DB_POOL_PRE_PING,
+        })
+    if isinstance(pool, InstrumentedQueuePool):
+        stats["checkout_timeouts"] = pool.checkout_timeouts
+        stats["checkout_wait"] = pool.checkout_wait.snapshot()
+    return stats
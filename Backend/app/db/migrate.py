@@ -0,0 +1,110 @@
+# app/db/migrate.py
+"""
+Versioned schema migrations.
+
+Run ahead of a deploy so web workers never issue DDL at startup:
+
+    python -m app.db.migrate upgrade     # apply pending migrations
+    python -m app.db.migrate status      # list applied and pending versions
+"""
+import argparse
+import importlib
+import pkgutil
+import sys
+from contextlib import contextmanager
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, select
+from sqlalchemy.engine import Engine
+
+from . import migrations
+from .database import engine as default_engine
+
+_metadata = MetaData()
+schema_migrations = Table(
+    "schema_migrations", _metadata,
+    Column("version", Integer, primary_key=True, autoincrement=False),
+    Column("description", String(255)),
+    Column("applied_at", DateTime),
+)
+
+def discover_migrations() -> list:
+    """All migration modules, ordered by VERSION"""
+    modules = [
+        importlib.import_module(f"{migrations.__name__}.{info.name}")
+        for info in pkgutil.iter_modules(migrations.__path__)
+        if info.name.startswith("v")
+    ]
+    modules.sort(key=lambda module: module.VERSION)
+    versions = [module.VERSION for module in modules]
+    if len(versions) != len(set(versions)):
+        raise RuntimeError(f"Duplicate migration versions: {versions}")
+    return modules
+
+def applied_versions(engine: Engine) -> set:
+    with engine.connect() as connection:
+        if not engine.dialect.has_table(connection, schema_migrations.name):
+            return set()
+        return set(connection.execute(select(schema_migrations.c.version)).scalars())
+
+def pending_migrations(engine: Engine = default_engine) -> list:
+    applied = applied_versions(engine)
+    return [module for module in discover_migrations() if module.VERSION not in applied]
+
+@contextmanager
+def _migration_lock(engine: Engine):
+    """Keep two deploy hosts from migrating the same MySQL database at once"""
+    if engine.dialect.name != "mysql":
+        yield
+        return
+    with engine.connect() as connection:
+        if not connection.exec_driver_sql("SELECT GET_LOCK('schema_migrations', 300)").scalar():
+            raise RuntimeError("Timed out waiting for another migration run to finish")
+        try:
+            yield
+        finally:
+            connection.exec_driver_sql("SELECT RELEASE_LOCK('schema_migrations')")
+
+def upgrade(engine: Engine = default_engine, target: int = None) -> list:
+    """Apply pending migrations up to target (default: latest). Returns the versions applied."""
+    applied_now = []
+    with _migration_lock(engine):
+        _metadata.create_all(engine, checkfirst=True)
+        for module in pending_migrations(engine):
+            if target is not None and module.VERSION > target:
+                break
+            # MySQL commits DDL implicitly, so the version row is what
+            # makes a migration count as applied
+            with engine.begin() as connection:
+                module.upgrade(connection)
+                connection.execute(schema_migrations.insert().values(
+                    version=module.VERSION,
+                    description=module.DESCRIPTION,
+                    applied_at=datetime.utcnow(),
+                ))
+            applied_now.append(module.VERSION)
+            print(f"Applied migration {module.VERSION:04d}: {module.DESCRIPTION}")
+    return applied_now
+
+def status(engine: Engine = default_engine):
+    applied = applied_versions(engine)
+    for module in discover_migrations():
+        state = "applied" if module.VERSION in applied else "pending"
+        print(f"{module.VERSION:04d}  {state:8}  {module.DESCRIPTION}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Database schema migrations")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    upgrade_parser = subcommands.add_parser("upgrade", help="Apply pending migrations")
+    upgrade_parser.add_argument("--to", type=int, default=None, help="Stop after this version")
+    subcommands.add_parser("status", help="Show applied and pending migrations")
+    args = parser.parse_args(argv)
+
+    if args.command == "upgrade":
+        if not upgrade(target=args.to):
+            print("Database schema is up to date")
+    else:
+        status()
+
+if __name__ == "__main__":
+    sys.exit(main())
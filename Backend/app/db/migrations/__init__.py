@@ -0,0 +1,8 @@
+# app/db/migrations/__init__.py
+#
+# Each module here is one schema version, named v<NNNN>_<slug>.py and
+# exposing VERSION, DESCRIPTION and upgrade(connection). Migrations are
+# frozen: they describe tables with SQLAlchemy Core as they were at that
+# version instead of importing the current models. Apply them with
+#
+#     python -m app.db.migrate upgrade
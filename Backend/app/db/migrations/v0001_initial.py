@@ -0,0 +1,43 @@
+# app/db/migrations/v0001_initial.py
+from sqlalchemy import (
+    JSON, Boolean, Column, DateTime, Float, ForeignKey, Integer, MetaData, String, Table, Text,
+)
+from sqlalchemy.sql import func
+
+VERSION = 1
+DESCRIPTION = "Users and incidents tables"
+
+metadata = MetaData()
+
+users = Table(
+    "users", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("email", String(255), unique=True, index=True),
+    Column("password", String(255)),
+    Column("is_admin", Boolean, default=False),
+    Column("admin_level", Integer, default=0),
+    Column("created_at", DateTime, default=func.now()),
+)
+
+incidents = Table(
+    "incidents", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("user_id", Integer, ForeignKey("users.id")),
+    Column("title", String(255)),
+    Column("description", Text),
+    Column("latitude", Float),
+    Column("longitude", Float),
+    Column("media_url", String(1024), nullable=True),
+    Column("video_url", String(1024), nullable=True),
+    Column("livestream_url", String(1024), nullable=True),
+    Column("additional_media", JSON, nullable=True),
+    Column("status", String(50), default="submitted"),
+    Column("admin_remarks", Text, nullable=True),
+    Column("created_at", DateTime, default=func.now()),
+    Column("updated_at", DateTime, default=func.now(), onupdate=func.now()),
+)
+
+def upgrade(connection):
+    # Databases created by the old create_all() at startup already have
+    # these tables, so this only creates what is missing.
+    metadata.create_all(connection, checkfirst=True)
@@ -0,0 +1,18 @@
+# app/db/migrations/v0002_incident_indexes.py
+from sqlalchemy import Index, MetaData, Table, inspect
+
+VERSION = 2
+DESCRIPTION = "Composite indexes for incident list, user and report queries"
+
+INDEXES = {
+    "ix_incidents_user_id_created_at": ("user_id", "created_at"),
+    "ix_incidents_status_created_at": ("status", "created_at"),
+    "ix_incidents_created_at_id": ("created_at", "id"),
+}
+
+def upgrade(connection):
+    incidents = Table("incidents", MetaData(), autoload_with=connection)
+    existing = {index["name"] for index in inspect(connection).get_indexes("incidents")}
+    for name, columns in INDEXES.items():
+        if name not in existing:
+            Index(name, *[incidents.c[column] for column in columns]).create(connection)
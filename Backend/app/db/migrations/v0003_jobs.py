@@ -0,0 +1,28 @@
+# app/db/migrations/v0003_jobs.py
+from sqlalchemy import JSON, Column, DateTime, Index, Integer, MetaData, String, Table, Text
+from sqlalchemy.sql import func
+
+VERSION = 3
+DESCRIPTION = "Background jobs table"
+
+metadata = MetaData()
+
+jobs = Table(
+    "jobs", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("job_type", String(100), nullable=False),
+    Column("payload", JSON, nullable=True),
+    Column("status", String(20), default="queued"),
+    Column("attempts", Integer, default=0),
+    Column("max_attempts", Integer, default=5),
+    Column("run_after", DateTime, nullable=False),
+    Column("locked_by", String(100), nullable=True),
+    Column("locked_until", DateTime, nullable=True),
+    Column("last_error", Text, nullable=True),
+    Column("created_at", DateTime, default=func.now()),
+    Column("updated_at", DateTime, default=func.now(), onupdate=func.now()),
+    Index("ix_jobs_type_status_run_after", "job_type", "status", "run_after"),
+)
+
+def upgrade(connection):
+    metadata.create_all(connection, checkfirst=True)
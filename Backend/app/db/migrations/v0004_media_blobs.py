@@ -0,0 +1,21 @@
+# app/db/migrations/v0004_media_blobs.py
+from sqlalchemy import BigInteger, Column, DateTime, Integer, MetaData, String, Table
+from sqlalchemy.sql import func
+
+VERSION = 4
+DESCRIPTION = "Content-addressed media blobs with reference counts"
+
+metadata = MetaData()
+
+media_blobs = Table(
+    "media_blobs", metadata,
+    Column("content_id", String(64), primary_key=True),
+    Column("size", BigInteger, nullable=False),
+    Column("content_type", String(255), nullable=True),
+    Column("ref_count", Integer, default=0),
+    Column("created_at", DateTime, default=func.now()),
+    Column("updated_at", DateTime, default=func.now(), onupdate=func.now()),
+)
+
+def upgrade(connection):
+    metadata.create_all(connection, checkfirst=True)
@@ -0,0 +1,30 @@
+# app/db/migrations/v0005_upload_sessions.py
+from sqlalchemy import BigInteger, Column, DateTime, ForeignKey, Integer, MetaData, String, Table
+from sqlalchemy.sql import func
+
+VERSION = 5
+DESCRIPTION = "Resumable upload sessions"
+
+metadata = MetaData()
+
+# Referenced by the foreign key below; not created here
+Table("users", metadata, Column("id", Integer, primary_key=True))
+
+upload_sessions = Table(
+    "upload_sessions", metadata,
+    Column("id", String(32), primary_key=True),
+    Column("user_id", Integer, ForeignKey("users.id"), nullable=False),
+    Column("filename", String(255)),
+    Column("content_type", String(255)),
+    Column("size", BigInteger, nullable=False),
+    Column("checksum", String(64), nullable=True),
+    Column("received", BigInteger, default=0),
+    Column("chunks_received", Integer, default=0),
+    Column("locked_until", DateTime, nullable=True),
+    Column("expires_at", DateTime, nullable=False),
+    Column("created_at", DateTime, default=func.now()),
+    Column("updated_at", DateTime, default=func.now(), onupdate=func.now()),
+)
+
+def upgrade(connection):
+    upload_sessions.create(connection, checkfirst=True)
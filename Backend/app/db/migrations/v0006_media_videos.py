@@ -0,0 +1,25 @@
+# app/db/migrations/v0006_media_videos.py
+from sqlalchemy import JSON, Column, DateTime, Float, Integer, MetaData, String, Table, Text
+from sqlalchemy.sql import func
+
+VERSION = 6
+DESCRIPTION = "Video probe results and HLS rendition state"
+
+metadata = MetaData()
+
+media_videos = Table(
+    "media_videos", metadata,
+    Column("content_id", String(64), primary_key=True),
+    Column("status", String(20), default="pending"),
+    Column("duration", Float, nullable=True),
+    Column("codec", String(50), nullable=True),
+    Column("width", Integer, nullable=True),
+    Column("height", Integer, nullable=True),
+    Column("renditions", JSON, nullable=True),
+    Column("error", Text, nullable=True),
+    Column("created_at", DateTime, default=func.now()),
+    Column("updated_at", DateTime, default=func.now(), onupdate=func.now()),
+)
+
+def upgrade(connection):
+    metadata.create_all(connection, checkfirst=True)
@@ -0,0 +1,104 @@
+# app/db/migrations/v0007_incident_media.py
+import json
+import re
+
+from sqlalchemy import (
+    BigInteger, Column, DateTime, Float, ForeignKey, Index, Integer, MetaData, String, Table, select,
+)
+from sqlalchemy.sql import func
+
+VERSION = 7
+DESCRIPTION = "Normalised incident_media table, backfilled from the incident media columns"
+
+BATCH_SIZE = 1000
+_CONTENT_ID = re.compile(r"[0-9a-f]{64}")
+
+metadata = MetaData()
+
+# Referenced by the foreign key below; not created here
+Table("incidents", metadata, Column("id", Integer, primary_key=True))
+
+incident_media = Table(
+    "incident_media", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("incident_id", Integer, ForeignKey("incidents.id", ondelete="CASCADE"), nullable=False),
+    Column("kind", String(20), nullable=False),
+    Column("ordinal", Integer, nullable=False, default=0),
+    Column("storage_key", String(1024), nullable=False),
+    Column("filename", String(255), nullable=True),
+    Column("size", BigInteger, nullable=True),
+    Column("mime", String(255), nullable=True),
+    Column("width", Integer, nullable=True),
+    Column("height", Integer, nullable=True),
+    Column("duration", Float, nullable=True),
+    Column("checksum", String(64), nullable=True),
+    Column("created_at", DateTime, default=func.now()),
+    Index("ux_incident_media_incident_kind_ordinal", "incident_id", "kind", "ordinal", unique=True),
+    Index("ix_incident_media_mime", "mime"),
+    Index("ix_incident_media_checksum", "checksum"),
+)
+
+def _media_refs(row) -> list:
+    additional = row.additional_media
+    if isinstance(additional, str):
+        additional = json.loads(additional or "null")
+    refs = []
+    if row.media_url:
+        refs.append(("media", 0, row.media_url))
+    if row.video_url:
+        refs.append(("video", 0, row.video_url))
+    refs += [("additional", index, ref) for index, ref in enumerate(additional or []) if ref]
+    return refs
+
+def upgrade(connection):
+    incident_media.create(connection, checkfirst=True)
+
+    source = MetaData()
+    incidents = Table("incidents", source, autoload_with=connection)
+    blobs = Table("media_blobs", source, autoload_with=connection)
+    videos = Table("media_videos", source, autoload_with=connection)
+
+    # One batch of incidents at a time, by id, so memory stays flat
+    last_id = 0
+    while True:
+        rows = connection.execute(
+            select(incidents.c.id, incidents.c.media_url, incidents.c.video_url, incidents.c.additional_media)
+            .where(incidents.c.id > last_id).order_by(incidents.c.id).limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+
+        refs = {row.id: _media_refs(row) for row in rows}
+        content_ids = {ref for items in refs.values() for _, _, ref in items if _CONTENT_ID.fullmatch(ref)}
+        blob_info, video_info = {}, {}
+        if content_ids:
+            blob_info = {row.content_id: row for row in connection.execute(
+                select(blobs.c.content_id, blobs.c.size, blobs.c.content_type)
+                .where(blobs.c.content_id.in_(content_ids))
+            )}
+            video_info = {row.content_id: row for row in connection.execute(
+                select(videos.c.content_id, videos.c.width, videos.c.height, videos.c.duration)
+                .where(videos.c.content_id.in_(content_ids))
+            )}
+
+        values = []
+        for incident_id, items in refs.items():
+            for kind, ordinal, ref in items:
+                blob, video = blob_info.get(ref), video_info.get(ref)
+                values.append({
+                    "incident_id": incident_id,
+                    "kind": kind,
+                    "ordinal": ordinal,
+                    "storage_key": ref,
+                    "size": blob.size if blob else None,
+                    "mime": blob.content_type if blob else None,
+                    "width": video.width if video else None,
+                    "height": video.height if video else None,
+                    "duration": video.duration if video else None,
+                    "checksum": ref if _CONTENT_ID.fullmatch(ref) else None,
+                })
+        # Re-runnable if an earlier attempt stopped part-way
+        connection.execute(incident_media.delete().where(incident_media.c.incident_id.in_(list(refs))))
+        if values:
+            connection.execute(incident_media.insert(), values)
@@ -0,0 +1,28 @@
+# app/db/migrations/v0008_idempotency_keys.py
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, MetaData, String, Table
+from sqlalchemy.sql import func
+
+VERSION = 8
+DESCRIPTION = "Idempotency keys for incident creation"
+
+metadata = MetaData()
+
+# Referenced by the foreign key below; not created here
+Table("users", metadata, Column("id", Integer, primary_key=True))
+
+idempotency_keys = Table(
+    "idempotency_keys", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("user_id", Integer, ForeignKey("users.id"), nullable=False),
+    Column("key", String(255), nullable=False),
+    Column("endpoint", String(100), nullable=False),
+    Column("incident_id", Integer, nullable=True),
+    Column("locked_until", DateTime, nullable=True),
+    Column("expires_at", DateTime, nullable=False),
+    Column("created_at", DateTime, default=func.now()),
+    Index("ux_idempotency_keys_user_id_key", "user_id", "key", unique=True),
+    Index("ix_idempotency_keys_expires_at", "expires_at"),
+)
+
+def upgrade(connection):
+    idempotency_keys.create(connection, checkfirst=True)
@@ -0,0 +1,17 @@
+# app/db/migrations/v0009_incident_sync_index.py
+from sqlalchemy import Index, MetaData, Table, inspect
+
+VERSION = 9
+DESCRIPTION = "Index on incidents (user_id, updated_at) for delta sync"
+
+INDEX_NAME = "ix_incidents_user_id_updated_at"
+
+def upgrade(connection):
+    incidents = Table("incidents", MetaData(), autoload_with=connection)
+    # Rows from before updated_at had a default would never be synced
+    connection.execute(
+        incidents.update().where(incidents.c.updated_at.is_(None)).values(updated_at=incidents.c.created_at)
+    )
+    existing = {index["name"] for index in inspect(connection).get_indexes("incidents")}
+    if INDEX_NAME not in existing:
+        Index(INDEX_NAME, incidents.c.user_id, incidents.c.updated_at).create(connection)
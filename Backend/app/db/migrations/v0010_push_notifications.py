@@ -0,0 +1,42 @@
+# app/db/migrations/v0010_push_notifications.py
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, MetaData, String, Table
+from sqlalchemy.sql import func
+
+VERSION = 10
+DESCRIPTION = "Device tokens and pending status-change push notifications"
+
+metadata = MetaData()
+
+# Referenced by the foreign keys below; not created here
+Table("users", metadata, Column("id", Integer, primary_key=True))
+Table("incidents", metadata, Column("id", Integer, primary_key=True))
+
+device_tokens = Table(
+    "device_tokens", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("user_id", Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
+    Column("token", String(512), nullable=False),
+    Column("platform", String(20), nullable=True),
+    Column("created_at", DateTime, default=func.now()),
+    Column("updated_at", DateTime, default=func.now(), onupdate=func.now()),
+    Index("ux_device_tokens_token", "token", unique=True),
+    Index("ix_device_tokens_user_id", "user_id"),
+)
+
+pending_notifications = Table(
+    "pending_notifications", metadata,
+    Column("incident_id", Integer, ForeignKey("incidents.id", ondelete="CASCADE"), primary_key=True),
+    Column("user_id", Integer, nullable=False),
+    Column("from_status", String(50), nullable=True),
+    Column("status", String(50), nullable=False),
+    Column("due_at", DateTime, nullable=False),
+    Column("attempts", Integer, default=0),
+    Column("locked_by", String(100), nullable=True),
+    Column("locked_until", DateTime, nullable=True),
+    Column("created_at", DateTime, default=func.now()),
+    Index("ix_pending_notifications_due_at", "due_at"),
+)
+
+def upgrade(connection):
+    device_tokens.create(connection, checkfirst=True)
+    pending_notifications.create(connection, checkfirst=True)
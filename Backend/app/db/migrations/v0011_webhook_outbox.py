@@ -0,0 +1,54 @@
+# app/db/migrations/v0011_webhook_outbox.py
+from sqlalchemy import JSON, Boolean, Column, DateTime, ForeignKey, Index, Integer, MetaData, String, Table, Text
+from sqlalchemy.sql import func
+
+VERSION = 11
+DESCRIPTION = "Outbox of incident events, webhook subscriptions and dead letters"
+
+metadata = MetaData()
+
+outbox_events = Table(
+    "outbox_events", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("event_type", String(50), nullable=False),
+    Column("incident_id", Integer, nullable=True),
+    Column("payload", JSON, nullable=False),
+    Column("created_at", DateTime, nullable=False),
+    Index("ix_outbox_events_created_at", "created_at"),
+)
+
+webhook_subscriptions = Table(
+    "webhook_subscriptions", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("name", String(255), nullable=False),
+    Column("url", String(1024), nullable=False),
+    Column("secret", String(255), nullable=False),
+    Column("event_types", JSON, nullable=True),
+    Column("active", Boolean, default=True),
+    Column("last_event_id", Integer, default=0),
+    Column("attempts", Integer, default=0),
+    Column("next_attempt_at", DateTime, nullable=True),
+    Column("last_error", Text, nullable=True),
+    Column("locked_by", String(100), nullable=True),
+    Column("locked_until", DateTime, nullable=True),
+    Column("created_at", DateTime, default=func.now()),
+    Column("updated_at", DateTime, default=func.now(), onupdate=func.now()),
+)
+
+webhook_dead_letters = Table(
+    "webhook_dead_letters", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("subscription_id", Integer, ForeignKey("webhook_subscriptions.id", ondelete="CASCADE"), nullable=False),
+    Column("event_id", Integer, nullable=False),
+    Column("event_type", String(50), nullable=False),
+    Column("payload", JSON, nullable=False),
+    Column("error", Text, nullable=True),
+    Column("attempts", Integer, default=0),
+    Column("created_at", DateTime, default=func.now()),
+    Index("ix_webhook_dead_letters_subscription_id_id", "subscription_id", "id"),
+)
+
+def upgrade(connection):
+    outbox_events.create(connection, checkfirst=True)
+    webhook_subscriptions.create(connection, checkfirst=True)
+    webhook_dead_letters.create(connection, checkfirst=True)
@@ -0,0 +1,64 @@
+# app/db/migrations/v0012_incident_geohash.py
+from sqlalchemy import Index, MetaData, Table, bindparam, inspect, select, text
+
+VERSION = 12
+DESCRIPTION = "Geohash of each incident's location, indexed for map clustering"
+
+INDEX_NAME = "ix_incidents_geohash"
+BATCH_SIZE = 1000
+PRECISION = 9
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+def _geohash(latitude, longitude):
+    """Frozen copy of map_service.encode_geohash at the time of this migration"""
+    if latitude is None or longitude is None or not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        return None
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, value, even = [], 0, 0, True
+    while len(chars) < PRECISION:
+        interval, coordinate = (lng_range, longitude) if even else (lat_range, latitude)
+        middle = (interval[0] + interval[1]) / 2
+        value <<= 1
+        if coordinate >= middle:
+            value |= 1
+            interval[0] = middle
+        else:
+            interval[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_BASE32[value])
+            bits, value = 0, 0
+    return "".join(chars)
+
+def upgrade(connection):
+    columns = {column["name"] for column in inspect(connection).get_columns("incidents")}
+    if "geohash" not in columns:
+        connection.execute(text("ALTER TABLE incidents ADD COLUMN geohash VARCHAR(12) NULL"))
+    incidents = Table("incidents", MetaData(), autoload_with=connection)
+
+    last_id = 0
+    while True:
+        rows = connection.execute(
+            select(incidents.c.id, incidents.c.latitude, incidents.c.longitude)
+            .where(incidents.c.id > last_id, incidents.c.geohash.is_(None))
+            .order_by(incidents.c.id).limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+        values = [{"row_id": row.id, "value": _geohash(row.latitude, row.longitude)} for row in rows]
+        values = [value for value in values if value["value"] is not None]
+        if values:
+            connection.execute(
+                incidents.update().where(incidents.c.id == bindparam("row_id")).values(geohash=bindparam("value")),
+                values,
+            )
+
+    existing = {index["name"] for index in inspect(connection).get_indexes("incidents")}
+    if INDEX_NAME not in existing:
+        Index(
+            INDEX_NAME, incidents.c.geohash, incidents.c.status, incidents.c.created_at,
+            incidents.c.latitude, incidents.c.longitude,
+        ).create(connection)
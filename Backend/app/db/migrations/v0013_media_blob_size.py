@@ -0,0 +1,14 @@
+# app/db/migrations/v0013_media_blob_size.py
+from sqlalchemy import BigInteger, inspect, text
+
+VERSION = 13
+DESCRIPTION = "Widen media_blobs.size to BIGINT for files over 2 GiB"
+
+def upgrade(connection):
+    # Databases created from migration 0004 after it switched to BigInteger
+    # already have the wide column. SQLite integers are 64-bit regardless.
+    if connection.dialect.name != "mysql":
+        return
+    size = next(column for column in inspect(connection).get_columns("media_blobs") if column["name"] == "size")
+    if not isinstance(size["type"], BigInteger):
+        connection.execute(text("ALTER TABLE media_blobs MODIFY size BIGINT NOT NULL"))
@@ -0,0 +1,13 @@
+# app/db/migrations/v0014_incident_updated_at_index.py
+from sqlalchemy import Index, MetaData, Table, inspect
+
+VERSION = 14
+DESCRIPTION = "Index on incidents (updated_at, id) for the live feed's change poll"
+
+INDEX_NAME = "ix_incidents_updated_at_id"
+
+def upgrade(connection):
+    incidents = Table("incidents", MetaData(), autoload_with=connection)
+    existing = {index["name"] for index in inspect(connection).get_indexes("incidents")}
+    if INDEX_NAME not in existing:
+        Index(INDEX_NAME, incidents.c.updated_at, incidents.c.id).create(connection)
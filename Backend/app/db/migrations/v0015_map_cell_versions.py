@@ -0,0 +1,16 @@
+# app/db/migrations/v0015_map_cell_versions.py
+from sqlalchemy import Column, Integer, MetaData, String, Table
+
+VERSION = 15
+DESCRIPTION = "Per-cell change counters that keep every process's map tile cache current"
+
+metadata = MetaData()
+
+map_cell_versions = Table(
+    "map_cell_versions", metadata,
+    Column("cell", String(12), primary_key=True),
+    Column("version", Integer, nullable=False, default=0),
+)
+
+def upgrade(connection):
+    map_cell_versions.create(connection, checkfirst=True)
@@ -0,0 +1,10 @@
+# app/db/migrations/v0016_idempotency_claim_token.py
+from sqlalchemy import inspect, text
+
+VERSION = 16
+DESCRIPTION = "Owner token on idempotency keys, so a superseded request cannot release or complete a retry's claim"
+
+def upgrade(connection):
+    columns = {column["name"] for column in inspect(connection).get_columns("idempotency_keys")}
+    if "claim_token" not in columns:
+        connection.execute(text("ALTER TABLE idempotency_keys ADD COLUMN claim_token VARCHAR(32) NULL"))
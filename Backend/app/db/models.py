@@ -1,5 +1,5 @@
 # app/db/models.py
-from sqlalchemy import JSON, Column, Integer, String, Float, ForeignKey, Text, Boolean, DateTime
+from sqlalchemy import JSON, BigInteger, Column, Integer, String, Float, ForeignKey, Text, Boolean, DateTime, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from .database import Base
@@ -13,6 +13,8 @@ class User(Base):
     admin_level = Column(Integer, default=0)  # 0=user, 1=operator, 2=admin
     created_at = Column(DateTime, default=func.now())
 
+_MEDIA_KIND_ORDER = {"media": 0, "video": 1, "additional": 2}
+
 class Incident(Base):
     __tablename__ = 'incidents'
     id = Column(Integer, primary_key=True, index=True)
@@ -21,11 +23,241 @@ class Incident(Base):
     description = Column(Text)
     latitude = Column(Float)
     longitude = Column(Float)
-    media_url = Column(String(1024), nullable=True)
-    video_url = Column(String(1024), nullable=True)  # For uploaded videos
+    geohash = Column(String(12), nullable=True)  # Of latitude/longitude, set on insert; map clustering groups by its prefixes
+    media_url = Column(String(1024), nullable=True)  # Primary image, also an incident_media row of kind "media"
+    video_url = Column(String(1024), nullable=True)  # For uploaded videos, also a row of kind "video"
     livestream_url = Column(String(1024), nullable=True)  # For live capture URLs
-    additional_media = Column(JSON, nullable=True)  # For multiple image uploads stored as a JSON array
+    # The old additional_media JSON column is left in the table (backfilled
+    # into incident_media by migration 0007) but no longer mapped
     status = Column(String(50), default="submitted")  # Values: submitted, under_process, resolved, rejected
     admin_remarks = Column(Text, nullable=True)  # Admin remarks field
     created_at = Column(DateTime, default=func.now())
-    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
\ No newline at end of file
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+
+    # Schema changes to these go through a migration in app/db/migrations
+    __table_args__ = (
+        Index("ix_incidents_user_id_created_at", "user_id", "created_at"),  # /incidents/user
+        Index("ix_incidents_status_created_at", "status", "created_at"),  # /admin/incidents?status=
+        Index("ix_incidents_created_at_id", "created_at", "id"),  # Keyset pages, report date ranges
+        Index("ix_incidents_user_id_updated_at", "user_id", "updated_at"),  # /incidents/sync
+        Index("ix_incidents_updated_at_id", "updated_at", "id"),  # Live feed changes from other processes
+        # /admin/map: prefix ranges of the cells on screen, covering the filters and coordinates
+        Index("ix_incidents_geohash", "geohash", "status", "created_at", "latitude", "longitude"),
+    )
+
+    # Not loaded with the row; use selectinload(Incident.media_items) where needed
+    media_items = relationship(
+        "IncidentMedia",
+        order_by="IncidentMedia.ordinal",
+        cascade="all, delete-orphan",
+        back_populates="incident",
+    )
+
+    @property
+    def additional_media(self):
+        """Storage keys of the additional files, in upload order (the former JSON column)"""
+        return [item.storage_key for item in self.media_items if item.kind == "additional"]
+
+    @property
+    def attachments(self):
+        """Media items ordered primary image, video, then additional files"""
+        return sorted(self.media_items, key=lambda item: (_MEDIA_KIND_ORDER.get(item.kind, 3), item.ordinal))
+
+class IncidentMedia(Base):
+    """One file attached to an incident"""
+    __tablename__ = 'incident_media'
+    id = Column(Integer, primary_key=True, index=True)
+    incident_id = Column(Integer, ForeignKey('incidents.id', ondelete="CASCADE"), nullable=False)
+    kind = Column(String(20), nullable=False)  # Values: media, video, additional
+    ordinal = Column(Integer, nullable=False, default=0)  # Position within the kind, from 0
+    storage_key = Column(String(1024), nullable=False)  # Content ID, or a file path from before the media store
+    filename = Column(String(255), nullable=True)  # As uploaded
+    size = Column(BigInteger, nullable=True)  # Bytes
+    mime = Column(String(255), nullable=True)
+    width = Column(Integer, nullable=True)  # Pixels, once an image or video has been processed
+    height = Column(Integer, nullable=True)
+    duration = Column(Float, nullable=True)  # Seconds, for videos
+    checksum = Column(String(64), nullable=True)  # Hex SHA-256; equals storage_key for stored content
+    created_at = Column(DateTime, default=func.now())
+
+    incident = relationship("Incident", back_populates="media_items")
+
+    @property
+    def content_type(self):
+        return self.mime
+
+    __table_args__ = (
+        Index("ux_incident_media_incident_kind_ordinal", "incident_id", "kind", "ordinal", unique=True),
+        Index("ix_incident_media_mime", "mime"),  # Queries by media type
+        Index("ix_incident_media_checksum", "checksum"),  # Fill probe results into every row of a content
+    )
+
+class Job(Base):
+    """Durable background job, claimed and run by app.worker"""
+    __tablename__ = 'jobs'
+    id = Column(Integer, primary_key=True, index=True)
+    job_type = Column(String(100), nullable=False)
+    payload = Column(JSON, nullable=True)
+    status = Column(String(20), default="queued")  # Values: queued, running, succeeded, failed
+    attempts = Column(Integer, default=0)
+    max_attempts = Column(Integer, default=5)
+    run_after = Column(DateTime, nullable=False)  # UTC; not claimable before this
+    locked_by = Column(String(100), nullable=True)
+    locked_until = Column(DateTime, nullable=True)  # UTC; visibility timeout of a running job
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=func.now())
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        Index("ix_jobs_type_status_run_after", "job_type", "status", "run_after"),
+    )
+
+class MediaBlob(Base):
+    """One stored file, addressed by the SHA-256 of its content"""
+    __tablename__ = 'media_blobs'
+    content_id = Column(String(64), primary_key=True)  # Hex SHA-256, also the file name in the media store
+    size = Column(BigInteger, nullable=False)  # Bytes; resumable uploads can pass 2 GiB
+    content_type = Column(String(255), nullable=True)  # As declared by the first uploader
+    ref_count = Column(Integer, default=0)  # Incident fields pointing at this content
+    created_at = Column(DateTime, default=func.now())
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+
+class UploadSession(Base):
+    """A resumable upload in progress; its bytes live in the staging directory"""
+    __tablename__ = 'upload_sessions'
+    id = Column(String(32), primary_key=True)  # Random hex, also the staging file name
+    user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
+    filename = Column(String(255))
+    content_type = Column(String(255))
+    size = Column(BigInteger, nullable=False)  # Declared total, in bytes
+    checksum = Column(String(64), nullable=True)  # Declared hex SHA-256 of the whole file
+    received = Column(BigInteger, default=0)  # Bytes stored so far, the next chunk's offset
+    chunks_received = Column(Integer, default=0)
+    locked_until = Column(DateTime, nullable=True)  # UTC; a chunk is being written until then
+    expires_at = Column(DateTime, nullable=False)  # UTC; pushed back by every chunk
+    created_at = Column(DateTime, default=func.now())
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+
+class IdempotencyKey(Base):
+    """A client-supplied Idempotency-Key and the incident its first request created"""
+    __tablename__ = 'idempotency_keys'
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
+    key = Column(String(255), nullable=False)
+    endpoint = Column(String(100), nullable=False)  # e.g. "POST /incidents/"; a key is bound to one endpoint
+    incident_id = Column(Integer, nullable=True)  # Set in the incident's own commit; null while in flight
+    claim_token = Column(String(32), nullable=True)  # Request currently holding the key; changes on takeover
+    locked_until = Column(DateTime, nullable=True)  # UTC; the first request is still running until then
+    expires_at = Column(DateTime, nullable=False)  # UTC; forgotten (and swept) after this
+    created_at = Column(DateTime, default=func.now())
+
+    __table_args__ = (
+        Index("ux_idempotency_keys_user_id_key", "user_id", "key", unique=True),
+        Index("ix_idempotency_keys_expires_at", "expires_at"),  # Sweeping
+    )
+
+class DeviceToken(Base):
+    """A push token registered by one of a user's devices"""
+    __tablename__ = 'device_tokens'
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey('users.id', ondelete="CASCADE"), nullable=False)
+    token = Column(String(512), nullable=False)  # FCM registration token; moves with the device, not the user
+    platform = Column(String(20), nullable=True)  # Values: android, ios, web
+    created_at = Column(DateTime, default=func.now())
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())  # Last registered
+
+    __table_args__ = (
+        Index("ux_device_tokens_token", "token", unique=True),
+        Index("ix_device_tokens_user_id", "user_id"),  # Tokens to notify for a user
+    )
+
+class PendingNotification(Base):
+    """
+    A status-change push waiting to be sent, one row per incident so rapid
+    successive updates coalesce into a single notification
+    """
+    __tablename__ = 'pending_notifications'
+    incident_id = Column(Integer, ForeignKey('incidents.id', ondelete="CASCADE"), primary_key=True)
+    user_id = Column(Integer, nullable=False)
+    from_status = Column(String(50), nullable=True)  # Last status the reporter was told about
+    status = Column(String(50), nullable=False)  # Latest status, kept current by each update
+    due_at = Column(DateTime, nullable=False)  # UTC; sent at the end of the coalescing window, or retry time
+    attempts = Column(Integer, default=0)
+    locked_by = Column(String(100), nullable=True)  # Dispatcher that claimed it
+    locked_until = Column(DateTime, nullable=True)  # UTC; a dispatcher is sending it until then
+    created_at = Column(DateTime, default=func.now())
+
+    __table_args__ = (
+        Index("ix_pending_notifications_due_at", "due_at"),
+    )
+
+class OutboxEvent(Base):
+    """An incident event for partner webhooks, written in the same commit as the change"""
+    __tablename__ = 'outbox_events'
+    id = Column(Integer, primary_key=True, index=True)  # Delivery order
+    event_type = Column(String(50), nullable=False)  # Values: incident.created, incident.updated
+    incident_id = Column(Integer, nullable=True)
+    payload = Column(JSON, nullable=False)
+    created_at = Column(DateTime, nullable=False)  # UTC; delivery lag is measured from here
+
+    __table_args__ = (
+        Index("ix_outbox_events_created_at", "created_at"),  # Pruning
+    )
+
+class WebhookSubscription(Base):
+    """A partner endpoint that outbox events are delivered to"""
+    __tablename__ = 'webhook_subscriptions'
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String(255), nullable=False)
+    url = Column(String(1024), nullable=False)
+    secret = Column(String(255), nullable=False)  # HMAC key for X-Webhook-Signature
+    event_types = Column(JSON, nullable=True)  # Event types to send; null for all
+    active = Column(Boolean, default=True)
+    last_event_id = Column(Integer, default=0)  # Cursor: every event up to here was delivered or dead-lettered
+    attempts = Column(Integer, default=0)  # Failed attempts at the batch after the cursor
+    next_attempt_at = Column(DateTime, nullable=True)  # UTC; backing off until then
+    last_error = Column(Text, nullable=True)
+    locked_by = Column(String(100), nullable=True)  # Delivery run that holds it; one at a time keeps events in order
+    locked_until = Column(DateTime, nullable=True)  # UTC
+    created_at = Column(DateTime, default=func.now())
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+
+class WebhookDeadLetter(Base):
+    """An event given up on for one subscription, kept for inspection"""
+    __tablename__ = 'webhook_dead_letters'
+    id = Column(Integer, primary_key=True, index=True)
+    subscription_id = Column(Integer, ForeignKey('webhook_subscriptions.id', ondelete="CASCADE"), nullable=False)
+    event_id = Column(Integer, nullable=False)
+    event_type = Column(String(50), nullable=False)
+    payload = Column(JSON, nullable=False)  # Copied, as the outbox row is pruned
+    error = Column(Text, nullable=True)
+    attempts = Column(Integer, default=0)
+    created_at = Column(DateTime, default=func.now())
+
+    __table_args__ = (
+        Index("ix_webhook_dead_letters_subscription_id_id", "subscription_id", "id"),
+    )
+
+class MediaVideo(Base):
+    """Probe results and HLS rendition state of a stored video"""
+    __tablename__ = 'media_videos'
+    content_id = Column(String(64), primary_key=True)  # The MediaBlob this describes
+    status = Column(String(20), default="pending")  # Values: pending, ready, failed
+    duration = Column(Float, nullable=True)  # Seconds
+    codec = Column(String(50), nullable=True)  # Source video codec, e.g. h264, hevc
+    width = Column(Integer, nullable=True)  # As displayed, after rotation
+    height = Column(Integer, nullable=True)
+    renditions = Column(JSON, nullable=True)  # HLS rendition names, e.g. ["360p", "720p"]
+    error = Column(Text, nullable=True)  # Why probing or transcoding failed
+    created_at = Column(DateTime, default=func.now())
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+
+class MapCellVersion(Base):
+    """
+    Change counter of a coarse geohash cell, bumped with every incident
+    created or changed inside it, so each process can tell whether its
+    cached map tiles are still current
+    """
+    __tablename__ = 'map_cell_versions'
+    cell = Column(String(12), primary_key=True)  # Geohash prefix of map_service.VERSION_PRECISION characters
+    version = Column(Integer, nullable=False, default=0)
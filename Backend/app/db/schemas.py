@@ -1,6 +1,6 @@
 # app/db/schemas.py
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import Any, Dict, Optional, List
 from datetime import datetime
 
 class UserCreate(BaseModel):
@@ -35,6 +35,31 @@ class IncidentBase(BaseModel):
 class IncidentCreate(IncidentBase):
     pass
 
+class Attachment(BaseModel):
+    """One file stored with an incident (an incident_media row)"""
+    kind: str  # media, video or additional
+    ordinal: int = 0  # Position within the kind; additional_media index
+    filename: Optional[str] = None  # As uploaded
+    content_type: Optional[str] = None
+    size: Optional[int] = None  # Bytes
+    checksum: Optional[str] = None  # Hex SHA-256, the content ID in media_url and friends
+    width: Optional[int] = None  # Pixels, once processed
+    height: Optional[int] = None
+    duration: Optional[float] = None  # Seconds, for videos
+
+    class Config:
+        from_attributes = True
+
+class VideoStream(BaseModel):
+    """Adaptive-streaming version of an incident video, made by the job worker"""
+    status: str  # pending, ready or failed; play video_signed_url until ready
+    duration: Optional[float] = None  # Seconds
+    codec: Optional[str] = None
+    width: Optional[int] = None
+    height: Optional[int] = None
+    hls_url: Optional[str] = None  # Signed HLS master playlist, once ready
+    poster_url: Optional[str] = None  # Signed poster frame, once ready
+
 class Incident(BaseModel):
     id: int
     user_id: int
@@ -50,14 +75,155 @@ class Incident(BaseModel):
     admin_remarks: Optional[str] = None
     created_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
+    # Short-lived signed /media links, set by media_service.attach_signed_urls
+    media_signed_url: Optional[str] = None
+    video_signed_url: Optional[str] = None
+    additional_media_signed_urls: Optional[List[str]] = None
+    # Signed links to image derivatives by size: thumb, preview and blur (placeholder)
+    media_variants: Optional[Dict[str, str]] = None
+    additional_media_variants: Optional[List[Optional[Dict[str, str]]]] = None
+    # HLS playlist, poster and probe results for video_url, once processing started
+    video_stream: Optional[VideoStream] = None
+    # Every attached file with its metadata, from incident_media
+    attachments: Optional[List[Attachment]] = None
 
     class Config:
         from_attributes = True
 
+class IncidentBatchForm(BaseModel):
+    """Text field of POST /incidents/batch; the files go in `files` parts"""
+    incidents: str  # JSON list of IncidentBatchItem objects
+
+class IncidentBatchItem(IncidentCreate):
+    """One report in a batch. Attachments are indexes into the request's files."""
+    client_id: Optional[str] = None  # Echoed in the result, to match it to the device's queue
+    livestream_url: Optional[str] = None
+    media: Optional[int] = None
+    video: Optional[int] = None
+    additional: List[int] = []
+
+class IncidentBatchItemResult(BaseModel):
+    index: int  # Position in the submitted list
+    client_id: Optional[str] = None
+    status: str  # created or rejected
+    incident: Optional[Incident] = None
+    errors: Optional[List[Dict[str, Any]]] = None  # Why the report was rejected
+
+class IncidentBatchResult(BaseModel):
+    created: int
+    rejected: int
+    results: List[IncidentBatchItemResult]
+
+class IncidentPage(BaseModel):
+    """One page of incidents, newest first. Items only carry the requested fields."""
+    items: List[Dict[str, Any]]
+    next_cursor: Optional[str] = None  # Pass back as ?cursor= for the next page
+    approximate_total: Optional[int] = None  # Only computed for the first page
+
+class IncidentSync(BaseModel):
+    """Incidents created or changed since a watermark, oldest change first"""
+    items: List[Incident]
+    watermark: str  # Pass back as ?since= on the next sync
+    has_more: bool  # Sync again straight away with the new watermark
+
 class IncidentUpdate(BaseModel):
     status: Optional[str] = None
     admin_remarks: Optional[str] = None
 
+class UploadSessionCreate(BaseModel):
+    filename: str
+    content_type: str = "application/octet-stream"
+    size: int  # Total bytes that will be sent
+    checksum: Optional[str] = None  # Hex SHA-256 of the whole file, verified on finalize
+
+class UploadSession(BaseModel):
+    """State of a resumable upload; send the next chunk at offset `received`"""
+    id: str
+    filename: str
+    content_type: str
+    size: int
+    received: int
+    chunks_received: int
+    expires_at: datetime
+
+    class Config:
+        from_attributes = True
+
+class UploadFinalize(BaseModel):
+    incident_id: int
+    attach_as: str = "video"  # Values: video, media, additional
+
+class DeviceRegister(BaseModel):
+    token: str  # FCM registration token
+    platform: Optional[str] = None  # Values: android, ios, web
+
+class DeviceToken(BaseModel):
+    token: str
+    platform: Optional[str] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+class MapCluster(BaseModel):
+    geohash: str  # The cell; zoom in on its bounds to split it
+    count: int
+    latitude: float  # Mean position of the cell's incidents
+    longitude: float
+    incident_id: Optional[int] = None  # Set when the cell holds a single incident
+    status: Optional[str] = None  # Likewise
+
+class MapClusters(BaseModel):
+    zoom: int
+    precision: int  # Geohash length of the cells
+    total: int
+    clusters: List[MapCluster]
+
+class WebhookSubscriptionCreate(BaseModel):
+    name: str
+    url: str  # Receives POSTs of {"events": [...]}
+    event_types: Optional[List[str]] = None  # incident.created, incident.updated; all when omitted
+
+class WebhookSubscriptionUpdate(BaseModel):
+    name: Optional[str] = None
+    url: Optional[str] = None
+    event_types: Optional[List[str]] = None  # [] for all
+    active: Optional[bool] = None
+
+class WebhookSubscription(BaseModel):
+    id: int
+    name: str
+    url: str
+    event_types: Optional[List[str]] = None
+    active: bool
+    last_event_id: int  # Every event up to this id was delivered or dead-lettered
+    attempts: int = 0  # Failed attempts at the next batch
+    next_attempt_at: Optional[datetime] = None
+    last_error: Optional[str] = None
+    pending_events: Optional[int] = None  # Backlog, in the subscription list
+    lag_seconds: Optional[float] = None  # Age of the oldest undelivered event
+    created_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+class WebhookSubscriptionSecret(WebhookSubscription):
+    """Returned when a subscription is created or its secret rotated; the secret is not shown again"""
+    secret: str
+
+class WebhookDeadLetter(BaseModel):
+    id: int
+    event_id: int
+    event_type: str
+    payload: Dict[str, Any]
+    error: Optional[str] = None
+    attempts: int
+    created_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
 class AdminStats(BaseModel):
     """Schema for admin dashboard statistics."""
     total_incidents: int
@@ -67,6 +233,8 @@ class AdminStats(BaseModel):
     rejected_incidents: int
     total_users: int
     admin_users: int
+    incidents_last_week: int = 0
+    users_last_month: int = 0
     recent_incidents: List[Incident]
     
     class Config:
@@ -1,20 +1,81 @@
 # app/main.py
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse
 import os
-from .routers import auth_router, incident_router, admin_router
-from .db.database import Base, engine
+from .routers import auth_router, incident_router, admin_router, media_router, notification_router
 from .db import models
+from .db.migrate import pending_migrations
+from .core import config
+from .services import event_service, job_service
 
 # Ensure necessary directories exist
 os.makedirs("uploads", exist_ok=True)
 os.makedirs("admin", exist_ok=True)
 
+class LegacyUploads(StaticFiles):
+    """
+    Public /uploads, for the flat files saved before the media store. The
+    store and staging directories are never served from here, even when
+    they are configured inside it: media goes through signed /media links.
+    """
+
+    def __init__(self, directory: str, private_dirs):
+        super().__init__(directory=directory)
+        self.private_dirs = [os.path.realpath(path) for path in private_dirs]
+
+    def lookup_path(self, path: str):
+        full_path, stat_result = super().lookup_path(path)
+        real_path = os.path.realpath(full_path) if full_path else ""
+        if any(real_path == private or real_path.startswith(private + os.sep) for private in self.private_dirs):
+            return "", None
+        return full_path, stat_result
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Run the background job worker inside this process unless a separate
+    # `python -m app.worker` fleet handles it
+    worker = None
+    worker_task = None
+    if config.JOBS_IN_PROCESS:
+        worker = job_service.JobWorker()
+        worker_task = asyncio.create_task(worker.run())
+    # Feed the live admin dashboards with changes made by other processes
+    poller = None
+    poller_task = None
+    if config.EVENTS_POLL_INTERVAL > 0:
+        poller = event_service.ChangePoller()
+        poller_task = asyncio.create_task(poller.run())
+    try:
+        yield
+    finally:
+        if poller is not None:
+            poller.stop()
+            await poller_task
+        if worker is not None:
+            await worker.stop()
+            await worker_task
+
 def create_app():
-    # Create database tables
-    Base.metadata.create_all(bind=engine)
+    # Schema changes are applied ahead of deploy with `python -m app.db.migrate upgrade`;
+    # workers only check for (and warn about) anything still pending.
+    try:
+        pending = pending_migrations()
+        if pending:
+            print(f"WARNING: {len(pending)} database migration(s) pending, run `python -m app.db.migrate upgrade`")
+    except Exception as e:
+        print(f"Could not check database migrations: {str(e)}")
+
+    # Signed media links must verify on every worker and across restarts
+    if not config.MEDIA_URL_SECRET:
+        if os.getenv("JWT_SECRET_KEY"):
+            print("WARNING: MEDIA_URL_SECRET is not set, media links are signed with a key derived from JWT_SECRET_KEY")
+        else:
+            print("WARNING: neither MEDIA_URL_SECRET nor JWT_SECRET_KEY is set, media links will break on restart "
+                  "and between workers")
     
     # In your main.py
     app = FastAPI(
@@ -22,7 +83,8 @@ def create_app():
         description="API for incident reporting and management",
         version="1.0.0",
         docs_url="/docs",  # Explicitly set the docs URL
-        redoc_url="/redoc"  # Explicitly set the redoc URL
+        redoc_url="/redoc",  # Explicitly set the redoc URL
+        lifespan=lifespan
     )
         
     # Configure CORS
@@ -38,9 +100,11 @@ def create_app():
     app.include_router(auth_router.router)
     app.include_router(incident_router.router)
     app.include_router(admin_router.router)
+    app.include_router(media_router.router)
+    app.include_router(notification_router.router)
     
     # Mount static directories
-    app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
+    app.mount("/uploads", LegacyUploads("uploads", [config.MEDIA_DIR, config.UPLOAD_STAGING_DIR]), name="uploads")
     app.mount("/admin-static", StaticFiles(directory="admin"), name="admin-static")
     
     # Root endpoint
@@ -1,36 +1,33 @@
-from fastapi import APIRouter, Depends, HTTPException, status, File, UploadFile, Form
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, Depends, HTTPException, Header, Query, Request, status, File, UploadFile, Form
+from fastapi.responses import Response, StreamingResponse
+from starlette.background import BackgroundTask
 from sqlalchemy.orm import Session
 from typing import List, Optional
 import os
 import csv
 import io
+import base64
+import zlib
 from datetime import datetime, timedelta
-from ..db.database import SessionLocal
+from ..db.database import DbSession, SessionLocal, get_db_session, pool_stats
 from ..db import models, schemas
-from ..core.security import verify_password, create_access_token, hash_password
+from ..core.security import verify_password_async, create_access_token, hash_password_async, password_hash_stats
 from datetime import timedelta
-from sqlalchemy import func, desc
-from ..services.auth_service import get_admin_user
+from sqlalchemy import and_, func, desc, or_, text
+from ..services.auth_service import Principal, get_admin_user, invalidate_user
+from ..services import event_service, incident_service, map_service, media_service, stats_service, user_service, webhook_service
 
 router = APIRouter(prefix="/admin", tags=["Admin"])
 
 # JWT token settings
 ACCESS_TOKEN_EXPIRE_MINUTES = 60
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 # Admin login
 @router.post("/login", response_model=dict)
-def admin_login(login_data: schemas.AdminLogin, db: Session = Depends(get_db)):
-    user = db.query(models.User).filter_by(email=login_data.email).first()
+async def admin_login(login_data: schemas.AdminLogin, db: DbSession = Depends(get_db_session)):
+    user = await db.run(user_service.get_user_by_email, login_data.email)
     
-    if not user or not verify_password(login_data.password, user.password):
+    if not user or not await verify_password_async(login_data.password, user.password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid credentials",
@@ -53,142 +50,317 @@ def admin_login(login_data: schemas.AdminLogin, db: Session = Depends(get_db)):
     
     return {"access_token": access_token, "token_type": "bearer"}
 
-# Get all incidents (with admin access check)
-@router.get("/incidents", response_model=List[schemas.Incident])
-def get_all_incidents(
-    status: Optional[str] = None,
-    db: Session = Depends(get_db), 
-    current_admin: models.User = Depends(get_admin_user(1))
-):
-    query = db.query(models.Incident)
-    
+# Incident columns that can be requested with ?fields=, plus additional_media
+# which is read from incident_media for the whole page in one query
+INCIDENT_FIELDS = [
+    name for name in schemas.Incident.model_fields
+    if name in models.Incident.__table__.columns or name == "additional_media"
+]
+# Large columns left out of list pages unless explicitly requested
+DEFERRED_INCIDENT_FIELDS = {"description", "admin_remarks", "additional_media"}
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+# Filtered totals are counted up to this many rows, then reported as the cap
+APPROXIMATE_COUNT_CAP = 10000
+
+def _parse_date(value: str, field: str) -> datetime:
+    try:
+        return datetime.strptime(value, "%Y-%m-%d")
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"{field} must be in YYYY-MM-DD format")
+
+def _apply_incident_filters(query, status=None, from_date=None, to_date=None, user_id=None):
+    """Filters shared by the incident list, report and export endpoints"""
     if status and status != "all":
         query = query.filter(models.Incident.status == status)
-    
-    incidents = query.order_by(desc(models.Incident.created_at)).all()
-    return incidents
-
-# @router.get("/incidents", response_model=List[schemas.Incident])
-# def get_all_incidents(
-#     status: Optional[str] = None,
-#     db: Session = Depends(get_db)
-# ):
-#     query = db.query(models.Incident)
-    
-#     if status and status != "all":
-#         query = query.filter(models.Incident.status == status)
-    
-#     incidents = query.order_by(desc(models.Incident.created_at)).all()
-#     return incidents
+    if from_date:
+        query = query.filter(models.Incident.created_at >= _parse_date(from_date, "from_date"))
+    if to_date:
+        # Include the entire day
+        to_datetime = _parse_date(to_date, "to_date") + timedelta(days=1)
+        query = query.filter(models.Incident.created_at < to_datetime)
+    if user_id is not None:
+        query = query.filter(models.Incident.user_id == user_id)
+    return query
+
+def _encode_cursor(created_at: datetime, incident_id: int) -> str:
+    raw = f"{created_at.isoformat()}|{incident_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def _decode_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, incident_id = raw.split("|")
+        return datetime.fromisoformat(created_at), int(incident_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def _approximate_incident_count(db: Session, query, filtered: bool) -> int:
+    """
+    Cheap total for the list header. Unfiltered MySQL tables use the
+    table statistics; otherwise rows are counted up to APPROXIMATE_COUNT_CAP.
+    """
+    if not filtered and db.get_bind().dialect.name == "mysql":
+        estimate = db.execute(text(
+            "SELECT TABLE_ROWS FROM information_schema.TABLES "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table"
+        ), {"table": models.Incident.__tablename__}).scalar()
+        if estimate is not None:
+            return int(estimate)
+    capped = query.with_entities(models.Incident.id).limit(APPROXIMATE_COUNT_CAP).subquery()
+    return db.query(func.count()).select_from(capped).scalar()
+
+# Get incidents, newest first, one keyset page at a time (with admin access check)
+@router.get("/incidents", response_model=schemas.IncidentPage)
+async def get_all_incidents(
+    status: Optional[str] = None,
+    from_date: Optional[str] = None,
+    to_date: Optional[str] = None,
+    user_id: Optional[int] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    fields: Optional[str] = Query(
+        None, description="Comma-separated incident fields; defaults to all but the large text columns"
+    ),
+    db: DbSession = Depends(get_db_session), 
+    current_admin: Principal = Depends(get_admin_user(1))
+):
+    if fields:
+        selected = [name.strip() for name in fields.split(",") if name.strip()]
+        unknown = set(selected) - set(INCIDENT_FIELDS)
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    else:
+        selected = [name for name in INCIDENT_FIELDS if name not in DEFERRED_INCIDENT_FIELDS]
+
+    after = _decode_cursor(cursor) if cursor else None
+    filtered = bool((status and status != "all") or from_date or to_date or user_id is not None)
+
+    def load_page(session: Session):
+        # created_at and id are always loaded since they form the cursor
+        columns = [name for name in dict.fromkeys(selected + ["created_at", "id"]) if name != "additional_media"]
+        query = _apply_incident_filters(
+            session.query(*[getattr(models.Incident, name) for name in columns]),
+            status, from_date, to_date, user_id,
+        )
+
+        approximate_total = None
+        if after is None:
+            approximate_total = _approximate_incident_count(session, query, filtered)
+        else:
+            cursor_created_at, cursor_id = after
+            query = query.filter(or_(
+                models.Incident.created_at < cursor_created_at,
+                and_(models.Incident.created_at == cursor_created_at, models.Incident.id < cursor_id),
+            ))
+
+        rows = query.order_by(
+            desc(models.Incident.created_at), desc(models.Incident.id)
+        ).limit(limit + 1).all()
 
+        additional = None
+        if "additional_media" in selected:
+            additional = {row.id: [] for row in rows[:limit]}
+            for incident_id, storage_key in session.query(
+                models.IncidentMedia.incident_id, models.IncidentMedia.storage_key
+            ).filter(
+                models.IncidentMedia.incident_id.in_(list(additional)),
+                models.IncidentMedia.kind == "additional",
+            ).order_by(models.IncidentMedia.incident_id, models.IncidentMedia.ordinal):
+                additional[incident_id].append(storage_key)
+        return rows, approximate_total, additional
+
+    rows, approximate_total, additional = await db.run(load_page)
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = _encode_cursor(rows[-1].created_at, rows[-1].id)
+
+    items = [{name: getattr(row, name) for name in selected if name != "additional_media"} for row in rows]
+    if additional is not None:
+        for item, row in zip(items, rows):
+            item["additional_media"] = additional[row.id]
+    # Signed links are added for whichever media fields were selected
+    await media_service.attach_signed_urls(db, items)
+    return {
+        "items": items,
+        "next_cursor": next_cursor,
+        "approximate_total": approximate_total,
+    }
+
+# Live incident feed: Server-Sent Events instead of re-fetching the list
+@router.get("/events")
+async def incident_events(
+    last_event_id: Optional[str] = Header(None, alias="Last-Event-ID"),
+    current_admin: Principal = Depends(get_admin_user(1))
+):
+    """
+    incident.created and incident.updated events as they happen. Reconnect
+    with Last-Event-ID to resume; `resync` means events were missed and
+    the list should be reloaded.
+    """
+    event_service.broadcaster.check_capacity()
+    return StreamingResponse(
+        event_service.broadcaster.stream(last_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 # Get specific incident
 @router.get("/incidents/{incident_id}", response_model=schemas.Incident)
-def get_incident(
+async def get_incident(
     incident_id: int, 
-    db: Session = Depends(get_db),
-    current_admin: models.User = Depends(get_admin_user(1))
+    db: DbSession = Depends(get_db_session),
+    current_admin: Principal = Depends(get_admin_user(1))
 ):
-    incident = db.query(models.Incident).filter(models.Incident.id == incident_id).first()
+    incident = await db.run(incident_service.get_incident, incident_id)
     if not incident:
         raise HTTPException(status_code=404, detail="Incident not found")
+    await media_service.attach_signed_urls(db, [incident])
     return incident
 
 # Update incident status and remarks
 @router.patch("/incidents/{incident_id}", response_model=schemas.Incident)
-def update_incident(
+async def update_incident(
     incident_id: int, 
     incident_update: schemas.IncidentUpdate, 
-    db: Session = Depends(get_db),
-    current_admin: models.User = Depends(get_admin_user(1))
+    db: DbSession = Depends(get_db_session),
+    current_admin: Principal = Depends(get_admin_user(1))
 ):
-    incident = db.query(models.Incident).filter(models.Incident.id == incident_id).first()
-    if not incident:
-        raise HTTPException(status_code=404, detail="Incident not found")
-    
     if incident_update.status:
         # Validate status value
         valid_statuses = ["submitted", "under_process", "resolved", "rejected"]
         if incident_update.status not in valid_statuses:
             raise HTTPException(status_code=400, detail="Invalid status value")
-        incident.status = incident_update.status
-    
-    if incident_update.admin_remarks is not None:
-        incident.admin_remarks = incident_update.admin_remarks
     
-    db.commit()
-    db.refresh(incident)
+    incident = await db.run(incident_service.update_incident, incident_id, incident_update)
+    if not incident:
+        raise HTTPException(status_code=404, detail="Incident not found")
+    stats_service.invalidate_admin_stats()
+    event_service.incident_updated(incident)
+    await media_service.attach_signed_urls(db, [incident])
     return incident
 
+# Incident map. Both endpoints aggregate on the server into geohash cells
+# sized to the zoom level, so the response grows with the screen, not with
+# the number of incidents.
+@router.get("/map/clusters", response_model=schemas.MapClusters)
+async def get_map_clusters(
+    bbox: str = Query(..., description="west,south,east,north in degrees; west > east crosses the antimeridian"),
+    zoom: int = Query(..., ge=0, le=map_service.MAX_ZOOM),
+    status: Optional[str] = None,
+    from_date: Optional[str] = None,
+    to_date: Optional[str] = None,
+    db: DbSession = Depends(get_db_session),
+    current_admin: Principal = Depends(get_admin_user(1))
+):
+    """Incident clusters in the box; a cluster of one carries the incident's id and status"""
+    try:
+        west, south, east, north = (float(value) for value in bbox.split(","))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="bbox must be west,south,east,north")
+    if not (-180 <= west <= 180 and -180 <= east <= 180 and -90 <= south <= north <= 90):
+        raise HTTPException(status_code=400, detail="bbox is out of range")
+    return await db.run(
+        map_service.get_clusters, (west, south, east, north), zoom,
+        lambda query: _apply_incident_filters(query, status, from_date, to_date),
+    )
+
+@router.get("/map/tiles/{z}/{x}/{y}.mvt")
+async def get_map_tile(
+    z: int,
+    x: int,
+    y: int,
+    status: Optional[str] = None,
+    from_date: Optional[str] = None,
+    to_date: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
+    db: DbSession = Depends(get_db_session),
+    current_admin: Principal = Depends(get_admin_user(1))
+):
+    """
+    Mapbox Vector Tile with an `incidents` layer of cluster points (`count`,
+    plus `incident_id` and `status` for single incidents). Tiles are cached
+    per filter and rebuilt once an incident inside them changes, whichever
+    process made the change; revalidate with If-None-Match.
+    """
+    if not (0 <= z <= map_service.MAX_ZOOM and 0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        raise HTTPException(status_code=404, detail="Tile not found")
+    tile, etag = await db.run(
+        map_service.get_tile, z, x, y, (status or "all", from_date or "", to_date or ""),
+        lambda query: _apply_incident_filters(query, status, from_date, to_date),
+    )
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if if_none_match == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=tile, media_type="application/vnd.mapbox-vector-tile", headers=headers)
+
 # Get incident file
 @router.get("/incidents/file/{incident_id}")
-def get_incident_file(
+async def get_incident_file(
     incident_id: int, 
-    db: Session = Depends(get_db),
-    current_admin: models.User = Depends(get_admin_user(1))
+    request: Request,
+    db: DbSession = Depends(get_db_session),
+    current_admin: Principal = Depends(get_admin_user(1))
 ):
-    incident = db.query(models.Incident).filter(models.Incident.id == incident_id).first()
-    if not incident or not incident.media_url:
+    media = await db.run(incident_service.get_incident_file, incident_id, "media")
+    if not media:
         raise HTTPException(status_code=404, detail="File not found")
     
-    file_path = incident.media_url
-    if not os.path.exists(file_path):
-        raise HTTPException(status_code=404, detail="File not found on server")
-    
-    return FileResponse(file_path)
+    # 404s on its own if the file is missing from disk
+    return await media_service.media_response(request, media, private=True)
 
 # Get incident video
 @router.get("/incidents/video/{incident_id}")
-def get_incident_video(
+async def get_incident_video(
     incident_id: int, 
-    db: Session = Depends(get_db),
-    current_admin: models.User = Depends(get_admin_user(1))
+    request: Request,
+    db: DbSession = Depends(get_db_session),
+    current_admin: Principal = Depends(get_admin_user(1))
 ):
-    incident = db.query(models.Incident).filter(models.Incident.id == incident_id).first()
-    if not incident or not incident.video_url:
+    media = await db.run(incident_service.get_incident_file, incident_id, "video")
+    if not media:
         raise HTTPException(status_code=404, detail="Video not found")
     
-    file_path = incident.video_url
-    if not os.path.exists(file_path):
-        raise HTTPException(status_code=404, detail="Video not found on server")
-    
-    return FileResponse(file_path)
+    # 404s on its own if the file is missing from disk
+    return await media_service.media_response(request, media, private=True)
 
 # Get all users (admin level access)
 @router.get("/users", response_model=List[schemas.UserInfo])
-def get_all_users(
-    db: Session = Depends(get_db), 
-    current_admin: models.User = Depends(get_admin_user(2))
+async def get_all_users(
+    db: DbSession = Depends(get_db_session), 
+    current_admin: Principal = Depends(get_admin_user(2))
 ):
-    users = db.query(models.User).all()
+    users = await db.run(user_service.list_users)
     return users
 
 # Get specific user
 @router.get("/users/{user_id}", response_model=schemas.UserInfo)
-def get_user(
+async def get_user(
     user_id: int,
-    db: Session = Depends(get_db),
-    current_admin: models.User = Depends(get_admin_user(2))
+    db: DbSession = Depends(get_db_session),
+    current_admin: Principal = Depends(get_admin_user(2))
 ):
-    user = db.query(models.User).filter(models.User.id == user_id).first()
+    user = await db.run(user_service.get_user, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     return user
 
 # Create new user (admin only)
 @router.post("/users", response_model=schemas.UserInfo)
-def create_user(
+async def create_user(
     user_data: schemas.UserCreate,
-    db: Session = Depends(get_db),
-    current_admin: models.User = Depends(get_admin_user(2))
+    db: DbSession = Depends(get_db_session),
+    current_admin: Principal = Depends(get_admin_user(2))
 ):
     # Check if user with this email already exists
-    existing_user = db.query(models.User).filter(models.User.email == user_data.email).first()
+    existing_user = await db.run(user_service.get_user_by_email, user_data.email)
     if existing_user:
         raise HTTPException(status_code=400, detail="Email already registered")
     
     # Hash the password
-    hashed_password = hash_password(user_data.password)
+    hashed_password = await hash_password_async(user_data.password)
     
     # Create new user
     new_user = models.User(
@@ -198,152 +370,166 @@ def create_user(
         admin_level=user_data.admin_level
     )
     
-    db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    new_user = await db.run(user_service.save_user, new_user)
+    stats_service.invalidate_admin_stats()
     return new_user
 
 # Update user (admin only)
 @router.put("/users/{user_id}", response_model=schemas.UserInfo)
-def update_user(
+async def update_user(
     user_id: int,
     user_data: schemas.UserCreate,
-    db: Session = Depends(get_db),
-    current_admin: models.User = Depends(get_admin_user(2))
+    db: DbSession = Depends(get_db_session),
+    current_admin: Principal = Depends(get_admin_user(2))
 ):
-    user = db.query(models.User).filter(models.User.id == user_id).first()
+    user = await db.run(user_service.get_user, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
     # Update email if it's not already used by another user
     if user_data.email != user.email:
-        existing_user = db.query(models.User).filter(models.User.email == user_data.email).first()
+        existing_user = await db.run(user_service.get_user_by_email, user_data.email)
         if existing_user:
             raise HTTPException(status_code=400, detail="Email already registered")
         user.email = user_data.email
     
     # Update password if provided
     if user_data.password:
-        user.password = hash_password(user_data.password)
+        user.password = await hash_password_async(user_data.password)
     
     # Update admin status
     user.is_admin = user_data.is_admin
     user.admin_level = user_data.admin_level
     
-    db.commit()
-    db.refresh(user)
+    user = await db.run(user_service.save_user, user)
+    # Tokens issued to this user must be re-verified against the new row
+    invalidate_user(user.id)
+    stats_service.invalidate_admin_stats()
     return user
 
 # Delete user (admin only)
 @router.delete("/users/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_user(
+async def delete_user(
     user_id: int,
-    db: Session = Depends(get_db),
-    current_admin: models.User = Depends(get_admin_user(2))
+    db: DbSession = Depends(get_db_session),
+    current_admin: Principal = Depends(get_admin_user(2))
 ):
-    user = db.query(models.User).filter(models.User.id == user_id).first()
+    user = await db.run(user_service.get_user, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    db.delete(user)
-    db.commit()
+    await db.run(user_service.delete_user, user)
+    invalidate_user(user_id)
+    stats_service.invalidate_admin_stats()
     return {"status": "success"}
 
-@router.get("/stats", response_model=schemas.AdminStats)
-def get_admin_stats(
-    db: Session = Depends(get_db),
-    current_admin: models.User = Depends(get_admin_user(1))
+# Runtime metrics (admin level access)
+@router.get("/metrics", response_model=dict)
+async def get_runtime_metrics(
+    current_admin: Principal = Depends(get_admin_user(2))
 ):
-    """Get statistics for the admin dashboard."""
-    
-    # Get total incidents count
-    total_incidents = db.query(func.count(models.Incident.id)).scalar()
-    
-    # Get counts by status
-    submitted_incidents = db.query(func.count(models.Incident.id)).filter(
-        models.Incident.status.in_(["submitted", "pending"])
-    ).scalar()
-    
-    under_process_incidents = db.query(func.count(models.Incident.id)).filter(
-        models.Incident.status.in_(["under_process", "in_progress"])
-    ).scalar()
-    
-    resolved_incidents = db.query(func.count(models.Incident.id)).filter(
-        models.Incident.status == "resolved"
-    ).scalar()
-    
-    rejected_incidents = db.query(func.count(models.Incident.id)).filter(
-        models.Incident.status == "rejected"
-    ).scalar()
-    
-    # Get total users count
-    total_users = db.query(func.count(models.User.id)).scalar()
-    
-    # Get count of admin users
-    admin_users = db.query(func.count(models.User.id)).filter(
-        models.User.is_admin == True
-    ).scalar()
-    
-    # Get recent incidents (last 5)
-    try:
-        # Try with all fields first (including the new ones)
-        recent_incidents = db.query(models.Incident).order_by(desc(models.Incident.created_at)).limit(5).all()
-    except Exception as e:
-        # If that fails, use a more restricted query that only selects specific columns
-        recent_incidents = db.query(
-            models.Incident.id,
-            models.Incident.user_id,
-            models.Incident.title,
-            models.Incident.description,
-            models.Incident.latitude,
-            models.Incident.longitude,
-            models.Incident.media_url,
-            models.Incident.status,
-            models.Incident.created_at
-        ).order_by(desc(models.Incident.created_at)).limit(5).all()
-    
+    """Worker-local runtime metrics for capacity planning"""
     return {
-        "total_incidents": total_incidents,
-        "pending_incidents": submitted_incidents,  # For backward compatibility
-        "in_progress_incidents": under_process_incidents,  # For backward compatibility
-        "resolved_incidents": resolved_incidents,
-        "rejected_incidents": rejected_incidents,
-        "total_users": total_users,
-        "admin_users": admin_users,
-        "recent_incidents": recent_incidents,
-        "incidents_last_week": total_incidents,  # Simplified for now
-        "users_last_month": total_users  # Simplified for now
+        "password_hashing": password_hash_stats(),
+        "db_pool": pool_stats(),
+        "event_feed": event_service.broadcaster.stats(),
+        "webhooks": webhook_service.delivery_stats(),
     }
 
+# Partner webhooks (admin only). Incident events are delivered from the
+# outbox in order per subscription, signed with the subscription's secret.
+@router.get("/webhooks", response_model=List[schemas.WebhookSubscription])
+async def list_webhooks(
+    db: DbSession = Depends(get_db_session),
+    current_admin: Principal = Depends(get_admin_user(2))
+):
+    """Subscriptions with their delivery backlog and lag"""
+    return await db.run(webhook_service.list_subscriptions)
+
+@router.post("/webhooks", response_model=schemas.WebhookSubscriptionSecret, status_code=status.HTTP_201_CREATED)
+async def create_webhook(
+    subscription_data: schemas.WebhookSubscriptionCreate,
+    db: DbSession = Depends(get_db_session),
+    current_admin: Principal = Depends(get_admin_user(2))
+):
+    """Subscribe an endpoint to incident events from now on; the response carries its signing secret"""
+    return await db.run(webhook_service.create_subscription, subscription_data)
+
+async def _get_webhook(db: DbSession, subscription_id: int) -> models.WebhookSubscription:
+    subscription = await db.run(webhook_service.get_subscription, subscription_id)
+    if not subscription:
+        raise HTTPException(status_code=404, detail="Webhook not found")
+    return subscription
+
+@router.patch("/webhooks/{subscription_id}", response_model=schemas.WebhookSubscription)
+async def update_webhook(
+    subscription_id: int,
+    subscription_update: schemas.WebhookSubscriptionUpdate,
+    db: DbSession = Depends(get_db_session),
+    current_admin: Principal = Depends(get_admin_user(2))
+):
+    """Change a subscription, or pause it with active=false (events keep accumulating)"""
+    subscription = await _get_webhook(db, subscription_id)
+    return await db.run(webhook_service.update_subscription, subscription, subscription_update)
+
+@router.post("/webhooks/{subscription_id}/rotate-secret", response_model=schemas.WebhookSubscriptionSecret)
+async def rotate_webhook_secret(
+    subscription_id: int,
+    db: DbSession = Depends(get_db_session),
+    current_admin: Principal = Depends(get_admin_user(2))
+):
+    """Replace the signing secret; the new one is only shown in this response"""
+    subscription = await _get_webhook(db, subscription_id)
+    return await db.run(webhook_service.rotate_secret, subscription)
+
+@router.delete("/webhooks/{subscription_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_webhook(
+    subscription_id: int,
+    db: DbSession = Depends(get_db_session),
+    current_admin: Principal = Depends(get_admin_user(2))
+):
+    subscription = await _get_webhook(db, subscription_id)
+    await db.run(webhook_service.delete_subscription, subscription)
+
+@router.get("/webhooks/{subscription_id}/dead-letters", response_model=List[schemas.WebhookDeadLetter])
+async def list_webhook_dead_letters(
+    subscription_id: int,
+    limit: int = Query(100, ge=1, le=1000),
+    db: DbSession = Depends(get_db_session),
+    current_admin: Principal = Depends(get_admin_user(2))
+):
+    """Events given up on for this subscription, newest first"""
+    await _get_webhook(db, subscription_id)
+    return await db.run(webhook_service.list_dead_letters, subscription_id, limit)
+
+@router.get("/stats", response_model=schemas.AdminStats)
+async def get_admin_stats(
+    db: DbSession = Depends(get_db_session),
+    current_admin: Principal = Depends(get_admin_user(1))
+):
+    """Get statistics for the admin dashboard."""
+    return await stats_service.get_admin_stats(db)
+
 # Generate report
 @router.get("/reports/incidents", response_model=schemas.ReportData)
-def generate_incident_report(
+async def generate_incident_report(
     status: Optional[str] = None,
     from_date: Optional[str] = None,
     to_date: Optional[str] = None,
-    db: Session = Depends(get_db),
-    current_admin: models.User = Depends(get_admin_user(1))
+    db: DbSession = Depends(get_db_session),
+    current_admin: Principal = Depends(get_admin_user(1))
 ):
     """Generate a report of incidents"""
     
-    query = db.query(models.Incident)
-    
-    # Apply date filters if provided
-    if from_date:
-        from_datetime = datetime.strptime(from_date, "%Y-%m-%d")
-        query = query.filter(models.Incident.created_at >= from_datetime)
-    
-    if to_date:
-        to_datetime = datetime.strptime(to_date, "%Y-%m-%d")
-        to_datetime = to_datetime + timedelta(days=1)  # Include the entire day
-        query = query.filter(models.Incident.created_at < to_datetime)
-    
-    # Apply status filter if provided
-    if status:
-        query = query.filter(models.Incident.status == status)
+    def load_incidents(session: Session):
+        query = _apply_incident_filters(
+            incident_service.with_media(session.query(models.Incident)), status, from_date, to_date
+        )
+        return query.order_by(desc(models.Incident.created_at)).all()
     
     # Get incidents
-    incidents = query.order_by(desc(models.Incident.created_at)).all()
+    incidents = await db.run(load_incidents)
+    await media_service.attach_signed_urls(db, incidents)
     
     # Get counts by status
     status_counts = {
@@ -363,68 +549,90 @@ def generate_incident_report(
         "incidents": incidents
     }
 
+# Columns written by the CSV export, in order
+CSV_EXPORT_COLUMNS = [
+    ("ID", models.Incident.id),
+    ("User ID", models.Incident.user_id),
+    ("Title", models.Incident.title),
+    ("Description", models.Incident.description),
+    ("Latitude", models.Incident.latitude),
+    ("Longitude", models.Incident.longitude),
+    ("Status", models.Incident.status),
+    ("Admin Remarks", models.Incident.admin_remarks),
+    ("Created At", models.Incident.created_at),
+    ("Updated At", models.Incident.updated_at),
+]
+# Rows fetched per server-side cursor round trip, and rows per emitted chunk
+CSV_EXPORT_BATCH_SIZE = 1000
+
+def _stream_incidents_csv(db: Session, query, compress: bool):
+    """
+    Yield the export as encoded chunks while rows are still arriving from a
+    server-side cursor, so memory use does not grow with the date range.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # wbits=31 produces a gzip container rather than a raw zlib stream
+    compressor = zlib.compressobj(wbits=31) if compress else None
+
+    def drain() -> bytes:
+        data = buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+        return compressor.compress(data) if compressor else data
+
+    try:
+        writer.writerow([header for header, _ in CSV_EXPORT_COLUMNS])
+        rows_in_buffer = 0
+        for row in query.yield_per(CSV_EXPORT_BATCH_SIZE):
+            writer.writerow(row)
+            rows_in_buffer += 1
+            if rows_in_buffer >= CSV_EXPORT_BATCH_SIZE:
+                chunk = drain()
+                if chunk:
+                    yield chunk
+                rows_in_buffer = 0
+        chunk = drain()
+        if compressor:
+            chunk += compressor.flush()
+        if chunk:
+            yield chunk
+    finally:
+        db.close()
+
 # Export incidents to CSV
 @router.get("/reports/incidents/csv")
 def export_incidents_to_csv(
     status: Optional[str] = None,
     from_date: Optional[str] = None,
     to_date: Optional[str] = None,
-    db: Session = Depends(get_db),
-    current_admin: models.User = Depends(get_admin_user(1))
+    gzip: bool = False,
+    current_admin: Principal = Depends(get_admin_user(1))
 ):
-    """Export incidents to CSV file"""
-    
-    # Get incidents with filters
-    query = db.query(models.Incident)
-    
-    if status:
-        query = query.filter(models.Incident.status == status)
+    """Export incidents to CSV file, streamed as it is generated"""
     
-    if from_date:
-        from_datetime = datetime.strptime(from_date, "%Y-%m-%d")
-        query = query.filter(models.Incident.created_at >= from_datetime)
-    
-    if to_date:
-        to_datetime = datetime.strptime(to_date, "%Y-%m-%d")
-        to_datetime = to_datetime + timedelta(days=1)
-        query = query.filter(models.Incident.created_at < to_datetime)
-    
-    incidents = query.order_by(desc(models.Incident.created_at)).all()
-    
-    # Create CSV file in memory
-    output = io.StringIO()
-    writer = csv.writer(output)
-    
-    # Write header
-    writer.writerow([
-        "ID", "User ID", "Title", "Description", "Latitude", "Longitude", 
-        "Status", "Admin Remarks", "Created At", "Updated At"
-    ])
-    
-    # Write data
-    for incident in incidents:
-        writer.writerow([
-            incident.id,
-            incident.user_id,
-            incident.title,
-            incident.description,
-            incident.latitude,
-            incident.longitude,
-            incident.status,
-            incident.admin_remarks,
-            incident.created_at,
-            incident.updated_at
-        ])
-    
-    # Prepare response
-    output.seek(0)
+    # The stream outlives the request's dependencies, so it owns its session.
+    # It always uses the sync engine: the generator is iterated in the
+    # threadpool and reads from a server-side cursor.
+    db = SessionLocal()
+    try:
+        query = _apply_incident_filters(
+            db.query(*[column for _, column in CSV_EXPORT_COLUMNS]), status, from_date, to_date
+        ).order_by(desc(models.Incident.created_at), desc(models.Incident.id))
+    except Exception:
+        db.close()
+        raise
     
     # Generate filename with timestamp
     filename = f"incidents_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-    
-    # Return CSV as a downloadable file
-    return FileResponse(
-        path=output.getvalue(),
-        media_type="text/csv",
-        filename=filename
-    )
\ No newline at end of file
+    media_type = "text/csv"
+    if gzip:
+        filename += ".gz"
+        media_type = "application/gzip"
+    
+    return StreamingResponse(
+        _stream_incidents_csv(db, query, gzip),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+        background=BackgroundTask(db.close),
+    )
@@ -1,39 +1,31 @@
 # app/routers/auth_router.py
 from datetime import timedelta
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
 from ..db import models, schemas
-from ..db.database import SessionLocal
+from ..db.database import DbSession, get_db_session
 # from ..services.auth_service import hash_password, verify_password
-from ..core.security import create_access_token, hash_password, verify_password  # Change this import
+from ..core.security import create_access_token, hash_password_async, verify_password_async  # Change this import
+from ..services import stats_service, user_service
 
 router = APIRouter(prefix="/auth", tags=["Auth"])
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 @router.post("/register")
-def register_user(user_data: schemas.UserCreate, db: Session = Depends(get_db)):
+async def register_user(user_data: schemas.UserCreate, db: DbSession = Depends(get_db_session)):
     # Check if user exists
-    existing_user = db.query(models.User).filter_by(email=user_data.email).first()
+    existing_user = await db.run(user_service.get_user_by_email, user_data.email)
     if existing_user:
         raise HTTPException(status_code=400, detail="Email already registered")
 
-    hashed_pw = hash_password(user_data.password)
+    hashed_pw = await hash_password_async(user_data.password)
     new_user = models.User(email=user_data.email, password=hashed_pw)
-    db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    new_user = await db.run(user_service.save_user, new_user)
+    stats_service.invalidate_admin_stats()
     return {"msg": "User registered", "user_id": new_user.id}
 
 @router.post("/login")
-def login_user(login_data: schemas.UserLogin, db: Session = Depends(get_db)):
-    user = db.query(models.User).filter_by(email=login_data.email).first()
-    if not user or not verify_password(login_data.password, user.password):
+async def login_user(login_data: schemas.UserLogin, db: DbSession = Depends(get_db_session)):
+    user = await db.run(user_service.get_user_by_email, login_data.email)
+    if not user or not await verify_password_async(login_data.password, user.password):
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
     # Create and return token here
@@ -1,71 +1,95 @@
 # app/routers/incident_router.py
+import base64
+import json
 import os
-import uuid
-from fastapi import APIRouter, Depends, HTTPException, status, File, UploadFile, Form
-from fastapi.responses import FileResponse
-from sqlalchemy.orm import Session
+from datetime import datetime, timedelta
+from fastapi import APIRouter, Depends, HTTPException, status, Form, Header, Query, Request, Response
 from typing import List, Optional
-from ..db.database import SessionLocal
+from pydantic import ValidationError
+from ..core import config
+from ..db.database import DbSession, get_db_session
 from ..db import models, schemas
-from ..services.auth_service import get_current_user
+from ..services.auth_service import Principal, get_current_user
+from ..services import event_service, idempotency_service, incident_service, media_service, resumable_upload_service, upload_service
 
 router = APIRouter(prefix="/incidents", tags=["Incidents"])
 
 # Ensure uploads directory exists
 os.makedirs("uploads", exist_ok=True)
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+DEFAULT_SYNC_PAGE_SIZE = 100
+MAX_SYNC_PAGE_SIZE = 500
+
+async def _claim_idempotency_key(
+    db: DbSession, user_id: int, key: Optional[str], endpoint: str
+) -> Optional[models.IdempotencyKey]:
+    """Claim the request's Idempotency-Key before the body is read (None without the header)"""
+    if key is None:
+        return None
+    return await db.run(idempotency_service.claim, user_id, key, endpoint)
+
+async def _replay(db: DbSession, record: models.IdempotencyKey, response: Response) -> models.Incident:
+    """The incident created by the first request with this key"""
+    incident = await db.run(incident_service.get_incident, record.incident_id)
+    if incident is None:
+        raise HTTPException(status_code=status.HTTP_410_GONE, detail="The incident created with this Idempotency-Key was deleted")
+    response.headers["Idempotent-Replayed"] = "true"
+    await media_service.attach_signed_urls(db, [incident])
+    return incident
 
-@router.post("/", response_model=schemas.Incident)
+@router.post(
+    "/",
+    response_model=schemas.Incident,
+    openapi_extra=upload_service.multipart_openapi(schemas.IncidentCreate, {"media_file": False, "video_file": False}),
+)
 async def create_incident(
-    title: str = Form(...),
-    description: str = Form(...),
-    latitude: float = Form(...),
-    longitude: float = Form(...),
-    media_file: Optional[UploadFile] = File(None),
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    request: Request,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+    db: DbSession = Depends(get_db_session),
+    current_user: Principal = Depends(get_current_user)
 ):
-    """Create a new incident with media attachment"""
+    """Create a new incident with media and/or video attachments"""
+    # A retried request (same Idempotency-Key) gets the first request's
+    # incident back without its body being read again
+    record = await _claim_idempotency_key(db, current_user.id, idempotency_key, "POST /incidents/")
+    if record is not None and record.incident_id is not None:
+        return await _replay(db, record, response)
+    try:
+        return await _create_incident(request, db, current_user, record)
+    except BaseException:
+        if record is not None:
+            await db.run(idempotency_service.release, record)
+        raise
+
+async def _create_incident(
+    request: Request, db: DbSession, current_user: Principal, record: Optional[models.IdempotencyKey]
+) -> models.Incident:
+    # The files are streamed (and hashed) into the staging directory while
+    # the body is read, then moved into the content-addressed media store.
+    # Videos are probed and transcoded to HLS by the job worker afterwards.
+    form = await upload_service.receive_multipart(request, file_fields={"media_file", "video_file"})
+    incident_data = form.validate(schemas.IncidentCreate)
     try:
         # Create incident object
         incident = models.Incident(
             user_id=current_user.id,
-            title=title,
-            description=description,
-            latitude=latitude,
-            longitude=longitude,
+            title=incident_data.title,
+            description=incident_data.description,
+            latitude=incident_data.latitude,
+            longitude=incident_data.longitude,
             status="submitted"  # Initial status
         )
         
-        # Handle image upload if provided
-        if media_file and media_file.filename:
-            try:
-                file_extension = os.path.splitext(media_file.filename)[1]
-                filename = f"{uuid.uuid4()}{file_extension}"
-                file_path = os.path.join("uploads", filename)
-                
-                # Make sure uploads directory exists
-                os.makedirs("uploads", exist_ok=True)
-                
-                with open(file_path, "wb") as buffer:
-                    buffer.write(await media_file.read())
-                
-                incident.media_url = file_path
-            except Exception as e:
-                # Log error but continue with creating incident
-                print(f"Error saving file: {str(e)}")
-        
-        db.add(incident)
-        db.commit()
-        db.refresh(incident)
+        attachments = [("media", form.first_file("media_file")), ("video", form.first_file("video_file"))]
+        incident = await db.run(
+            incident_service.add_incident, incident, attachments, record
+        )
+        await media_service.attach_signed_urls(db, [incident])
+        event_service.incident_created(incident)
         return incident
     except Exception as e:
+        form.discard()
         # Ensure we return a proper JSON response
         print(f"Error creating incident: {str(e)}")
         raise HTTPException(
@@ -73,70 +97,171 @@ async def create_incident(
             detail=f"Error creating incident: {str(e)}"
         )
 
-@router.post("/multiple", response_model=schemas.Incident)
+@router.post(
+    "/multiple",
+    response_model=schemas.Incident,
+    openapi_extra=upload_service.multipart_openapi(schemas.IncidentCreate, {"files": True}),
+)
 async def create_incident_with_multiple_files(
-    title: str = Form(...),
-    description: str = Form(...),
-    latitude: float = Form(...),
-    longitude: float = Form(...),
-    files: List[UploadFile] = File([]),
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    request: Request,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+    db: DbSession = Depends(get_db_session),
+    current_user: Principal = Depends(get_current_user)
 ):
     """Create a new incident with multiple file attachments"""
+    record = await _claim_idempotency_key(db, current_user.id, idempotency_key, "POST /incidents/multiple")
+    if record is not None and record.incident_id is not None:
+        return await _replay(db, record, response)
+    try:
+        return await _create_incident_with_multiple_files(request, db, current_user, record)
+    except BaseException:
+        if record is not None:
+            await db.run(idempotency_service.release, record)
+        raise
+
+async def _create_incident_with_multiple_files(
+    request: Request, db: DbSession, current_user: Principal, record: Optional[models.IdempotencyKey]
+) -> models.Incident:
+    # Files are written off the event loop while the rest of the body is
+    # still arriving, a few writes at a time (UPLOAD_WRITE_CONCURRENCY)
+    form = await upload_service.receive_multipart(request, file_fields={"files"})
+    incident_data = form.validate(schemas.IncidentCreate)
     
     # Create incident object
     incident = models.Incident(
         user_id=current_user.id,
-        title=title,
-        description=description,
-        latitude=latitude,
-        longitude=longitude,
+        title=incident_data.title,
+        description=incident_data.description,
+        latitude=incident_data.latitude,
+        longitude=incident_data.longitude,
         status="submitted"  # Initial status
     )
     
-    # Save first image as the main media_url
-    if files and len(files) > 0:
-        file_extension = os.path.splitext(files[0].filename)[1]
-        filename = f"{uuid.uuid4()}{file_extension}"
-        file_path = os.path.join("uploads", filename)
-        
-        with open(file_path, "wb") as buffer:
-            buffer.write(await files[0].read())
-        
-        incident.media_url = file_path
-        
-        # Add additional files to additional_media field
-        additional_media = []
-        for i in range(1, len(files)):
-            file = files[i]
-            file_extension = os.path.splitext(file.filename)[1]
-            filename = f"{uuid.uuid4()}{file_extension}"
-            file_path = os.path.join("uploads", filename)
-            
-            with open(file_path, "wb") as buffer:
-                buffer.write(await file.read())
-            
-            additional_media.append(file_path)
-        
-        incident.additional_media = additional_media
+    # First file becomes the main media_url, the rest go to additional_media
+    files = form.files.get("files", [])
+    attachments = [("media" if index == 0 else "additional", stored) for index, stored in enumerate(files)]
     
-    db.add(incident)
-    db.commit()
-    db.refresh(incident)
+    try:
+        incident = await db.run(
+            incident_service.add_incident, incident, attachments, record
+        )
+    except Exception:
+        form.discard()
+        raise
+    await media_service.attach_signed_urls(db, [incident])
+    event_service.incident_created(incident)
     return incident
 
+def _rejected(index: int, entry, errors: list) -> schemas.IncidentBatchItemResult:
+    client_id = entry.get("client_id") if isinstance(entry, dict) else None
+    return schemas.IncidentBatchItemResult(
+        index=index,
+        client_id=client_id if isinstance(client_id, str) else None,
+        status="rejected",
+        errors=errors,
+    )
+
+def _batch_reports(entries: list, files: List[upload_service.StoredFile]):
+    """
+    Validate each report and resolve its file indexes. Returns the accepted
+    reports as (index, item, attachments) and a rejection per invalid one;
+    a file can belong to one report only.
+    """
+    accepted, rejected, used = [], [], set()
+    for index, entry in enumerate(entries):
+        try:
+            item = schemas.IncidentBatchItem.model_validate(entry)
+        except ValidationError as e:
+            rejected.append(_rejected(index, entry, [
+                {"loc": list(error["loc"]), "msg": error["msg"], "type": error["type"]} for error in e.errors()
+            ]))
+            continue
+        refs = [("media", item.media), ("video", item.video)] + [("additional", ref) for ref in item.additional]
+        refs = [(kind, ref) for kind, ref in refs if ref is not None]
+        errors = []
+        for kind, ref in refs:
+            if not 0 <= ref < len(files):
+                errors.append({"loc": [kind], "msg": f"No file at index {ref}", "type": "value_error"})
+            elif ref in used or [other for _, other in refs].count(ref) > 1:
+                errors.append({"loc": [kind], "msg": f"File {ref} is attached to another report", "type": "value_error"})
+        if errors:
+            rejected.append(_rejected(index, entry, errors))
+            continue
+        used.update(ref for _, ref in refs)
+        accepted.append((index, item, [(kind, files[ref]) for kind, ref in refs]))
+    return accepted, rejected
+
+@router.post(
+    "/batch",
+    response_model=schemas.IncidentBatchResult,
+    openapi_extra=upload_service.multipart_openapi(schemas.IncidentBatchForm, {"files": True}),
+)
+async def create_incident_batch(
+    request: Request,
+    db: DbSession = Depends(get_db_session),
+    current_user: Principal = Depends(get_current_user)
+):
+    """Create several incidents in one request, e.g. reports queued while offline"""
+    # All valid reports are inserted together with one commit; invalid ones
+    # are reported back per item and do not stop the rest
+    if request.headers.get("content-type", "").split(";")[0].strip() == "application/json":
+        # Reports without files can be sent as a plain JSON list
+        form = upload_service.StreamedForm()
+        text = await upload_service.read_body(request, config.MAX_FORM_FIELD_SIZE)
+    else:
+        form = await upload_service.receive_multipart(request, file_fields={"files"})
+        text = form.validate(schemas.IncidentBatchForm).incidents
+    try:
+        entries = json.loads(text)
+    except ValueError:
+        entries = None
+    if not isinstance(entries, list):
+        form.discard()
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="incidents must be a JSON list")
+    if len(entries) > config.INCIDENT_BATCH_MAX_ITEMS:
+        form.discard()
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"A batch can hold at most {config.INCIDENT_BATCH_MAX_ITEMS} incidents",
+        )
+
+    accepted, results = _batch_reports(entries, form.files.get("files", []))
+    try:
+        incidents = await db.run(
+            incident_service.add_incidents, current_user.id, [(item, attachments) for _, item, attachments in accepted]
+        )
+    finally:
+        form.discard()  # Files no accepted report uses; stored ones are no longer staged
+    if incidents:
+        await media_service.attach_signed_urls(db, incidents)
+        for incident in incidents:
+            event_service.incident_created(incident)
+    results += [
+        schemas.IncidentBatchItemResult(index=index, client_id=item.client_id, status="created", incident=incident)
+        for (index, item, _), incident in zip(accepted, incidents)
+    ]
+    results.sort(key=lambda result: result.index)
+    return schemas.IncidentBatchResult(created=len(incidents), rejected=len(results) - len(incidents), results=results)
+
 @router.post("/livestream", response_model=schemas.Incident)
 async def create_livestream_incident(
+    response: Response,
     title: str = Form(...),
     description: str = Form(...),
     latitude: float = Form(...),
     longitude: float = Form(...),
     livestream_url: str = Form(...),
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+    db: DbSession = Depends(get_db_session),
+    current_user: Principal = Depends(get_current_user)
 ):
     """Create a new incident with livestream URL"""
+    # The form is parsed before the handler runs, so only the insert is
+    # skipped on a replay here
+    record = await _claim_idempotency_key(db, current_user.id, idempotency_key, "POST /incidents/livestream")
+    if record is not None and record.incident_id is not None:
+        return await _replay(db, record, response)
     
     incident = models.Incident(
         user_id=current_user.id,
@@ -148,47 +273,201 @@ async def create_livestream_incident(
         status="submitted"
     )
     
-    db.add(incident)
-    db.commit()
-    db.refresh(incident)
+    try:
+        incident = await db.run(incident_service.add_incident, incident, (), record)
+    except BaseException:
+        if record is not None:
+            await db.run(idempotency_service.release, record)
+        raise
+    event_service.incident_created(incident)
     return incident
 
 @router.get("/media/{incident_id}")
-def get_incident_media(incident_id: int, db: Session = Depends(get_db)):
+async def get_incident_media(incident_id: int, request: Request, db: DbSession = Depends(get_db_session)):
     """Get media file for an incident"""
-    incident = db.query(models.Incident).filter(models.Incident.id == incident_id).first()
-    if not incident or not incident.media_url:
+    media = await db.run(incident_service.get_incident_file, incident_id, "media")
+    if not media:
         raise HTTPException(status_code=404, detail="Media not found")
     
-    return FileResponse(incident.media_url)
+    return await media_service.media_response(request, media)
 
 @router.get("/video/{incident_id}")
-def get_incident_video(incident_id: int, db: Session = Depends(get_db)):
+async def get_incident_video(incident_id: int, request: Request, db: DbSession = Depends(get_db_session)):
     """Get video file for an incident"""
-    incident = db.query(models.Incident).filter(models.Incident.id == incident_id).first()
-    if not incident or not incident.video_url:
+    media = await db.run(incident_service.get_incident_file, incident_id, "video")
+    if not media:
         raise HTTPException(status_code=404, detail="Video not found")
     
-    return FileResponse(incident.video_url)
+    return await media_service.media_response(request, media)
 
 @router.get("/additional-media/{incident_id}/{file_index}")
-def get_additional_media(incident_id: int, file_index: int, db: Session = Depends(get_db)):
+async def get_additional_media(incident_id: int, file_index: int, request: Request, db: DbSession = Depends(get_db_session)):
     """Get additional media file for an incident by index"""
-    incident = db.query(models.Incident).filter(models.Incident.id == incident_id).first()
+    media = await db.run(incident_service.get_incident_file, incident_id, "additional", file_index)
     
-    if not incident or not incident.additional_media or len(incident.additional_media) <= file_index:
+    if not media:
         raise HTTPException(status_code=404, detail="Media not found")
     
-    return FileResponse(incident.additional_media[file_index])
+    return await media_service.media_response(request, media)
 
 @router.get("/user", response_model=List[schemas.Incident])
 async def get_user_incidents(
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    db: DbSession = Depends(get_db_session),
+    current_user: Principal = Depends(get_current_user)
 ):
     """Get all incidents for the current user"""
-    incidents = db.query(models.Incident).filter(
-        models.Incident.user_id == current_user.id
-    ).order_by(models.Incident.created_at.desc()).all()
+    incidents = await db.run(incident_service.list_user_incidents, current_user.id)
+    await media_service.attach_signed_urls(db, incidents)
     
-    return incidents
\ No newline at end of file
+    return incidents
+
+def _encode_watermark(updated_at: datetime, incident_id: int) -> str:
+    raw = f"{updated_at.isoformat()}|{incident_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def _decode_watermark(watermark: str):
+    try:
+        raw = base64.urlsafe_b64decode(watermark + "=" * (-len(watermark) % 4)).decode()
+        updated_at, incident_id = raw.split("|")
+        return datetime.fromisoformat(updated_at), int(incident_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid watermark")
+
+@router.get("/sync", response_model=schemas.IncidentSync)
+async def sync_user_incidents(
+    since: Optional[str] = None,
+    limit: int = Query(DEFAULT_SYNC_PAGE_SIZE, ge=1, le=MAX_SYNC_PAGE_SIZE),
+    db: DbSession = Depends(get_db_session),
+    current_user: Principal = Depends(get_current_user)
+):
+    """Get the current user's incidents created or changed since the last sync"""
+    # Without `since` this pages through everything; afterwards only the
+    # changes come back. Clients upsert items by id: the last few seconds
+    # (SYNC_WATERMARK_LAG) are sent again in case a slow commit landed there.
+    after = _decode_watermark(since) if since else None
+    rows, now = await db.run(incident_service.sync_user_incidents, current_user.id, after, limit)
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    position = (rows[-1].updated_at, rows[-1].id) if rows else after
+    safe = now - timedelta(seconds=config.SYNC_WATERMARK_LAG)
+    if not has_more and (position is None or position[0] > safe):
+        # Hold the watermark back to the lag window, never behind the last one
+        position = max(after, (safe, 0)) if after else (safe, 0)
+    await media_service.attach_signed_urls(db, rows)
+    return {"items": rows, "watermark": _encode_watermark(*position), "has_more": has_more}
+
+# Resumable uploads: create a session, PUT chunks in order, then attach the
+# finished file to an incident. A dropped connection only loses the chunk
+# in flight; GET the session for the offset to resume from.
+
+@router.post("/uploads", response_model=schemas.UploadSession, status_code=status.HTTP_201_CREATED)
+async def create_upload(
+    upload_data: schemas.UploadSessionCreate,
+    response: Response,
+    db: DbSession = Depends(get_db_session),
+    current_user: Principal = Depends(get_current_user)
+):
+    """Start a resumable upload"""
+    upload = await db.run(resumable_upload_service.create_session, current_user.id, upload_data)
+    response.headers["Upload-Offset"] = "0"
+    return upload
+
+@router.get("/uploads/{upload_id}", response_model=schemas.UploadSession)
+async def get_upload(
+    upload_id: str,
+    response: Response,
+    db: DbSession = Depends(get_db_session),
+    current_user: Principal = Depends(get_current_user)
+):
+    """Offset (bytes received) and next chunk number of a resumable upload"""
+    upload = await db.run(resumable_upload_service.get_session, upload_id, current_user.id)
+    if not upload:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    response.headers["Upload-Offset"] = str(upload.received)
+    return upload
+
+@router.put(
+    "/uploads/{upload_id}/chunks/{chunk_number}",
+    response_model=schemas.UploadSession,
+    openapi_extra={"requestBody": {"required": True, "content": {"application/octet-stream": {"schema": {"type": "string", "format": "binary"}}}}},
+)
+async def put_upload_chunk(
+    upload_id: str,
+    chunk_number: int,
+    request: Request,
+    response: Response,
+    upload_offset: int = Header(..., alias="Upload-Offset"),
+    upload_checksum: str = Header(..., alias="Upload-Checksum"),
+    db: DbSession = Depends(get_db_session),
+    current_user: Principal = Depends(get_current_user)
+):
+    """
+    Append chunk `chunk_number` (0-based), which must start at the current
+    offset. Send `Upload-Offset: <offset>` and `Upload-Checksum: sha256 <base64>`.
+    Out-of-order or concurrent chunks get 409 with the current offset.
+    """
+    upload = await db.run(
+        resumable_upload_service.claim_session, upload_id, current_user.id, upload_offset, chunk_number
+    )
+    try:
+        received = await resumable_upload_service.write_chunk(request, upload, upload_checksum)
+    except BaseException:
+        await db.run(resumable_upload_service.release_session, upload_id)
+        raise
+    upload = await db.run(resumable_upload_service.complete_chunk, upload_id, received)
+    response.headers["Upload-Offset"] = str(upload.received)
+    return upload
+
+@router.post("/uploads/{upload_id}/finalize", response_model=schemas.Incident)
+async def finalize_upload(
+    upload_id: str,
+    finalize_data: schemas.UploadFinalize,
+    db: DbSession = Depends(get_db_session),
+    current_user: Principal = Depends(get_current_user)
+):
+    """Attach a completed upload to one of your incidents as its video, media or an additional file"""
+    if finalize_data.attach_as not in resumable_upload_service.ATTACH_FIELDS:
+        raise HTTPException(status_code=400, detail="attach_as must be one of: video, media, additional")
+    upload = await db.run(resumable_upload_service.get_session, upload_id, current_user.id)
+    if not upload:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    if upload.received != upload.size:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={"message": "Upload is incomplete", "received": upload.received, "size": upload.size},
+            headers={"Upload-Offset": str(upload.received)},
+        )
+
+    # Hold the write lease while hashing so no chunk can land meanwhile
+    upload = await db.run(
+        resumable_upload_service.claim_session, upload_id, current_user.id, upload.received, upload.chunks_received
+    )
+    try:
+        content_id = await resumable_upload_service.hash_upload(upload)
+    except HTTPException:
+        # The bytes do not match what the client declared; start over
+        await db.run(resumable_upload_service.delete_session, upload_id)
+        raise
+    except BaseException:
+        await db.run(resumable_upload_service.release_session, upload_id)
+        raise
+
+    stored = upload_service.StoredFile(
+        field_name=finalize_data.attach_as,
+        filename=upload.filename,
+        content_type=upload.content_type,
+        path=resumable_upload_service.staging_path(upload_id),
+        size=upload.size,
+        content_id=content_id,
+    )
+    incident = await db.run(
+        resumable_upload_service.attach_upload,
+        upload_id, current_user.id, finalize_data.incident_id, finalize_data.attach_as, stored,
+    )
+    if not incident:
+        await db.run(resumable_upload_service.release_session, upload_id)
+        raise HTTPException(status_code=404, detail="Incident not found")
+    await media_service.attach_signed_urls(db, [incident])
+    event_service.incident_updated(incident, event_service.CREATED_FIELDS)  # Its media changed
+    return incident
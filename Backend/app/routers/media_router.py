@@ -0,0 +1,26 @@
+# app/routers/media_router.py
+from fastapi import APIRouter, Request
+
+from ..services import media_service
+
+router = APIRouter(prefix="/media", tags=["Media"])
+
+@router.get("/{key}")
+async def get_signed_media(key: str, expires: int, signature: str, request: Request, type: str = ""):
+    """
+    Serve a file from a signed link emitted in incident responses
+    (media_signed_url and friends). The signature carries the authorization,
+    so this route needs no token, no database session and no query.
+    """
+    media = media_service.verify_signed_url(key, expires, type, signature)
+    return await media_service.media_response(request, media, private=True)
+
+@router.get("/hls/{content_id}/{expires}/{signature}/{name:path}")
+async def get_signed_stream(content_id: str, expires: int, signature: str, name: str, request: Request):
+    """
+    Serve an HLS playlist, segment or poster from a signed stream link
+    (video_stream.hls_url). Players resolve the playlists' relative URIs
+    against the same signed path.
+    """
+    media = media_service.verify_stream_url(content_id, expires, signature, name)
+    return await media_service.media_response(request, media, private=True)
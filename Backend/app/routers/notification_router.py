@@ -0,0 +1,32 @@
+# app/routers/notification_router.py
+from fastapi import APIRouter, Depends, HTTPException, status
+
+from ..db.database import DbSession, get_db_session
+from ..db import schemas
+from ..services.auth_service import Principal, get_current_user
+from ..services import notification_service
+
+router = APIRouter(prefix="/notifications", tags=["Notifications"])
+
+@router.post("/devices", response_model=schemas.DeviceToken, status_code=status.HTTP_201_CREATED)
+async def register_device(
+    device: schemas.DeviceRegister,
+    db: DbSession = Depends(get_db_session),
+    current_user: Principal = Depends(get_current_user)
+):
+    """
+    Register this device's push token for status-change notifications on
+    the user's incidents. Call on every app start and token refresh; a
+    token already registered (to anyone) is moved to this user.
+    """
+    return await db.run(notification_service.register_device, current_user.id, device.token, device.platform)
+
+@router.delete("/devices/{token}", status_code=status.HTTP_204_NO_CONTENT)
+async def unregister_device(
+    token: str,
+    db: DbSession = Depends(get_db_session),
+    current_user: Principal = Depends(get_current_user)
+):
+    """Stop sending pushes to this device, e.g. on logout"""
+    if not await db.run(notification_service.unregister_device, current_user.id, token):
+        raise HTTPException(status_code=404, detail="Device not found")
@@ -1,64 +1,81 @@
+import time
+from typing import Optional
+
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
 from jose import JWTError, jwt
+from sqlalchemy.orm import Session
 
-from ..db.database import SessionLocal
+from ..db.database import db_session
 from ..db import models
+from ..core import config
+from ..core.cache import TTLCache
 from ..core.security import SECRET_KEY, ALGORITHM, create_access_token
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+class Principal:
+    """The verified identity behind a bearer token"""
+    __slots__ = ("id", "email", "is_admin", "admin_level", "admin_token")
+
+    def __init__(self, id: int, email: str, is_admin: bool, admin_level: int, admin_token: bool = False):
+        self.id = id
+        self.email = email
+        self.is_admin = bool(is_admin)
+        self.admin_level = admin_level or 0
+        self.admin_token = admin_token  # The token carries the `admin` claim set by /admin/login
+
+# Verified principals keyed by raw token. Entries never outlive the token's
+# own expiry, and admin changes to a user evict that user's entries.
+_principal_cache = TTLCache(maxsize=config.AUTH_CACHE_SIZE, ttl=config.AUTH_CACHE_TTL)
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    credentials_exception = HTTPException(
+def _credentials_exception():
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
 
+def _load_principal(db: Session, email: str) -> Optional[Principal]:
+    row = db.query(
+        models.User.id, models.User.email, models.User.is_admin, models.User.admin_level
+    ).filter(models.User.email == email).first()
+    return Principal(*row) if row else None
+
+async def get_principal(token: str = Depends(oauth2_scheme)) -> Principal:
+    """
+    Resolve the bearer token to a Principal.
+    Cache hits cost no JWT decode and no database query; misses run the user
+    lookup through a short-lived DbSession so the event loop is never blocked.
+    """
+    principal = _principal_cache.get(token)
+    if principal is not None:
+        return principal
+
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         email: str = payload.get("sub")
         if email is None:
-            raise credentials_exception
+            raise _credentials_exception()
     except JWTError:
-        raise credentials_exception
+        raise _credentials_exception()
 
-    user = db.query(models.User).filter(models.User.email == email).first()
-    if user is None:
-        raise credentials_exception
+    async with db_session() as db:
+        principal = await db.run(_load_principal, email)
+    if principal is None:
+        raise _credentials_exception()
+    principal.admin_token = bool(payload.get("admin", False))
 
-    return user
+    expires_in = payload.get("exp", 0) - time.time()
+    _principal_cache.set(token, principal, ttl=expires_in)
+    return principal
 
-async def get_current_admin(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
+def invalidate_user(user_id: int):
+    """Drop cached principals for a user whose account changed"""
+    _principal_cache.discard_where(lambda token, principal: principal.id == user_id)
 
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        is_admin: bool = payload.get("admin", False)
-
-        if email is None or not is_admin:
-            raise credentials_exception
-    except JWTError:
-        raise credentials_exception
-
-    user = db.query(models.User).filter(models.User.email == email).first()
-    if user is None or not user.is_admin:
-        raise credentials_exception
-
-    return user
+# Any authenticated user
+get_current_user = get_principal
 
 def get_admin_user(min_level: int = 1):
     """
@@ -66,33 +83,20 @@ def get_admin_user(min_level: int = 1):
     min_level=1: Operator access
     min_level=2: Admin access
     """
-    def _get_admin_user(
-        token: str = Depends(oauth2_scheme),
-        db: Session = Depends(get_db)
-    ):
-        credentials_exception = HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Could not validate credentials",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-
-        try:
-            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-            email: str = payload.get("sub")
-            if email is None:
-                raise credentials_exception
-        except JWTError:
-            raise credentials_exception
-
-        user = db.query(models.User).filter(models.User.email == email).first()
-        if user is None:
-            raise credentials_exception
-
-        if not user.is_admin or user.admin_level < min_level:
+    async def _get_admin_user(principal: Principal = Depends(get_principal)) -> Principal:
+        if not principal.is_admin or principal.admin_level < min_level:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="Not enough permissions",
             )
+        return principal
+    return _get_admin_user
 
-        return user
-    return _get_admin_user
\ No newline at end of file
+async def get_current_admin(principal: Principal = Depends(get_principal)) -> Principal:
+    """
+    Any admin user, whatever their level, signed in through /admin/login.
+    Unlike get_admin_user this answers 401, as it always has.
+    """
+    if not principal.admin_token or not principal.is_admin:
+        raise _credentials_exception()
+    return principal
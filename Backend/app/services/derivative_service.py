@@ -0,0 +1,61 @@
+# app/services/derivative_service.py
+import os
+import uuid
+from typing import Dict, Tuple
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow is optional; without it no derivatives are produced
+    Image = None
+
+# Longest side in pixels and JPEG quality for each size variant
+VARIANT_SIZES = {
+    "thumb": (320, 75),  # Incident list
+    "preview": (1280, 82),  # Detail view
+    "blur": (16, 50),  # Placeholder shown (scaled up and blurred) while the others load
+}
+VARIANT_CONTENT_TYPE = "image/jpeg"
+_EXIF_ORIENTATION = 0x0112
+
+class DerivativeError(Exception):
+    """The source could not be turned into derivatives (not an image, or Pillow missing)"""
+
+def available() -> bool:
+    return Image is not None
+
+def supports(content_type: str) -> bool:
+    return available() and bool(content_type) and content_type.startswith("image/")
+
+def render_variants(source_path: str, targets: Dict[str, str]) -> Tuple[int, int]:
+    """
+    Write each requested variant of an image to its target path. The source
+    is decoded once, at the reduced size JPEG allows for the largest target,
+    and every file is written atomically so readers never see a partial one.
+    Returns the source's displayed (width, height).
+    """
+    if not available():
+        raise DerivativeError("Pillow is not installed")
+    largest = max(VARIANT_SIZES[variant][0] for variant in targets)
+    try:
+        with Image.open(source_path) as image:
+            width, height = image.size
+            if image.getexif().get(_EXIF_ORIENTATION, 1) in (5, 6, 7, 8):
+                width, height = height, width  # Displayed rotated by 90 degrees
+            image.draft("RGB", (largest, largest))
+            image = ImageOps.exif_transpose(image).convert("RGB")
+            for variant, target_path in targets.items():
+                size, quality = VARIANT_SIZES[variant]
+                resized = image.copy()
+                resized.thumbnail((size, size))
+                temp_path = f"{target_path}.{uuid.uuid4().hex}.tmp"
+                try:
+                    resized.save(temp_path, "JPEG", quality=quality, optimize=True)
+                    os.replace(temp_path, target_path)
+                except BaseException:
+                    if os.path.exists(temp_path):
+                        os.remove(temp_path)
+                    raise
+    except (OSError, SyntaxError, ValueError, Image.DecompressionBombError) as e:
+        # Pillow raises these for unreadable or unsupported images
+        raise DerivativeError(str(e))
+    return width, height
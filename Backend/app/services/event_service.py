@@ -0,0 +1,255 @@
+# app/services/event_service.py
+import asyncio
+import json
+import uuid
+from collections import deque
+from datetime import datetime, timedelta
+from typing import AsyncIterator, List, Optional
+
+from fastapi import HTTPException, status
+from sqlalchemy.orm import Session
+
+from ..core import config
+from ..core.cache import TTLCache
+from ..db import models
+from ..db.database import DbSession, db_session
+from . import media_service
+
+# Incident fields sent with incident.created; updates only carry what changed
+CREATED_FIELDS = (
+    "id", "user_id", "title", "status", "latitude", "longitude",
+    "media_url", "video_url", "livestream_url", "media_variants", "created_at", "updated_at",
+)
+UPDATED_FIELDS = ("id", "status", "admin_remarks", "updated_at")
+
+_RESYNC = object()  # Queued in place of the events a slow connection missed
+# Changes committed up to this long before the last one seen are polled again
+POLL_OVERLAP = timedelta(seconds=5)
+
+
+class _Subscriber:
+    """One connected dashboard and the events not yet written to it"""
+
+    def __init__(self, queue_size: int):
+        self.queue: asyncio.Queue = asyncio.Queue(queue_size)
+        self.overflowed = False
+
+
+class EventBroadcaster:
+    """
+    In-process fan-out of change events to connected admin dashboards.
+    The most recent events are kept so a reconnecting dashboard can resume
+    after its Last-Event-ID. Each connection has a bounded queue: one that
+    falls behind loses its queued events and is told to resync (reload),
+    so a slow client never holds up publishers or grows memory.
+    Publish and stream from the event loop only.
+    """
+
+    def __init__(self, buffer_size: int, queue_size: int, max_subscribers: int):
+        # Ids from an earlier process (or another worker) cannot be resumed
+        self.epoch = uuid.uuid4().hex[:8]
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self._sequence = 0
+        self._recent: deque = deque(maxlen=buffer_size)
+        self._subscribers = set()
+        self.published = 0
+        self.resyncs = 0
+
+    def _event_id(self, sequence: int) -> str:
+        return f"{self.epoch}-{sequence}"
+
+    def publish(self, event_type: str, data: dict):
+        self._sequence += 1
+        self.published += 1
+        event = (self._sequence, event_type, json.dumps(data, default=str, separators=(",", ":")))
+        self._recent.append(event)
+        for subscriber in self._subscribers:
+            if subscriber.overflowed:
+                continue  # Covered by the resync it has not sent yet
+            try:
+                subscriber.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                self._resync(subscriber)
+
+    def _resync(self, subscriber: _Subscriber):
+        subscriber.overflowed = True
+        while not subscriber.queue.empty():
+            subscriber.queue.get_nowait()
+        subscriber.queue.put_nowait(_RESYNC)
+        self.resyncs += 1
+
+    def resync_all(self):
+        """Tell every connection to reload, e.g. after more changes than are worth sending one by one"""
+        for subscriber in self._subscribers:
+            if not subscriber.overflowed:
+                self._resync(subscriber)
+
+    def check_capacity(self):
+        if len(self._subscribers) >= self.max_subscribers:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many live feed connections",
+                headers={"Retry-After": "30"},
+            )
+
+    def _missed(self, last_event_id: Optional[str]) -> Optional[list]:
+        """Buffered events after last_event_id, or None if some are no longer buffered"""
+        epoch, _, sequence = (last_event_id or "").partition("-")
+        try:
+            sequence = int(sequence)
+        except ValueError:
+            return None
+        oldest = self._recent[0][0] if self._recent else self._sequence + 1
+        if epoch != self.epoch or sequence > self._sequence or sequence < oldest - 1:
+            return None
+        return [event for event in self._recent if event[0] > sequence]
+
+    def _format(self, sequence: int, event_type: str, data: str) -> str:
+        return f"id: {self._event_id(sequence)}\nevent: {event_type}\ndata: {data}\n\n"
+
+    async def stream(self, last_event_id: Optional[str] = None) -> AsyncIterator[str]:
+        """
+        Server-Sent Events for one connection: the events missed since
+        last_event_id (or `resync` if they are gone), then live events, with
+        a comment line every EVENTS_HEARTBEAT seconds to keep proxies open.
+        A new connection starts with `ready`, carrying the current id.
+        """
+        subscriber = _Subscriber(self.queue_size)
+        # Registered and replayed without an await in between, so no event
+        # is both replayed and queued, or neither
+        self._subscribers.add(subscriber)
+        missed = self._missed(last_event_id) if last_event_id else []
+        try:
+            yield f"retry: {config.EVENTS_RETRY_MS}\n\n"
+            if missed is None:
+                self.resyncs += 1
+                yield self._format(self._sequence, "resync", "{}")
+            elif not last_event_id:
+                yield self._format(self._sequence, "ready", "{}")
+            for event in missed or ():
+                yield self._format(*event)
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscriber.queue.get(), config.EVENTS_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if event is _RESYNC:
+                    # Everything up to now is covered by the reload it triggers
+                    subscriber.overflowed = False
+                    yield self._format(self._sequence, "resync", "{}")
+                    continue
+                yield self._format(*event)
+        finally:
+            self._subscribers.discard(subscriber)
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": len(self._subscribers),
+            "published": self.published,
+            "resyncs": self.resyncs,
+            "buffered": len(self._recent),
+        }
+
+
+broadcaster = EventBroadcaster(config.EVENTS_BUFFER_SIZE, config.EVENTS_QUEUE_SIZE, config.EVENTS_MAX_SUBSCRIBERS)
+
+# Versions (id, updated_at) of incidents already published by this process,
+# so the poller does not send them again
+_published = TTLCache(maxsize=100000, ttl=POLL_OVERLAP.total_seconds() * 12)
+
+def _fields(incident, names) -> dict:
+    if isinstance(incident, dict):
+        return {name: incident.get(name) for name in names}
+    return {name: getattr(incident, name, None) for name in names}
+
+def _publish(event_type: str, data: dict):
+    _published.set((data["id"], data["updated_at"]), True)
+    broadcaster.publish(event_type, data)
+
+def incident_created(incident):
+    """Publish a new incident; call after its commit and attach_signed_urls"""
+    _publish("incident.created", _fields(incident, CREATED_FIELDS))
+
+def incident_updated(incident, fields=UPDATED_FIELDS):
+    """Publish changed fields of an incident; call after the commit"""
+    _publish("incident.updated", _fields(incident, fields))
+
+# Changes committed by other worker processes reach this process's
+# dashboards through the incidents table: updated_at moves on every create
+# and change, and is indexed for this.
+
+def _latest_change(db: Session):
+    return db.query(models.Incident.updated_at).order_by(models.Incident.updated_at.desc()).limit(1).scalar()
+
+# Every field either event sends, so an update never blanks one it did not load
+_POLLED_FIELDS = tuple(dict.fromkeys(name for name in CREATED_FIELDS + UPDATED_FIELDS if name != "media_variants"))
+
+def _changed_since(db: Session, since, limit: int, after=None) -> List[dict]:
+    """Changes from `since` on, oldest first; only those past `after` if given"""
+    query = db.query(*[getattr(models.Incident, name) for name in _POLLED_FIELDS]).filter(
+        models.Incident.updated_at >= since
+    )
+    if after is not None:
+        query = query.filter(models.Incident.updated_at > after)
+    rows = query.order_by(models.Incident.updated_at, models.Incident.id).limit(limit).all()
+    return [row._asdict() for row in rows]
+
+class ChangePoller:
+    """
+    Publishes incident changes that other processes committed, polling the
+    incidents table every EVENTS_POLL_INTERVAL seconds and skipping the
+    versions this process published itself. A row whose updated_at still
+    equals its created_at is sent as incident.created. More than
+    EVENTS_POLL_BATCH changes at once are sent as `resync`, which covers
+    every change up to the newest one, so polling carries on from there.
+    Runs inside the API process (see main.py).
+    """
+
+    def __init__(self, poll_interval: float = None):
+        self.poll_interval = poll_interval or config.EVENTS_POLL_INTERVAL
+        self._since = None
+        self._resynced_up_to = None  # Changes up to here went out as a resync
+        self._stopping = asyncio.Event()
+
+    async def run(self):
+        while not self._stopping.is_set():
+            try:
+                async with db_session() as db:
+                    await self.poll(db)
+            except Exception as e:
+                print(f"Incident change poll failed: {str(e)}")
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def poll(self, db: DbSession):
+        if self._since is None:
+            # Start from now: connected dashboards loaded everything before
+            self._since = await db.run(_latest_change) or datetime(1970, 1, 1)
+            return
+        rows = await db.run(
+            _changed_since, self._since - POLL_OVERLAP, config.EVENTS_POLL_BATCH, self._resynced_up_to
+        )
+        if not rows:
+            return
+        self._since = max(self._since, rows[-1]["updated_at"])
+        if len(rows) >= config.EVENTS_POLL_BATCH:
+            # The dashboards reload; the overlap must not find this burst again
+            self._since = max(self._since, await db.run(_latest_change))
+            self._resynced_up_to = self._since
+            broadcaster.resync_all()
+            return
+        rows = [row for row in rows if _published.get((row["id"], row["updated_at"])) is None]
+        created = [row for row in rows if row["created_at"] == row["updated_at"]]
+        await media_service.attach_signed_urls(db, created)
+        for row in rows:
+            if row["created_at"] == row["updated_at"]:
+                incident_created(row)
+            else:
+                incident_updated(row)
+
+    def stop(self):
+        self._stopping.set()
@@ -0,0 +1,125 @@
+# app/services/idempotency_service.py
+import uuid
+from datetime import datetime, timedelta
+
+from fastapi import HTTPException, status
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from ..core import config
+from ..db import models
+from .job_service import sweeper
+
+MAX_KEY_LENGTH = 255
+
+# Session-first helpers, run with DbSession.run(). A key is claimed before
+# the request body is read, and completed in the same commit that inserts
+# the incident (see incident_service.add_incident), so a crash can never
+# leave an incident whose key still looks unused. Each claim carries its
+# own token: a request that outlived its lock and lost the key to a retry
+# can neither release nor complete the retry's claim.
+
+def _in_flight(record: models.IdempotencyKey) -> HTTPException:
+    retry_after = max(1, int((record.locked_until - datetime.utcnow()).total_seconds())) if record.locked_until else 1
+    return HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail="A request with this Idempotency-Key is still in progress",
+        headers={"Retry-After": str(min(retry_after, 30))},
+    )
+
+def claim(db: Session, user_id: int, key: str, endpoint: str) -> models.IdempotencyKey:
+    """
+    Take an Idempotency-Key for a new request, or find the request that
+    already used it. The returned record has incident_id set when the
+    first request completed (replay it); otherwise this request owns the
+    key and must complete() or release() it. 409 while the first request
+    is still running, 422 if the key was used on another endpoint.
+    """
+    if not key or len(key) > MAX_KEY_LENGTH:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Idempotency-Key must be 1-{MAX_KEY_LENGTH} characters",
+        )
+    now = datetime.utcnow()
+    values = {
+        "endpoint": endpoint,
+        "incident_id": None,
+        "claim_token": uuid.uuid4().hex,
+        "locked_until": now + timedelta(seconds=config.IDEMPOTENCY_LOCK_TIMEOUT),
+        "expires_at": now + timedelta(seconds=config.IDEMPOTENCY_KEY_TTL),
+    }
+    record = models.IdempotencyKey(user_id=user_id, key=key, **values)
+    try:
+        with db.begin_nested():
+            db.add(record)
+        db.commit()
+        return record
+    except IntegrityError:
+        pass  # Seen before
+
+    existing = db.query(models.IdempotencyKey).populate_existing().filter(
+        models.IdempotencyKey.user_id == user_id, models.IdempotencyKey.key == key
+    ).first()
+    if existing is None:
+        raise _in_flight(record)  # Swept between our insert and this read; the client retries
+    expired = existing.expires_at <= now
+    abandoned = existing.incident_id is None and existing.locked_until is not None and existing.locked_until <= now
+    if expired or abandoned:
+        # Take the key over; the conditional update lets only one retry win
+        taken = db.query(models.IdempotencyKey).filter(
+            models.IdempotencyKey.id == existing.id,
+            models.IdempotencyKey.expires_at == existing.expires_at,
+            models.IdempotencyKey.locked_until == existing.locked_until
+            if existing.locked_until is not None else models.IdempotencyKey.locked_until.is_(None),
+        ).update(values, synchronize_session=False)
+        db.commit()
+        if not taken:
+            raise _in_flight(existing)
+        return db.query(models.IdempotencyKey).populate_existing().filter(
+            models.IdempotencyKey.id == existing.id
+        ).first()
+    db.commit()
+
+    if existing.endpoint != endpoint:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"This Idempotency-Key was already used for {existing.endpoint}",
+        )
+    if existing.incident_id is None:
+        raise _in_flight(existing)
+    return existing
+
+def _held(db: Session, record: models.IdempotencyKey):
+    """The key, as long as this request's claim on it has not been taken over"""
+    return db.query(models.IdempotencyKey).filter(
+        models.IdempotencyKey.id == record.id,
+        models.IdempotencyKey.claim_token == record.claim_token,
+        models.IdempotencyKey.incident_id.is_(None),
+    )
+
+def complete(db: Session, record: models.IdempotencyKey, incident_id: int):
+    """
+    Bind the claimed key to the incident; call inside the transaction that
+    inserts it. If a retry took the key over in the meantime, the whole
+    transaction is rolled back and 409 raised, so only one incident exists.
+    """
+    held = _held(db, record)
+    if not held.update({"incident_id": incident_id, "locked_until": None}, synchronize_session=False):
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="This request outlived its Idempotency-Key lock and a retry took the key over",
+            headers={"Retry-After": "1"},
+        )
+
+def release(db: Session, record: models.IdempotencyKey):
+    """Forget a claimed key whose request failed, so the client can retry with it"""
+    _held(db, record).delete(synchronize_session=False)
+    db.commit()
+
+@sweeper
+def sweep_expired_keys(db: Session):
+    db.query(models.IdempotencyKey).filter(
+        models.IdempotencyKey.expires_at < datetime.utcnow()
+    ).delete(synchronize_session=False)
+    db.commit()
@@ -1,11 +1,24 @@
 # app/services/incident_service.py
+import hashlib
 import os
 import uuid
-from fastapi import UploadFile
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+from fastapi import HTTPException, UploadFile, status
+from ..core import config
 from ..db import models, schemas
-from sqlalchemy.orm import Session
+from ..db.database import SessionLocal
+from sqlalchemy import and_, func, insert, or_
+from sqlalchemy.orm import Session, selectinload
+from . import idempotency_service, job_service, map_service, media_service, notification_service, outbox_service
+from .job_service import job_handler
+from .media_service import MediaFile
+from .upload_service import StoredFile
 
-UPLOAD_DIR = "uploads"
+UPLOAD_DIR = config.UPLOAD_DIR
+# Attachment kinds: the primary image (media_url), the video (video_url) and
+# any number of additional files, each stored as incident_media rows
+MEDIA_KINDS = ("media", "video", "additional")
 
 # In app/services/incident_service.py
 def save_incident(db: Session, user_id: int, incident_data: schemas.IncidentCreate, file_path: str = None):
@@ -15,6 +28,7 @@ def save_incident(db: Session, user_id: int, incident_data: schemas.IncidentCrea
         description=incident_data.description,
         latitude=incident_data.latitude,
         longitude=incident_data.longitude,
+        geohash=map_service.encode_geohash(incident_data.latitude, incident_data.longitude),
         media_url=file_path or ""  # Change this from media_path to media_url
     )
     db.add(new_incident)
@@ -22,13 +36,294 @@ def save_incident(db: Session, user_id: int, incident_data: schemas.IncidentCrea
     db.refresh(new_incident)
     return new_incident
 
-def save_file_to_local_disk(file: UploadFile) -> str:
-    # Generate a unique filename
+# Query helpers below take the Session first so routers can run them with
+# `await db.run(incident_service.<fn>, ...)` on either engine.
+
+def with_media(query):
+    """Load incidents' media_items with one extra query for the whole result"""
+    return query.options(selectinload(models.Incident.media_items))
+
+def _known_dimensions(db: Session, checksums: List[str]) -> Dict[str, dict]:
+    """Width, height and duration already recorded for the same content elsewhere"""
+    checksums = [checksum for checksum in checksums if checksum]
+    if not checksums:
+        return {}
+    rows = db.query(
+        models.IncidentMedia.checksum, models.IncidentMedia.width,
+        models.IncidentMedia.height, models.IncidentMedia.duration,
+    ).filter(
+        models.IncidentMedia.checksum.in_(checksums), models.IncidentMedia.width.isnot(None)
+    ).all()
+    return {row.checksum: {"width": row.width, "height": row.height, "duration": row.duration} for row in rows}
+
+def attach_files(db: Session, incident: models.Incident, attachments: Iterable[Tuple[str, StoredFile]]) -> List[str]:
+    """
+    Record stored files as the incident's media items (kind is one of
+    MEDIA_KINDS) and take references on them, in the caller's transaction.
+    A media or video file replaces the current one of that kind, keeping
+    media_url/video_url in step; additional files are appended. Returns
+    the storage keys that were replaced, for the caller to release.
+    """
+    attachments = [(kind, stored) for kind, stored in attachments if stored]
+    known = _known_dimensions(db, [stored.content_id for _, stored in attachments])
+    items = {(item.kind, item.ordinal): item for item in incident.media_items}
+    next_ordinal = 1 + max((ordinal for kind, ordinal in items if kind == "additional"), default=-1)
+
+    replaced = []
+    for kind, stored in attachments:
+        if kind == "additional":
+            ordinal, next_ordinal = next_ordinal, next_ordinal + 1
+        else:
+            ordinal = 0
+            setattr(incident, f"{kind}_url", stored.content_id)
+        item = items.get((kind, ordinal))
+        if item is None:
+            item = models.IncidentMedia(kind=kind, ordinal=ordinal)
+            incident.media_items.append(item)
+        else:
+            # Updated in place: the (incident, kind, ordinal) key is unique
+            replaced.append(item.storage_key)
+        dimensions = known.get(stored.content_id, {})
+        item.storage_key = stored.content_id
+        item.filename = stored.filename
+        item.size = stored.size
+        item.mime = stored.content_type
+        item.checksum = stored.content_id
+        item.width = dimensions.get("width")
+        item.height = dimensions.get("height")
+        item.duration = dimensions.get("duration")
+
+    if attachments:
+        incident.updated_at = func.now()  # Also when only media_items changed, for /incidents/sync
+    media_service.add_references(db, [stored for _, stored in attachments])
+    return replaced
+
+def add_incident(
+    db: Session,
+    incident: models.Incident,
+    attachments: Iterable[Tuple[str, StoredFile]] = (),
+    idempotency_key: Optional[models.IdempotencyKey] = None,
+) -> models.Incident:
+    """
+    Insert the incident with its uploaded files as (kind, file) pairs,
+    take references on them, enqueue its follow-up work and complete the
+    request's Idempotency-Key, all in the same commit
+    """
+    incident.geohash = map_service.encode_geohash(incident.latitude, incident.longitude)
+    db.add(incident)
+    attach_files(db, incident, attachments)
+    db.flush()
+    job_service.enqueue(db, "incident.created", {"incident_id": incident.id})
+    outbox_service.incidents_created(db, [incident])
+    map_service.touch_incidents(db, [incident])
+    if idempotency_key is not None:
+        idempotency_service.complete(db, idempotency_key, incident.id)
+    db.commit()
+    return get_incident(db, incident.id)
+
+def _insert_incidents(db: Session, rows: List[dict]) -> List[int]:
+    """Insert the rows, with one multi-row INSERT where RETURNING allows; returns their ids in order"""
+    if db.get_bind().dialect.insert_executemany_returning_sort_by_parameter_order:
+        return list(db.execute(
+            insert(models.Incident).returning(models.Incident.id, sort_by_parameter_order=True), rows
+        ).scalars())
+    # MySQL has no RETURNING, and the ids of a multi-row INSERT are only
+    # consecutive under some auto-increment lock modes, so each row is
+    # inserted on its own and reads back its lastrowid
+    return [db.execute(insert(models.Incident).values(row)).lastrowid for row in rows]
+
+def add_incidents(
+    db: Session, user_id: int, reports: List[Tuple[schemas.IncidentBatchItem, List[Tuple[str, StoredFile]]]]
+) -> List[models.Incident]:
+    """
+    Insert a batch of reports, each with its (kind, file) attachments: the
+    incidents (one multi-row insert where the database has RETURNING), one
+    insert for their media items and one for their jobs, with the file
+    references, all in one commit. Returns
+    the incidents in the order given.
+    """
+    if not reports:
+        return []
+    files = [stored for _, attachments in reports for _, stored in attachments]
+    known = _known_dimensions(db, [stored.content_id for stored in files])
+
+    rows = []
+    for data, attachments in reports:
+        primary = {kind: stored.content_id for kind, stored in attachments if kind != "additional"}
+        rows.append({
+            "user_id": user_id,
+            "title": data.title,
+            "description": data.description,
+            "latitude": data.latitude,
+            "longitude": data.longitude,
+            "geohash": map_service.encode_geohash(data.latitude, data.longitude),
+            "livestream_url": data.livestream_url,
+            "media_url": primary.get("media"),
+            "video_url": primary.get("video"),
+            "status": "submitted",
+        })
+    ids = _insert_incidents(db, rows)
+
+    media_rows = []
+    for incident_id, (_, attachments) in zip(ids, reports):
+        additional = 0
+        for kind, stored in attachments:
+            if kind == "additional":
+                ordinal, additional = additional, additional + 1
+            else:
+                ordinal = 0
+            dimensions = known.get(stored.content_id, {})
+            media_rows.append({
+                "incident_id": incident_id,
+                "kind": kind,
+                "ordinal": ordinal,
+                "storage_key": stored.content_id,
+                "filename": stored.filename,
+                "size": stored.size,
+                "mime": stored.content_type,
+                "checksum": stored.content_id,
+                "width": dimensions.get("width"),
+                "height": dimensions.get("height"),
+                "duration": dimensions.get("duration"),
+            })
+    if media_rows:
+        db.execute(insert(models.IncidentMedia), media_rows)
+    media_service.add_references(db, files)
+    job_service.enqueue_many(db, "incident.created", [{"incident_id": incident_id} for incident_id in ids])
+    outbox_service.incidents_created(db, [dict(row, id=incident_id) for incident_id, row in zip(ids, rows)])
+    map_service.touch_incidents(db, rows)
+    db.commit()
+
+    incidents = with_media(db.query(models.Incident)).populate_existing().filter(models.Incident.id.in_(ids)).all()
+    by_id = {incident.id: incident for incident in incidents}
+    return [by_id[incident_id] for incident_id in ids]
+
+def get_incident(db: Session, incident_id: int):
+    return with_media(db.query(models.Incident)).populate_existing().filter(
+        models.Incident.id == incident_id
+    ).first()
+
+def list_user_incidents(db: Session, user_id: int):
+    return with_media(db.query(models.Incident)).filter(
+        models.Incident.user_id == user_id
+    ).order_by(models.Incident.created_at.desc()).all()
+
+def sync_user_incidents(
+    db: Session, user_id: int, since: Optional[Tuple[datetime, int]], limit: int
+) -> Tuple[List[models.Incident], datetime]:
+    """
+    The user's incidents created or changed after the (updated_at, id)
+    position `since`, oldest change first, up to limit + 1 of them; and
+    the database clock, which updated_at is set from.
+    """
+    query = with_media(db.query(models.Incident)).filter(models.Incident.user_id == user_id)
+    if since is not None:
+        updated_at, incident_id = since
+        query = query.filter(or_(
+            models.Incident.updated_at > updated_at,
+            and_(models.Incident.updated_at == updated_at, models.Incident.id > incident_id),
+        ))
+    rows = query.order_by(models.Incident.updated_at, models.Incident.id).limit(limit + 1).all()
+    return rows, db.query(func.now()).scalar()
+
+def update_incident(db: Session, incident_id: int, incident_update: schemas.IncidentUpdate):
+    """Apply status/remarks changes; returns None if the incident does not exist"""
+    incident = get_incident(db, incident_id)
+    if not incident:
+        return None
+    previous_status = incident.status
+    previous_remarks = incident.admin_remarks
+    if incident_update.status:
+        incident.status = incident_update.status
+    if incident_update.admin_remarks is not None:
+        incident.admin_remarks = incident_update.admin_remarks
+    if incident.status != previous_status:
+        # Queued in this commit, so the reporter hears of every change that sticks
+        notification_service.status_changed(db, incident, previous_status)
+        map_service.touch_incidents(db, [incident])  # Single-incident tiles show the status
+    changed = [name for name, before in (("status", previous_status), ("admin_remarks", previous_remarks))
+               if getattr(incident, name) != before]
+    if changed:
+        outbox_service.incident_updated(db, incident, changed)
+    db.commit()
+    db.refresh(incident)
+    return incident
+
+def get_incident_file(db: Session, incident_id: int, kind: str = "media", index: int = 0) -> Optional[MediaFile]:
+    """
+    The file behind an incident's media_url ("media"), video_url ("video")
+    or additional_media[index] ("additional"), or None if there is none.
+    A single lookup on the (incident, kind, ordinal) index.
+    """
+    item = db.query(models.IncidentMedia.storage_key).filter(
+        models.IncidentMedia.incident_id == incident_id,
+        models.IncidentMedia.kind == kind,
+        models.IncidentMedia.ordinal == (index if kind == "additional" else 0),
+    ).first()
+    if item is None:
+        return None
+    return media_service.get_media_file(db, item.storage_key)
+
+def _incident_files(incident: models.Incident) -> list:
+    paths = [media_service.local_path(ref) for ref in media_service.incident_refs(incident)]
+    return [path for path in paths if os.path.isfile(path)]
+
+@job_handler("incident.media_attached", concurrency=4)
+@job_handler("incident.created", concurrency=4)
+def process_new_incident(payload: dict):
+    """
+    Post-commit work for a new incident (or one that just gained a file),
+    run by the job worker so the endpoints return as soon as the row is
+    committed.
+    """
+    db = SessionLocal()
+    try:
+        incident = get_incident(db, payload["incident_id"])
+    finally:
+        db.close()
+    if incident is None:
+        return  # Deleted before the job ran
+
+    # Make the uploaded files durable; the request path only wrote them
+    for path in _incident_files(incident):
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+def save_file_to_local_disk(file: UploadFile, field_name: str = "media_file") -> StoredFile:
+    """
+    Stage an UploadFile for the media store; pass the result to add_incident()
+    with its kind to store it under its content ID.
+    """
+    # Generate a unique staging filename
     extension = os.path.splitext(file.filename)[1]
     unique_filename = f"{uuid.uuid4().hex}{extension}"
-    file_location = os.path.join(UPLOAD_DIR, unique_filename)
+    os.makedirs(config.UPLOAD_STAGING_DIR, exist_ok=True)
+    file_location = os.path.join(config.UPLOAD_STAGING_DIR, unique_filename)
 
+    # Copy (and hash) in fixed-size chunks so the whole file is never held in memory
+    size = 0
+    hasher = hashlib.sha256()
     with open(file_location, "wb") as f:
-        f.write(file.file.read())  # read and write the file
+        while chunk := file.file.read(config.UPLOAD_CHUNK_SIZE):
+            size += len(chunk)
+            if size > config.MAX_UPLOAD_SIZE:
+                f.close()
+                os.remove(file_location)
+                raise HTTPException(
+                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                    detail=f"File exceeds the maximum upload size of {config.MAX_UPLOAD_SIZE} bytes",
+                )
+            f.write(chunk)
+            hasher.update(chunk)
 
-    return file_location
+    return StoredFile(
+        field_name=field_name,
+        filename=file.filename,
+        content_type=file.content_type or "application/octet-stream",
+        path=file_location,
+        size=size,
+        content_id=hasher.hexdigest(),
+    )
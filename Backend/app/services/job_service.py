@@ -0,0 +1,270 @@
+# app/services/job_service.py
+import asyncio
+import inspect
+import os
+import socket
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Optional
+
+from sqlalchemy import and_, insert, or_
+from sqlalchemy.orm import Session
+
+from ..core import config
+from ..db import models
+from ..db.database import db_session
+
+class JobType:
+    """A registered job handler and its execution limits"""
+
+    def __init__(self, name: str, handler: Callable, concurrency: int, max_attempts: int,
+                 visibility_timeout: int):
+        self.name = name
+        self.handler = handler
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.visibility_timeout = visibility_timeout
+
+_job_types: Dict[str, JobType] = {}
+# Session-first cleanup functions run with the worker's periodic sweep
+_sweepers: List[Callable[[Session], None]] = []
+# Plain handlers run here rather than in Starlette's threadpool, so long
+# jobs in an API process never hold the threads its requests' queries use
+_executor = ThreadPoolExecutor(max_workers=config.JOBS_THREADS, thread_name_prefix="job")
+
+def job_handler(name: str, concurrency: int = 4, max_attempts: int = None, visibility_timeout: int = None):
+    """
+    Register a handler for a job type. Handlers receive the job payload and
+    may be async or plain functions (plain ones run on the jobs' own pool).
+    Raising marks the attempt as failed and schedules a retry.
+    """
+    def register(handler: Callable) -> Callable:
+        _job_types[name] = JobType(
+            name,
+            handler,
+            concurrency,
+            max_attempts or config.JOBS_MAX_ATTEMPTS,
+            visibility_timeout or config.JOBS_VISIBILITY_TIMEOUT,
+        )
+        return handler
+    return register
+
+def sweeper(fn: Callable[[Session], None]) -> Callable[[Session], None]:
+    """
+    Register a cleanup function (e.g. pruning expired rows) for the workers
+    to run every SWEEP_INTERVAL. It takes the Session and commits itself.
+    """
+    _sweepers.append(fn)
+    return fn
+
+def enqueue(db: Session, job_type: str, payload: dict = None, delay: float = 0) -> models.Job:
+    """
+    Add a job to the session. It is written in the caller's transaction, so
+    it only becomes visible to workers if that transaction commits.
+    """
+    spec = _job_types.get(job_type)
+    job = models.Job(
+        job_type=job_type,
+        payload=payload or {},
+        status="queued",
+        attempts=0,
+        max_attempts=spec.max_attempts if spec else config.JOBS_MAX_ATTEMPTS,
+        run_after=datetime.utcnow() + timedelta(seconds=delay),
+    )
+    db.add(job)
+    return job
+
+def enqueue_many(db: Session, job_type: str, payloads: Iterable[dict], delay: float = 0):
+    """Like enqueue() for many jobs of one type, written with one multi-row insert"""
+    spec = _job_types.get(job_type)
+    run_after = datetime.utcnow() + timedelta(seconds=delay)
+    rows = [{
+        "job_type": job_type,
+        "payload": payload or {},
+        "status": "queued",
+        "attempts": 0,
+        "max_attempts": spec.max_attempts if spec else config.JOBS_MAX_ATTEMPTS,
+        "run_after": run_after,
+    } for payload in payloads]
+    if rows:
+        db.execute(insert(models.Job), rows)
+
+# Worker-side queue operations. All take the Session first so they can be
+# run with DbSession.run(); each commits its own short transaction.
+
+def _claimable(now: datetime):
+    return or_(
+        and_(models.Job.status == "queued", models.Job.run_after <= now),
+        # Running jobs whose worker died or stalled past the visibility timeout
+        and_(models.Job.status == "running", models.Job.locked_until < now,
+             models.Job.attempts < models.Job.max_attempts),
+    )
+
+def claim_jobs(db: Session, job_type: str, limit: int, worker_id: str, visibility_timeout: int) -> List[dict]:
+    """
+    Atomically take up to `limit` due jobs of one type. Each claim is a
+    conditional UPDATE, so concurrent workers never run the same attempt.
+    """
+    now = datetime.utcnow()
+    candidate_ids = [row.id for row in db.query(models.Job.id).filter(
+        models.Job.job_type == job_type, _claimable(now)
+    ).order_by(models.Job.run_after, models.Job.id).limit(limit * 2)]
+
+    claimed_ids = []
+    for job_id in candidate_ids:
+        updated = db.query(models.Job).filter(
+            models.Job.id == job_id, _claimable(now)
+        ).update({
+            "status": "running",
+            "attempts": models.Job.attempts + 1,
+            "locked_by": worker_id,
+            "locked_until": now + timedelta(seconds=visibility_timeout),
+        }, synchronize_session=False)
+        if updated:
+            claimed_ids.append(job_id)
+        if len(claimed_ids) >= limit:
+            break
+    db.commit()
+
+    if not claimed_ids:
+        return []
+    rows = db.query(
+        models.Job.id, models.Job.job_type, models.Job.payload, models.Job.attempts, models.Job.max_attempts
+    ).filter(models.Job.id.in_(claimed_ids)).all()
+    return [row._asdict() for row in rows]
+
+def extend_lease(db: Session, job_id: int, worker_id: str, visibility_timeout: int) -> bool:
+    """Push back a running job's visibility timeout; False if another worker has taken it over"""
+    updated = db.query(models.Job).filter(
+        models.Job.id == job_id, models.Job.locked_by == worker_id, models.Job.status == "running"
+    ).update({
+        "locked_until": datetime.utcnow() + timedelta(seconds=visibility_timeout),
+    }, synchronize_session=False)
+    db.commit()
+    return bool(updated)
+
+def complete_job(db: Session, job_id: int, worker_id: str):
+    db.query(models.Job).filter(
+        models.Job.id == job_id, models.Job.locked_by == worker_id
+    ).update({"status": "succeeded", "locked_until": None, "last_error": None}, synchronize_session=False)
+    db.commit()
+
+def fail_job(db: Session, job_id: int, worker_id: str, error: str, attempts: int, max_attempts: int):
+    """Schedule a retry with exponential backoff, or give up after max_attempts"""
+    values = {"locked_until": None, "last_error": error[-4000:]}
+    if attempts >= max_attempts:
+        values["status"] = "failed"
+    else:
+        values["status"] = "queued"
+        delay = config.JOBS_RETRY_BASE_DELAY * (2 ** (attempts - 1))
+        values["run_after"] = datetime.utcnow() + timedelta(seconds=delay)
+    db.query(models.Job).filter(
+        models.Job.id == job_id, models.Job.locked_by == worker_id
+    ).update(values, synchronize_session=False)
+    db.commit()
+
+def sweep_jobs(db: Session):
+    """Fail jobs that timed out on their last attempt and prune old successes"""
+    now = datetime.utcnow()
+    db.query(models.Job).filter(
+        models.Job.status == "running",
+        models.Job.locked_until < now,
+        models.Job.attempts >= models.Job.max_attempts,
+    ).update({"status": "failed", "last_error": "Visibility timeout exceeded"}, synchronize_session=False)
+    db.query(models.Job).filter(
+        models.Job.status == "succeeded",
+        models.Job.run_after < now - timedelta(hours=config.JOBS_RETENTION_HOURS),
+    ).delete(synchronize_session=False)
+    db.commit()
+
+class JobWorker:
+    """
+    Polls the jobs table and runs claimed jobs, never holding more jobs of
+    a type than its concurrency limit. Runs inside the API process (see
+    main.py) or standalone via `python -m app.worker`.
+    """
+
+    SWEEP_INTERVAL = 60  # Seconds
+
+    def __init__(self, job_types: Optional[List[str]] = None, poll_interval: float = None):
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.job_types = job_types
+        self.poll_interval = poll_interval or config.JOBS_POLL_INTERVAL
+        self._running: Dict[str, int] = {}
+        self._tasks = set()
+        self._stopping = asyncio.Event()
+
+    def _types(self) -> List[JobType]:
+        names = self.job_types or list(_job_types)
+        return [_job_types[name] for name in names if name in _job_types]
+
+    async def run(self):
+        last_sweep = 0.0
+        loop = asyncio.get_running_loop()
+        while not self._stopping.is_set():
+            claimed_any = False
+            try:
+                if loop.time() - last_sweep > self.SWEEP_INTERVAL:
+                    async with db_session() as db:
+                        await db.run(sweep_jobs)
+                        for fn in _sweepers:
+                            await db.run(fn)
+                    last_sweep = loop.time()
+                for spec in self._types():
+                    free = spec.concurrency - self._running.get(spec.name, 0)
+                    if free <= 0:
+                        continue
+                    async with db_session() as db:
+                        jobs = await db.run(claim_jobs, spec.name, free, self.worker_id, spec.visibility_timeout)
+                    for job in jobs:
+                        claimed_any = True
+                        self._running[spec.name] = self._running.get(spec.name, 0) + 1
+                        task = asyncio.create_task(self._execute(spec, job))
+                        self._tasks.add(task)
+                        task.add_done_callback(self._tasks.discard)
+            except Exception as e:
+                print(f"Job worker poll failed: {str(e)}")
+            if not claimed_any:
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def _heartbeat(self, spec: JobType, job: dict):
+        """Extend the job's lease while it runs, so only a dead or stalled worker loses it"""
+        while True:
+            await asyncio.sleep(max(1.0, spec.visibility_timeout / 3))
+            try:
+                async with db_session() as db:
+                    if not await db.run(extend_lease, job["id"], self.worker_id, spec.visibility_timeout):
+                        print(f"Job {job['id']} ({spec.name}) lost its lease to another worker")
+                        return
+            except Exception as e:
+                print(f"Could not extend the lease of job {job['id']}: {str(e)}")
+
+    async def _execute(self, spec: JobType, job: dict):
+        heartbeat = asyncio.create_task(self._heartbeat(spec, job))
+        try:
+            if inspect.iscoroutinefunction(spec.handler):
+                await spec.handler(job["payload"])
+            else:
+                await asyncio.get_running_loop().run_in_executor(_executor, spec.handler, job["payload"])
+        except Exception:
+            error = traceback.format_exc()
+            print(f"Job {job['id']} ({spec.name}) failed on attempt {job['attempts']}: {error}")
+            async with db_session() as db:
+                await db.run(fail_job, job["id"], self.worker_id, error, job["attempts"], job["max_attempts"])
+        else:
+            async with db_session() as db:
+                await db.run(complete_job, job["id"], self.worker_id)
+        finally:
+            heartbeat.cancel()
+            self._running[spec.name] -= 1
+
+    async def stop(self, timeout: float = 30):
+        """Stop polling and give running jobs a chance to finish"""
+        self._stopping.set()
+        if self._tasks:
+            await asyncio.wait(set(self._tasks), timeout=timeout)
@@ -0,0 +1,308 @@
+# app/services/map_service.py
+import hashlib
+import math
+from typing import Callable, Iterable, List, Optional, Tuple
+
+from sqlalchemy import and_, func, or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from ..core import config
+from ..core.cache import TTLCache
+from ..db import models
+
+GEOHASH_PRECISION = 9  # Stored on each incident; cells of about 5 x 5 m
+MAX_ZOOM = 22  # Deepest tile level served
+TILE_EXTENT = 4096  # Vector tile coordinate space
+TILE_GRID = 16  # Target cluster cells across a tile, i.e. one per 16 px of a 256 px tile
+MAX_COVER_CELLS = 32  # Index ranges per query; the bbox is covered with coarser cells beyond this
+VERSION_PRECISION = 4  # Cells of about 39 x 20 km carry the change counters tile caches check
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+_MERCATOR_MAX_LATITUDE = 85.0511287798
+
+Box = Tuple[float, float, float, float]  # west, south, east, north
+
+# Geohash: base-32 cells that nest by prefix, so every cell of a map grid is
+# an index range on incidents.geohash
+
+def encode_geohash(latitude: Optional[float], longitude: Optional[float], precision: int = GEOHASH_PRECISION) -> Optional[str]:
+    """Geohash of a point, or None if the coordinates are missing or out of range"""
+    if latitude is None or longitude is None or not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        return None
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, value, even = [], 0, 0, True
+    while len(chars) < precision:
+        interval, coordinate = (lng_range, longitude) if even else (lat_range, latitude)
+        middle = (interval[0] + interval[1]) / 2
+        value <<= 1
+        if coordinate >= middle:
+            value |= 1
+            interval[0] = middle
+        else:
+            interval[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_BASE32[value])
+            bits, value = 0, 0
+    return "".join(chars)
+
+def cell_size(precision: int) -> Tuple[float, float]:
+    """(width, height) in degrees of a geohash cell of this many characters"""
+    bits = 5 * precision
+    return 360.0 / 2 ** ((bits + 1) // 2), 180.0 / 2 ** (bits // 2)
+
+def _precision_for(width: float) -> int:
+    """Finest precision whose cells are still at least `width` degrees wide"""
+    precision = 1
+    while precision < GEOHASH_PRECISION and cell_size(precision + 1)[0] >= width:
+        precision += 1
+    return precision
+
+def _cells_across(box: Box, precision: int) -> int:
+    west, south, east, north = box
+    width, height = cell_size(precision)
+    columns = math.floor((east + 180) / width) - math.floor((west + 180) / width) + 1
+    rows = math.floor((north + 90) / height) - math.floor((south + 90) / height) + 1
+    return columns * rows
+
+def _cover(box: Box, precision: int) -> List[str]:
+    """The geohash cells of this precision that intersect the box"""
+    west, south, east, north = box
+    width, height = cell_size(precision)
+    cells = []
+    row = math.floor((south + 90) / height)
+    while row * height - 90 <= north and row * height < 180:
+        column = math.floor((west + 180) / width)
+        while column * width - 180 <= east and column * width < 360:
+            cells.append(encode_geohash(row * height - 90 + height / 2, column * width - 180 + width / 2, precision))
+            column += 1
+        row += 1
+    return cells
+
+def _split(box: Box) -> List[Box]:
+    """Boxes crossing the antimeridian (west > east) become two"""
+    west, south, east, north = box
+    if west <= east:
+        return [box]
+    return [(west, south, 180.0, north), (-180.0, south, east, north)]
+
+def _cover_ranges(column, box: Box, precision: int):
+    """Index ranges on a geohash column for the cells covering the box, coarser if there are too many"""
+    while precision > 1 and _cells_across(box, precision) > MAX_COVER_CELLS:
+        precision -= 1
+    return [and_(column >= cell, column < cell + "~") for cell in _cover(box, precision)]
+
+def _in_boxes(boxes: List[Box]):
+    """Index ranges of the cells covering the boxes, then the exact bounds"""
+    conditions = []
+    for box in boxes:
+        ranges = _cover_ranges(models.Incident.geohash, box, GEOHASH_PRECISION)
+        west, south, east, north = box
+        conditions.append(and_(
+            or_(*ranges),
+            models.Incident.latitude.between(south, north),
+            models.Incident.longitude.between(west, east),
+        ))
+    return or_(*conditions)
+
+# Clusters. Session-first, run with DbSession.run(); `apply_filters` adds the
+# status/date filters to the query.
+
+def _clusters(db: Session, boxes: List[Box], precision: int, apply_filters: Callable) -> list:
+    cell = func.substr(models.Incident.geohash, 1, precision)
+    query = db.query(
+        cell.label("cell"),
+        func.count(models.Incident.id).label("count"),
+        func.avg(models.Incident.latitude).label("latitude"),
+        func.avg(models.Incident.longitude).label("longitude"),
+        func.min(models.Incident.id).label("incident_id"),
+        func.min(models.Incident.status).label("status"),
+    ).filter(_in_boxes(boxes))
+    return apply_filters(query).group_by(cell).all()
+
+def zoom_width(zoom: int) -> float:
+    """Degrees of longitude covered by one cluster cell at this zoom"""
+    return 360.0 / 2 ** zoom / TILE_GRID
+
+def get_clusters(db: Session, box: Box, zoom: int, apply_filters: Callable) -> dict:
+    """
+    Incidents in the box grouped into geohash cells sized for the zoom level
+    (about 16 px), coarser if that would exceed MAP_MAX_CLUSTERS. A cell
+    holding a single incident is returned as that incident.
+    """
+    boxes = _split(box)
+    precision = _precision_for(zoom_width(zoom))
+    while precision > 1 and sum(_cells_across(part, precision) for part in boxes) > config.MAP_MAX_CLUSTERS:
+        precision -= 1
+    clusters = []
+    for row in _clusters(db, boxes, precision, apply_filters):
+        single = row.count == 1
+        clusters.append({
+            "geohash": row.cell,
+            "count": row.count,
+            "latitude": row.latitude,
+            "longitude": row.longitude,
+            "incident_id": row.incident_id if single else None,
+            "status": row.status if single else None,
+        })
+    return {
+        "zoom": zoom,
+        "precision": precision,
+        "total": sum(cluster["count"] for cluster in clusters),
+        "clusters": clusters,
+    }
+
+# Web Mercator tiles
+
+def tile_bounds(z: int, x: int, y: int) -> Box:
+    n = 2 ** z
+
+    def latitude(row: int) -> float:
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / n))))
+
+    return x / n * 360 - 180, latitude(y + 1), (x + 1) / n * 360 - 180, latitude(y)
+
+def _mercator(latitude: float, longitude: float, z: int) -> Tuple[float, float]:
+    """Fractional tile column and row of a point at zoom z"""
+    n = 2 ** z
+    latitude = max(-_MERCATOR_MAX_LATITUDE, min(_MERCATOR_MAX_LATITUDE, latitude))
+    return (longitude + 180) / 360 * n, (1 - math.asinh(math.tan(math.radians(latitude))) / math.pi) / 2 * n
+
+def tile_for(latitude: float, longitude: float, z: int) -> Tuple[int, int]:
+    x, y = _mercator(latitude, longitude, z)
+    last = 2 ** z - 1
+    return min(last, max(0, int(x))), min(last, max(0, int(y)))
+
+def _tile_position(latitude: float, longitude: float, z: int, x: int, y: int) -> Tuple[int, int]:
+    """Point in tile coordinates, 0..TILE_EXTENT from the top left"""
+    tile_x, tile_y = _mercator(latitude, longitude, z)
+    return round((tile_x - x) * TILE_EXTENT), round((tile_y - y) * TILE_EXTENT)
+
+# Mapbox Vector Tile encoding (protobuf, written by hand to avoid a dependency)
+
+def _varint(value: int) -> bytes:
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+def _zigzag(value: int) -> int:
+    return (value << 1) ^ (value >> 63)
+
+def _field(number: int, payload: bytes) -> bytes:
+    """Length-delimited field"""
+    return _varint(number << 3 | 2) + _varint(len(payload)) + payload
+
+def _uint_field(number: int, value: int) -> bytes:
+    return _varint(number << 3) + _varint(value)
+
+def _packed(values: Iterable[int]) -> bytes:
+    return b"".join(_varint(value) for value in values)
+
+def encode_tile(layer_name: str, points: List[Tuple[int, int, dict]]) -> bytes:
+    """A vector tile with one layer of point features (x, y, properties); empty if there are none"""
+    if not points:
+        return b""
+    keys, values, features = {}, {}, []
+    for feature_id, (px, py, properties) in enumerate(points, 1):
+        tags = []
+        for key, value in properties.items():
+            if value is None:
+                continue
+            tags.append(keys.setdefault(key, len(keys)))
+            if isinstance(value, int):
+                encoded = _uint_field(5, value)  # uint_value
+            else:
+                encoded = _field(1, str(value).encode())  # string_value
+            tags.append(values.setdefault(encoded, len(values)))
+        geometry = [1 | 1 << 3, _zigzag(px), _zigzag(py)]  # MoveTo, one point
+        features.append(_field(2, b"".join([
+            _uint_field(1, feature_id),
+            _field(2, _packed(tags)),
+            _uint_field(3, 1),  # POINT
+            _field(4, _packed(geometry)),
+        ])))
+    layer = b"".join([
+        _uint_field(15, 2),  # version
+        _field(1, layer_name.encode()),
+        *features,
+        *[_field(3, key.encode()) for key in keys],
+        *[_field(4, value) for value in values],
+        _uint_field(5, TILE_EXTENT),
+    ])
+    return _field(3, layer)
+
+# Tiles are cached per process by (z, x, y, filters). Every create or
+# status change bumps the counter of its cell in map_cell_versions, in the
+# same transaction, and a cached tile is only served while the counters
+# under it add up to what they were when it was built; so a change made
+# through any process is seen by all of them on the next read.
+
+_tile_cache = TTLCache(maxsize=config.MAP_TILE_CACHE_SIZE, ttl=config.MAP_TILE_CACHE_TTL)
+
+def _version_cells(points: Iterable[Tuple[Optional[float], Optional[float]]]) -> List[str]:
+    cells = {encode_geohash(latitude, longitude, VERSION_PRECISION) for latitude, longitude in points}
+    return sorted(cell for cell in cells if cell is not None)
+
+def touch(db: Session, points: Iterable[Tuple[Optional[float], Optional[float]]]):
+    """Bump the counters of the cells holding these (latitude, longitude) points; call before the commit"""
+    cells = _version_cells(points)
+    if not cells:
+        return
+    db.query(models.MapCellVersion).filter(models.MapCellVersion.cell.in_(cells)).update(
+        {"version": models.MapCellVersion.version + 1}, synchronize_session=False
+    )
+    existing = {cell for cell, in db.query(models.MapCellVersion.cell).filter(models.MapCellVersion.cell.in_(cells))}
+    for cell in cells:
+        if cell in existing:
+            continue
+        try:
+            with db.begin_nested():
+                db.add(models.MapCellVersion(cell=cell, version=1))
+        except IntegrityError:
+            # Added by a concurrent transaction first
+            db.query(models.MapCellVersion).filter(models.MapCellVersion.cell == cell).update(
+                {"version": models.MapCellVersion.version + 1}, synchronize_session=False
+            )
+
+def touch_incidents(db: Session, incidents: Iterable):
+    """touch() for incidents (models or dicts with latitude and longitude)"""
+    touch(db, [
+        (incident["latitude"], incident["longitude"]) if isinstance(incident, dict)
+        else (incident.latitude, incident.longitude)
+        for incident in incidents
+    ])
+
+def _tile_version(db: Session, box: Box) -> int:
+    """Sum of the change counters of the cells under the box; grows with every change there"""
+    ranges = _cover_ranges(models.MapCellVersion.cell, box, VERSION_PRECISION)
+    return db.query(func.coalesce(func.sum(models.MapCellVersion.version), 0)).filter(or_(*ranges)).scalar()
+
+def get_tile(db: Session, z: int, x: int, y: int, filters: tuple, apply_filters: Callable) -> Tuple[bytes, str]:
+    """The encoded tile and its ETag; `filters` identifies apply_filters for caching"""
+    key = (z, x, y) + filters
+    bounds = tile_bounds(z, x, y)
+    version = _tile_version(db, bounds)
+    cached = _tile_cache.get(key)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    precision = _precision_for(zoom_width(z))
+    points = []
+    for row in _clusters(db, [bounds], precision, apply_filters):
+        px, py = _tile_position(row.latitude, row.longitude, z, x, y)
+        single = row.count == 1
+        points.append((px, py, {
+            "count": row.count,
+            "incident_id": row.incident_id if single else None,
+            "status": row.status if single else None,
+        }))
+    tile = encode_tile("incidents", points)
+    result = (tile, '"' + hashlib.sha256(tile).hexdigest()[:32] + '"')
+    _tile_cache.set(key, (version, result))
+    return result
@@ -0,0 +1,554 @@
+# app/services/media_service.py
+import base64
+import hashlib
+import hmac
+import os
+import asyncio
+import re
+import shutil
+import stat
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlencode
+
+from fastapi import HTTPException, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, StreamingResponse
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from ..core import config
+from ..core.cache import TTLCache
+from ..core.security import SECRET_KEY
+from ..db import models
+from ..db.database import DbSession, SessionLocal
+from . import derivative_service, job_service, video_service
+from .job_service import job_handler
+from .upload_service import StoredFile
+
+MEDIA_DIR = config.MEDIA_DIR
+
+_CONTENT_ID = re.compile(r"[0-9a-f]{64}")
+# Signed storage keys: a content ID, optionally with a size variant suffix
+_VARIANT_KEY = re.compile(r"([0-9a-f]{64})\.(\w+)")
+VARIANTS = tuple(derivative_service.VARIANT_SIZES)
+# Content types never change for a content ID, so they are cached for the
+# signed URL serializers; "" marks content with no recorded type
+_content_types = TTLCache(maxsize=100000, ttl=24 * 3600)
+# Media links get their own key. Without MEDIA_URL_SECRET it is derived
+# from the JWT secret, so a leaked link key never signs tokens and vice versa
+_SIGNING_KEY = (
+    config.MEDIA_URL_SECRET.encode() if config.MEDIA_URL_SECRET
+    else hmac.new(SECRET_KEY.encode(), b"media-url-signing", hashlib.sha256).digest()
+)
+# Storage keys for files saved before the media store: "~" + base64url(path)
+_LEGACY_KEY_PREFIX = "~"
+# HLS files inside a signed stream directory: master.m3u8, poster.jpg, <rendition>/<file>
+_STREAM_FILE = re.compile(r"(?:\w+/)?[\w-]+(\.m3u8|\.ts|\.jpg)")
+# Video stream state per content ID; pending entries are only kept briefly
+# so responses pick up a finished transcode soon after the worker is done
+_video_streams = TTLCache(maxsize=100000, ttl=24 * 3600)
+_PENDING_VIDEO_TTL = 10
+# A single "Range: bytes=first-last" (either end may be omitted)
+_BYTE_RANGE = re.compile(r"bytes=(\d*)-(\d*)")
+RANGE_CHUNK_SIZE = 64 * 1024  # Bytes per read when serving part of a file
+# Derivatives missing at request time are rendered here, capped per process
+_derivative_executor = ThreadPoolExecutor(
+    max_workers=config.MEDIA_DERIVATIVE_WORKERS, thread_name_prefix="media-derivative"
+)
+
+@dataclass
+class MediaFile:
+    """A servable file behind an incident's media reference"""
+    path: str
+    content_type: Optional[str] = None
+    content_id: Optional[str] = None
+    variant: Optional[str] = None  # Derivative size, rendered on demand if missing
+
+def is_content_id(ref: Optional[str]) -> bool:
+    return bool(ref) and _CONTENT_ID.fullmatch(ref) is not None
+
+def content_path(content_id: str) -> str:
+    """Sharded location of a blob: <MEDIA_DIR>/ab/cd/abcd..."""
+    return os.path.join(MEDIA_DIR, content_id[:2], content_id[2:4], content_id)
+
+def variant_path(content_id: str, variant: str) -> str:
+    """Derivatives sit next to their original: <content path>.<variant>"""
+    return f"{content_path(content_id)}.{variant}"
+
+def hls_dir(content_id: str) -> str:
+    """HLS renditions and poster of a video: <content path>.hls/"""
+    return f"{content_path(content_id)}.hls"
+
+def local_path(ref: str) -> str:
+    """Where a media reference lives on disk"""
+    return content_path(ref) if is_content_id(ref) else ref
+
+def _place(stored: StoredFile):
+    """Move a staged upload into the store, or drop it if the content is already there"""
+    final_path = content_path(stored.content_id)
+    if os.path.exists(final_path):
+        os.remove(stored.path)
+    else:
+        os.makedirs(os.path.dirname(final_path), exist_ok=True)
+        os.replace(stored.path, final_path)
+    stored.path = final_path
+    stored.staged = False
+
+def add_references(db: Session, files: Iterable[StoredFile]):
+    """
+    Count one reference per file and move the staged files into the store.
+    Runs in the caller's transaction (before its commit): if that rolls
+    back, the counts roll back too and the placed blobs are simply reused
+    by the next upload of the same content.
+    """
+    files = [stored for stored in files if stored.staged]
+    counts = Counter(stored.content_id for stored in files)
+    for content_id, count in counts.items():
+        updated = db.query(models.MediaBlob).filter(
+            models.MediaBlob.content_id == content_id
+        ).update({"ref_count": models.MediaBlob.ref_count + count}, synchronize_session=False)
+        if updated:
+            continue
+        stored = next(stored for stored in files if stored.content_id == content_id)
+        try:
+            with db.begin_nested():
+                db.add(models.MediaBlob(
+                    content_id=content_id,
+                    size=stored.size,
+                    content_type=stored.content_type,
+                    ref_count=count,
+                ))
+                if video_service.supports(stored.content_type):
+                    db.add(models.MediaVideo(content_id=content_id, status="pending"))
+        except IntegrityError:
+            # Another request inserted the same content first
+            db.query(models.MediaBlob).filter(
+                models.MediaBlob.content_id == content_id
+            ).update({"ref_count": models.MediaBlob.ref_count + count}, synchronize_session=False)
+        else:
+            if derivative_service.supports(stored.content_type):
+                job_service.enqueue(db, "media.derivatives", {"content_id": content_id})
+            elif video_service.supports(stored.content_type):
+                job_service.enqueue(db, "media.video", {"content_id": content_id})
+
+    # Counted rows are locked until commit, so the collector below cannot
+    # remove a blob between this placement and our commit
+    for stored in files:
+        _place(stored)
+        _content_types.set(stored.content_id, stored.content_type or "")
+
+def release_references(db: Session, content_ids: Iterable[str]):
+    """Drop one reference per content ID; unreferenced blobs are collected after commit"""
+    counts = Counter(ref for ref in content_ids if is_content_id(ref))
+    for content_id, count in counts.items():
+        db.query(models.MediaBlob).filter(
+            models.MediaBlob.content_id == content_id
+        ).update({"ref_count": models.MediaBlob.ref_count - count}, synchronize_session=False)
+        job_service.enqueue(db, "media.collect", {"content_id": content_id})
+
+@job_handler("media.collect", concurrency=2)
+def collect_blob(payload: dict):
+    """Delete a blob whose reference count reached zero"""
+    db = SessionLocal()
+    try:
+        # Hold the row lock while unlinking so a concurrent upload of the
+        # same content waits, then re-inserts the row and places a fresh file
+        blob = db.query(models.MediaBlob).filter(
+            models.MediaBlob.content_id == payload["content_id"]
+        ).with_for_update().first()
+        if blob is None or blob.ref_count > 0:
+            db.rollback()
+            return
+        for path in [content_path(blob.content_id)] + [variant_path(blob.content_id, v) for v in VARIANTS]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        shutil.rmtree(hls_dir(blob.content_id), ignore_errors=True)
+        db.query(models.MediaVideo).filter(
+            models.MediaVideo.content_id == blob.content_id
+        ).delete(synchronize_session=False)
+        db.delete(blob)
+        db.commit()
+    finally:
+        db.close()
+
+def _render_missing_variants(content_id: str, variants: Iterable[str]) -> Optional[tuple]:
+    """Render the variants not on disk yet; returns the image size if anything was rendered"""
+    targets = {
+        variant: variant_path(content_id, variant)
+        for variant in variants
+        if not os.path.exists(variant_path(content_id, variant))
+    }
+    if targets:
+        return derivative_service.render_variants(content_path(content_id), targets)
+    return None
+
+def _touch_incidents(db: Session, content_id: str):
+    """Bump updated_at on the incidents holding this content, so /incidents/sync sends them again"""
+    holders = db.query(models.IncidentMedia.incident_id).filter(models.IncidentMedia.checksum == content_id)
+    db.query(models.Incident).filter(
+        models.Incident.id.in_(holders.scalar_subquery())
+    ).update({"updated_at": func.now()}, synchronize_session=False)
+
+def _record_dimensions(content_id: str, **values):
+    """Copy probe results onto every incident_media row holding this content"""
+    db = SessionLocal()
+    try:
+        db.query(models.IncidentMedia).filter(
+            models.IncidentMedia.checksum == content_id
+        ).update(values, synchronize_session=False)
+        _touch_incidents(db, content_id)
+        db.commit()
+    finally:
+        db.close()
+
+@job_handler("media.derivatives", concurrency=config.MEDIA_DERIVATIVE_WORKERS)
+def generate_derivatives(payload: dict):
+    """Render every size variant of a newly stored image and record its dimensions"""
+    try:
+        size = _render_missing_variants(payload["content_id"], VARIANTS)
+    except derivative_service.DerivativeError as e:
+        # Not retried: the content will not decode any better next time
+        print(f"Skipping derivatives for {payload['content_id']}: {str(e)}")
+        return
+    if size:
+        _record_dimensions(payload["content_id"], width=size[0], height=size[1])
+
+def _update_video(content_id: str, **values):
+    db = SessionLocal()
+    try:
+        db.query(models.MediaVideo).filter(
+            models.MediaVideo.content_id == content_id
+        ).update(values, synchronize_session=False)
+        if "status" in values:
+            _touch_incidents(db, content_id)  # video_stream changed
+        db.commit()
+    finally:
+        db.close()
+
+@job_handler(
+    "media.video",
+    concurrency=config.VIDEO_TRANSCODE_WORKERS,
+    visibility_timeout=2 * config.VIDEO_TRANSCODE_TIMEOUT,  # Probe, ladder and poster each get the timeout
+)
+def process_video(payload: dict):
+    """Probe a newly stored video, then transcode it to an HLS ladder with a poster frame"""
+    content_id = payload["content_id"]
+    source = content_path(content_id)
+    try:
+        info = video_service.probe(source)
+        _update_video(content_id, duration=info["duration"], codec=info["codec"],
+                      width=info["width"], height=info["height"])
+        _record_dimensions(content_id, width=info["width"], height=info["height"], duration=info["duration"])
+        renditions = video_service.transcode_hls(source, hls_dir(content_id), info)
+    except video_service.VideoError as e:
+        # Not retried: ffmpeg will not make more sense of the file next time.
+        # Players keep using the original upload.
+        print(f"Skipping HLS for {content_id}: {str(e)}")
+        _update_video(content_id, status="failed", error=str(e))
+        return
+    _update_video(content_id, status="ready", renditions=renditions, error=None)
+
+async def _ensure_variant(media: MediaFile):
+    """Render a missing derivative on first request; 404 if it cannot be made"""
+    future = _derivative_executor.submit(_render_missing_variants, media.content_id, [media.variant])
+    try:
+        await asyncio.wrap_future(future)
+    except (derivative_service.DerivativeError, FileNotFoundError):
+        raise HTTPException(status_code=404, detail="Preview not available")
+
+def get_media_file(db: Session, ref: Optional[str]) -> Optional[MediaFile]:
+    """
+    Resolve an incident media reference. Content IDs map into the store;
+    anything else is a file path from before the store existed.
+    """
+    if not ref:
+        return None
+    if not is_content_id(ref):
+        return MediaFile(path=ref)  # Legacy uploads/<uuid><ext> path
+    content_type = _load_content_types(db, [ref]).get(ref)
+    return MediaFile(path=content_path(ref), content_type=content_type or None, content_id=ref)
+
+def _load_content_types(db: Session, content_ids: List[str]) -> Dict[str, str]:
+    """Content types for the given IDs, querying only those not cached yet"""
+    found = {content_id: _content_types.get(content_id) for content_id in content_ids}
+    missing = [content_id for content_id, content_type in found.items() if content_type is None]
+    if missing:
+        rows = dict(db.query(models.MediaBlob.content_id, models.MediaBlob.content_type).filter(
+            models.MediaBlob.content_id.in_(missing)
+        ).all())
+        for content_id in missing:
+            found[content_id] = rows.get(content_id) or ""
+            _content_types.set(content_id, found[content_id])
+    return found
+
+def _load_video_streams(db: Session, content_ids: List[str]) -> Dict[str, dict]:
+    """Stream state for the given video IDs ({} if none), querying only those not cached"""
+    found = {content_id: _video_streams.get(content_id) for content_id in content_ids}
+    missing = [content_id for content_id, stream in found.items() if stream is None]
+    if missing:
+        rows = {row.content_id: row for row in db.query(models.MediaVideo).filter(
+            models.MediaVideo.content_id.in_(missing)
+        )}
+        for content_id in missing:
+            row = rows.get(content_id)
+            stream = {} if row is None else {
+                "status": row.status,
+                "duration": row.duration,
+                "codec": row.codec,
+                "width": row.width,
+                "height": row.height,
+            }
+            found[content_id] = stream
+            settled = stream.get("status") in ("ready", "failed")
+            _video_streams.set(content_id, stream, ttl=None if settled else _PENDING_VIDEO_TTL)
+    return found
+
+# Signed media URLs
+
+def _signature(key: str, expires: int, content_type: str) -> str:
+    digest = hmac.new(_SIGNING_KEY, f"{key}\n{expires}\n{content_type}".encode(), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest).decode().rstrip("=")
+
+def _link_expiry() -> int:
+    ttl = config.MEDIA_URL_TTL
+    return (int(time.time()) // ttl + 2) * ttl
+
+def _check_signature(key: str, expires: int, content_type: str, signature: str):
+    expected = _signature(key, expires, content_type)
+    if not hmac.compare_digest(expected.encode(), signature.encode()) or expires < time.time():
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid or expired media link")
+
+def _storage_key(ref: str) -> str:
+    if is_content_id(ref):
+        return ref
+    return _LEGACY_KEY_PREFIX + base64.urlsafe_b64encode(ref.encode()).decode().rstrip("=")
+
+def signed_url(ref: Optional[str], content_type: str = "", variant: Optional[str] = None) -> Optional[str]:
+    """
+    Path of a /media link for a media reference (or one of its size
+    variants). The expiry is rounded up to the next MEDIA_URL_TTL boundary
+    (plus one TTL) so every response within a window emits the same URL and
+    browsers can keep using their cache.
+    """
+    if not ref:
+        return None
+    expires = _link_expiry()
+    key = _storage_key(ref)
+    if variant:
+        key = f"{key}.{variant}"
+        content_type = derivative_service.VARIANT_CONTENT_TYPE
+    query = urlencode({"expires": expires, "type": content_type, "signature": _signature(key, expires, content_type)})
+    return f"/media/{key}?{query}"
+
+def verify_signed_url(key: str, expires: int, content_type: str, signature: str) -> MediaFile:
+    """Check a /media link without touching the database; 403 if forged or expired"""
+    _check_signature(key, expires, content_type, signature)
+    if is_content_id(key):
+        return MediaFile(path=content_path(key), content_type=content_type or None, content_id=key)
+    variant_key = _VARIANT_KEY.fullmatch(key)
+    if variant_key and variant_key.group(2) in VARIANTS:
+        content_id, variant = variant_key.groups()
+        return MediaFile(
+            path=variant_path(content_id, variant), content_type=content_type, content_id=content_id, variant=variant
+        )
+    if not key.startswith(_LEGACY_KEY_PREFIX):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Media not found")
+    encoded = key[len(_LEGACY_KEY_PREFIX):]
+    path = base64.urlsafe_b64decode(encoded + "=" * (-len(encoded) % 4)).decode()
+    return MediaFile(path=path, content_type=content_type or None)
+
+def stream_url(content_id: str, name: str = video_service.PLAYLIST_NAME) -> str:
+    """
+    Path of a file in a video's HLS directory. The signature sits in the
+    path rather than the query, so the relative segment and rendition URIs
+    inside the playlists resolve to links covered by the same signature.
+    """
+    expires = _link_expiry()
+    signature = _signature(f"{content_id}.hls", expires, "")
+    return f"/media/hls/{content_id}/{expires}/{signature}/{name}"
+
+def verify_stream_url(content_id: str, expires: int, signature: str, name: str) -> MediaFile:
+    """Check a /media/hls link without touching the database; 403 if forged or expired"""
+    _check_signature(f"{content_id}.hls", expires, "", signature)
+    stream_file = _STREAM_FILE.fullmatch(name)
+    if not is_content_id(content_id) or stream_file is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Media not found")
+    return MediaFile(
+        path=os.path.join(hls_dir(content_id), name),
+        content_type=video_service.CONTENT_TYPES[stream_file.group(1)],
+        content_id=content_id,
+        variant=f"hls/{name}",
+    )
+
+def _video_stream(stream: Optional[dict], content_id: str) -> Optional[dict]:
+    if not stream:
+        return None
+    stream = dict(stream)
+    if stream["status"] == "ready":
+        stream["hls_url"] = stream_url(content_id)
+        stream["poster_url"] = stream_url(content_id, video_service.POSTER_NAME)
+    return stream
+
+async def attach_signed_urls(db: DbSession, incidents: Iterable) -> None:
+    """
+    Set media_signed_url, video_signed_url and additional_media_signed_urls,
+    plus media_variants and additional_media_variants for images and
+    video_stream for videos, on incidents (ORM objects or dicts) for the
+    response serializers. Content types and stream states come from caches,
+    with at most one query each for the rest.
+    """
+    incidents = list(incidents)
+    refs = {ref for incident in incidents for ref in incident_refs(incident) if is_content_id(ref)}
+    content_types = {ref: _content_types.get(ref) for ref in refs}
+    if any(content_type is None for content_type in content_types.values()):
+        content_types = await db.run(_load_content_types, list(refs))
+    videos = [ref for ref in refs if (content_types.get(ref) or "").startswith("video/")]
+    streams = {ref: _video_streams.get(ref) for ref in videos}
+    if any(stream is None for stream in streams.values()):
+        streams = await db.run(_load_video_streams, videos)
+
+    def sign(ref):
+        return signed_url(ref, content_types.get(ref) or "")
+
+    def variants(ref):
+        # Derivatives only exist for content-addressed images
+        if not is_content_id(ref) or not derivative_service.supports(content_types.get(ref)):
+            return None
+        return {variant: signed_url(ref, variant=variant) for variant in VARIANTS}
+
+    for incident in incidents:
+        links = {}
+        if isinstance(incident, dict):
+            # Keyset page items only carry the fields that were asked for
+            if "media_url" in incident:
+                links["media_signed_url"] = sign(incident["media_url"])
+                links["media_variants"] = variants(incident["media_url"])
+            if "video_url" in incident:
+                links["video_signed_url"] = sign(incident["video_url"])
+                links["video_stream"] = _video_stream(streams.get(incident["video_url"]), incident["video_url"])
+            if "additional_media" in incident:
+                additional = incident["additional_media"] or []
+                links["additional_media_signed_urls"] = [sign(ref) for ref in additional]
+                links["additional_media_variants"] = [variants(ref) for ref in additional]
+            incident.update(links)
+        else:
+            additional = incident.additional_media or []
+            incident.media_signed_url = sign(incident.media_url)
+            incident.media_variants = variants(incident.media_url)
+            incident.video_signed_url = sign(incident.video_url)
+            incident.video_stream = _video_stream(streams.get(incident.video_url), incident.video_url)
+            incident.additional_media_signed_urls = [sign(ref) for ref in additional]
+            incident.additional_media_variants = [variants(ref) for ref in additional]
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    # If-None-Match uses weak comparison, so W/ prefixes are ignored
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or any((tag[2:] if tag.startswith("W/") else tag) == etag for tag in candidates)
+
+def _requested_range(request: Request, etag: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    First and last byte of a single-range request that applies to this
+    file, or None to send all of it: no Range, an If-Range naming another
+    version, or several/malformed ranges (which may be ignored). Raises 416
+    for a range that starts past the end.
+    """
+    header = request.headers.get("range")
+    if not header:
+        return None
+    if_range = request.headers.get("if-range")
+    if if_range is not None and if_range.strip() != etag:
+        return None
+    match = _BYTE_RANGE.fullmatch(header.strip())
+    if match is None or not any(match.groups()):
+        return None
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+        if last and int(last) < start:
+            return None
+    else:
+        start, end = max(0, size - int(last)), size - 1  # The last N bytes
+        if int(last) == 0:
+            start = size
+    if start >= size:
+        raise HTTPException(
+            status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+            detail="Requested range not satisfiable",
+            headers={"Content-Range": f"bytes */{size}"},
+        )
+    return start, end
+
+async def _file_chunks(path: str, start: int, length: int):
+    handle = await run_in_threadpool(open, path, "rb")
+    try:
+        await run_in_threadpool(handle.seek, start)
+        while length > 0:
+            chunk = await run_in_threadpool(handle.read, min(RANGE_CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+    finally:
+        await run_in_threadpool(handle.close)
+
+async def media_response(request: Request, media: MediaFile, private: bool = False) -> Response:
+    """
+    Serve a media file as immutable content. The ETag comes from the content
+    ID (or, for legacy uploads, the write-once path), so a matching
+    If-None-Match is answered with 304 before the file is touched. A single
+    byte range (checked against the same ETag by If-Range) is answered with
+    206 here, whatever the installed Starlette's FileResponse supports, so
+    video players can seek.
+    """
+    etag_source = media.content_id or hashlib.sha256(media.path.encode()).hexdigest()
+    if media.variant:
+        etag_source = f"{etag_source}.{media.variant}"
+    headers = {
+        "ETag": f'"{etag_source}"',
+        "Cache-Control": f"{'private' if private else 'public'}, max-age={config.MEDIA_CACHE_MAX_AGE}, immutable",
+        "Accept-Ranges": "bytes",
+    }
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, headers["ETag"]):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    try:
+        stat_result = await run_in_threadpool(os.stat, media.path)
+    except FileNotFoundError:
+        if media.variant not in VARIANTS:
+            raise HTTPException(status_code=404, detail="File not found on server")
+        await _ensure_variant(media)
+        stat_result = await run_in_threadpool(os.stat, media.path)
+    except OSError:
+        stat_result = None
+    if stat_result is None or not stat.S_ISREG(stat_result.st_mode):
+        raise HTTPException(status_code=404, detail="File not found on server")
+
+    byte_range = _requested_range(request, headers["ETag"], stat_result.st_size)
+    if byte_range is not None:
+        start, end = byte_range
+        headers["Content-Range"] = f"bytes {start}-{end}/{stat_result.st_size}"
+        headers["Content-Length"] = str(end - start + 1)
+        return StreamingResponse(
+            _file_chunks(media.path, start, end - start + 1),
+            status_code=status.HTTP_206_PARTIAL_CONTENT,
+            media_type=media.content_type,
+            headers=headers,
+        )
+    return FileResponse(media.path, media_type=media.content_type, headers=headers, stat_result=stat_result)
+
+def incident_refs(incident) -> List[str]:
+    """Every media reference held by an incident (ORM object or serialized dict)"""
+    if isinstance(incident, dict):
+        refs = [incident.get("media_url"), incident.get("video_url")] + list(incident.get("additional_media") or [])
+    else:
+        refs = [incident.media_url, incident.video_url] + list(incident.additional_media or [])
+    return [ref for ref in refs if ref]
@@ -0,0 +1,251 @@
+# app/services/notification_service.py
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from fastapi import HTTPException, status
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from ..core import config
+from ..db import models
+from ..db.database import SessionLocal
+from . import job_service, push_service
+from .job_service import job_handler, sweeper
+
+MAX_TOKEN_LENGTH = 512
+# How long one dispatcher may hold claimed notifications before another retries them
+SEND_LEASE = timedelta(minutes=5)
+STATUS_LABELS = {
+    "submitted": "submitted",
+    "under_process": "being processed",
+    "resolved": "resolved",
+    "rejected": "rejected",
+}
+
+# Device token registry. Session-first helpers, run with DbSession.run().
+
+def register_device(db: Session, user_id: int, token: str, platform: Optional[str]) -> models.DeviceToken:
+    """Add a device's push token, or move it to this user if another account had it"""
+    if not token or len(token) > MAX_TOKEN_LENGTH:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"token must be 1-{MAX_TOKEN_LENGTH} characters",
+        )
+    values = {"user_id": user_id, "platform": platform}
+    updated = db.query(models.DeviceToken).filter(models.DeviceToken.token == token).update(
+        values, synchronize_session=False
+    )
+    if not updated:
+        try:
+            with db.begin_nested():
+                db.add(models.DeviceToken(token=token, **values))
+        except IntegrityError:
+            # Registered by a concurrent request first
+            db.query(models.DeviceToken).filter(models.DeviceToken.token == token).update(
+                values, synchronize_session=False
+            )
+    db.commit()
+    return db.query(models.DeviceToken).populate_existing().filter(models.DeviceToken.token == token).first()
+
+def unregister_device(db: Session, user_id: int, token: str) -> bool:
+    deleted = db.query(models.DeviceToken).filter(
+        models.DeviceToken.token == token, models.DeviceToken.user_id == user_id
+    ).delete(synchronize_session=False)
+    db.commit()
+    return bool(deleted)
+
+# Coalescing: one pending row per incident, in the caller's transaction
+
+def status_changed(db: Session, incident: models.Incident, previous_status: Optional[str]):
+    """
+    Queue a push telling the reporter about the incident's new status; call
+    before the commit that changes it. Further changes within
+    PUSH_COALESCE_SECONDS only update the pending row, so the reporter gets
+    one push with the latest status (or none if it ends where it started).
+    """
+    pending = db.query(models.PendingNotification).filter(
+        models.PendingNotification.incident_id == incident.id
+    )
+    if pending.update({"status": incident.status}, synchronize_session=False):
+        return
+    try:
+        with db.begin_nested():
+            db.add(models.PendingNotification(
+                incident_id=incident.id,
+                user_id=incident.user_id,
+                from_status=previous_status,
+                status=incident.status,
+                due_at=datetime.utcnow() + timedelta(seconds=config.PUSH_COALESCE_SECONDS),
+                attempts=0,
+            ))
+    except IntegrityError:
+        pending.update({"status": incident.status}, synchronize_session=False)
+        return
+    job_service.enqueue(db, "notifications.dispatch", delay=config.PUSH_COALESCE_SECONDS)
+
+# Dispatcher, run by the job worker
+
+def _claimable(now: datetime):
+    """Due and not held by a live dispatcher"""
+    return (models.PendingNotification.due_at <= now) & or_(
+        models.PendingNotification.locked_until.is_(None), models.PendingNotification.locked_until < now
+    )
+
+def _claim_due(db: Session, limit: int, dispatcher_id: str) -> List[models.PendingNotification]:
+    """Take up to `limit` due notifications with one conditional UPDATE"""
+    now = datetime.utcnow()
+    candidate_ids = [row.incident_id for row in db.query(models.PendingNotification.incident_id).filter(
+        _claimable(now)
+    ).order_by(models.PendingNotification.due_at).limit(limit)]
+    if not candidate_ids:
+        return []
+    db.query(models.PendingNotification).filter(
+        models.PendingNotification.incident_id.in_(candidate_ids), _claimable(now)
+    ).update({"locked_by": dispatcher_id, "locked_until": now + SEND_LEASE}, synchronize_session=False)
+    db.commit()
+    return db.query(models.PendingNotification).populate_existing().filter(
+        models.PendingNotification.incident_id.in_(candidate_ids),
+        models.PendingNotification.locked_by == dispatcher_id,
+    ).all()
+
+def _message(incident_id: int, title: str, new_status: str, token: str) -> push_service.PushMessage:
+    label = STATUS_LABELS.get(new_status, new_status.replace("_", " "))
+    return push_service.PushMessage(
+        token=token,
+        title="Incident update",
+        body=f'Your report "{title}" is {label}.',
+        data={"incident_id": str(incident_id), "status": new_status},
+    )
+
+def _send_all(messages: List[push_service.PushMessage]) -> List[str]:
+    """Outcomes for all messages, sent PUSH_BATCH_SIZE per request, PUSH_CONCURRENCY requests at a time"""
+    chunks = [messages[i:i + config.PUSH_BATCH_SIZE] for i in range(0, len(messages), config.PUSH_BATCH_SIZE)]
+
+    def send(chunk):
+        try:
+            return push_service.send_batch(chunk)
+        except push_service.PushError as e:
+            print(f"Push batch of {len(chunk)} failed: {str(e)}")
+            return [push_service.RETRY] * len(chunk)
+
+    with ThreadPoolExecutor(max_workers=max(1, config.PUSH_CONCURRENCY)) as pool:
+        return [outcome for outcomes in pool.map(send, chunks) for outcome in outcomes]
+
+def _finish(db: Session, row: models.PendingNotification, dispatcher_id: str, told: str):
+    """Drop a handled notification, or re-arm it if the status changed while it was being sent"""
+    deleted = db.query(models.PendingNotification).filter(
+        models.PendingNotification.incident_id == row.incident_id,
+        models.PendingNotification.locked_by == dispatcher_id,
+        models.PendingNotification.status == row.status,
+    ).delete(synchronize_session=False)
+    if not deleted:
+        db.query(models.PendingNotification).filter(
+            models.PendingNotification.incident_id == row.incident_id,
+            models.PendingNotification.locked_by == dispatcher_id,
+        ).update({
+            "from_status": told,
+            "attempts": 0,
+            "locked_by": None,
+            "locked_until": None,
+            "due_at": datetime.utcnow() + timedelta(seconds=config.PUSH_COALESCE_SECONDS),
+        }, synchronize_session=False)
+        job_service.enqueue(db, "notifications.dispatch", delay=config.PUSH_COALESCE_SECONDS)
+
+def _retry(db: Session, row: models.PendingNotification, dispatcher_id: str):
+    attempts = (row.attempts or 0) + 1
+    query = db.query(models.PendingNotification).filter(
+        models.PendingNotification.incident_id == row.incident_id,
+        models.PendingNotification.locked_by == dispatcher_id,
+    )
+    if attempts >= config.PUSH_MAX_ATTEMPTS:
+        print(f"Giving up on the push for incident {row.incident_id} after {attempts} attempts")
+        query.delete(synchronize_session=False)
+        return
+    delay = config.PUSH_RETRY_BASE_DELAY * (2 ** (attempts - 1))
+    query.update({
+        "attempts": attempts,
+        "locked_by": None,
+        "locked_until": None,
+        "due_at": datetime.utcnow() + timedelta(seconds=delay),
+    }, synchronize_session=False)
+    job_service.enqueue(db, "notifications.dispatch", delay=delay)
+
+def _dispatch(db: Session, rows: List[models.PendingNotification], dispatcher_id: str):
+    incident_ids = [row.incident_id for row in rows]
+    titles = dict(db.query(models.Incident.id, models.Incident.title).filter(models.Incident.id.in_(incident_ids)))
+    tokens: Dict[int, List[str]] = {}
+    for user_id, token in db.query(models.DeviceToken.user_id, models.DeviceToken.token).filter(
+        models.DeviceToken.user_id.in_({row.user_id for row in rows})
+    ):
+        tokens.setdefault(user_id, []).append(token)
+
+    # One message per device of each reporter with news
+    messages, owners = [], []
+    for row in rows:
+        if row.status == row.from_status or row.incident_id not in titles:
+            continue  # Changed and changed back, or deleted
+        for token in tokens.get(row.user_id, []):
+            messages.append(_message(row.incident_id, titles[row.incident_id], row.status, token))
+            owners.append(row.incident_id)
+    outcomes = _send_all(messages) if messages else []
+
+    by_incident: Dict[int, set] = {}
+    invalid_tokens = []
+    for message, owner, outcome in zip(messages, owners, outcomes):
+        by_incident.setdefault(owner, set()).add(outcome)
+        if outcome == push_service.INVALID:
+            invalid_tokens.append(message.token)
+    if invalid_tokens:
+        db.query(models.DeviceToken).filter(
+            models.DeviceToken.token.in_(invalid_tokens)
+        ).delete(synchronize_session=False)
+
+    for row in rows:
+        results = by_incident.get(row.incident_id, set())
+        if push_service.SENT in results or push_service.RETRY not in results:
+            # Delivered to at least one device, or there was nothing to deliver
+            told = row.status if push_service.SENT in results else row.from_status
+            _finish(db, row, dispatcher_id, told)
+        else:
+            _retry(db, row, dispatcher_id)
+    db.commit()
+
+@job_handler("notifications.dispatch", concurrency=1)
+def dispatch_notifications(payload: dict):
+    """Send every due status-change push, PUSH_BATCH_SIZE incidents at a time"""
+    if push_service.backend() is None:
+        # Not configured: drop what is due rather than let it pile up
+        db = SessionLocal()
+        try:
+            db.query(models.PendingNotification).filter(
+                models.PendingNotification.due_at <= datetime.utcnow()
+            ).delete(synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+        return
+
+    dispatcher_id = uuid.uuid4().hex[:12]
+    db = SessionLocal()
+    try:
+        while True:
+            rows = _claim_due(db, config.PUSH_BATCH_SIZE, dispatcher_id)
+            if not rows:
+                break
+            _dispatch(db, rows, dispatcher_id)
+    finally:
+        db.close()
+
+@sweeper
+def sweep_stalled_notifications(db: Session):
+    """Pick up notifications whose dispatcher died mid-send"""
+    now = datetime.utcnow()
+    stalled = db.query(models.PendingNotification.incident_id).filter(
+        models.PendingNotification.locked_until < now
+    ).first()
+    if stalled is not None:
+        job_service.enqueue(db, "notifications.dispatch")
+        db.commit()
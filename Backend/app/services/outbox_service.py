@@ -0,0 +1,74 @@
+# app/services/outbox_service.py
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from sqlalchemy import func, insert
+from sqlalchemy.orm import Session
+
+from ..core import config
+from ..db import models
+from . import job_service
+from .job_service import sweeper
+
+EVENT_TYPES = ("incident.created", "incident.updated")
+# Incident fields sent with incident.created; updates carry the id, status
+# and remarks, and name what changed
+CREATED_FIELDS = (
+    "id", "user_id", "title", "description", "status", "latitude", "longitude", "livestream_url",
+)
+
+# Written in the caller's transaction, so an event exists exactly when the
+# change it describes was committed; webhook_service delivers them after.
+
+def _subscribed(db: Session) -> bool:
+    """Events are only recorded while someone will receive them"""
+    return db.query(models.WebhookSubscription.id).filter(models.WebhookSubscription.active.is_(True)).first() is not None
+
+def _created_payload(incident) -> dict:
+    if isinstance(incident, dict):
+        return {name: incident.get(name) for name in CREATED_FIELDS}
+    return {name: getattr(incident, name, None) for name in CREATED_FIELDS}
+
+def record_many(db: Session, event_type: str, payloads: List[dict]):
+    """Add events to the outbox and wake the delivery engine, in the caller's transaction"""
+    if not payloads or not _subscribed(db):
+        return
+    now = datetime.utcnow()
+    db.execute(insert(models.OutboxEvent), [{
+        "event_type": event_type,
+        "incident_id": payload.get("id"),
+        "payload": payload,
+        "created_at": now,
+    } for payload in payloads])
+    job_service.enqueue(db, "webhooks.deliver")
+
+def incidents_created(db: Session, incidents: list):
+    """Record incident.created for incidents (models or dicts with an id) inserted in this transaction"""
+    record_many(db, "incident.created", [_created_payload(incident) for incident in incidents])
+
+def incident_updated(db: Session, incident: models.Incident, changed: List[str]):
+    """Record incident.updated naming the changed fields (status, admin_remarks, attachments)"""
+    record_many(db, "incident.updated", [{
+        "id": incident.id,
+        "status": incident.status,
+        "admin_remarks": incident.admin_remarks,
+        "changed": changed,
+    }])
+
+def delivered_up_to(db: Session) -> Optional[int]:
+    """Highest event id every active subscription has moved past, or None with no subscriptions"""
+    return db.query(func.min(models.WebhookSubscription.last_event_id)).filter(
+        models.WebhookSubscription.active.is_(True)
+    ).scalar()
+
+@sweeper
+def prune_outbox(db: Session):
+    """Delete events older than OUTBOX_RETENTION_HOURS that no active subscription still needs"""
+    query = db.query(models.OutboxEvent).filter(
+        models.OutboxEvent.created_at < datetime.utcnow() - timedelta(hours=config.OUTBOX_RETENTION_HOURS)
+    )
+    floor = delivered_up_to(db)
+    if floor is not None:
+        query = query.filter(models.OutboxEvent.id <= floor)
+    query.delete(synchronize_session=False)
+    db.commit()
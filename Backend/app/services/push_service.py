@@ -0,0 +1,102 @@
+# app/services/push_service.py
+import json
+import threading
+import urllib.error
+import urllib.request
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from ..core import config
+
+try:
+    import firebase_admin
+    from firebase_admin import credentials, exceptions as firebase_exceptions, messaging
+except ImportError:  # Optional: only needed to send through FCM
+    firebase_admin = None
+
+# Outcome of one message
+SENT = "sent"
+INVALID = "invalid"  # The token is no longer registered; forget it
+RETRY = "retry"  # Transient failure; send again later
+
+@dataclass
+class PushMessage:
+    token: str
+    title: str
+    body: str
+    data: Dict[str, str] = field(default_factory=dict)  # String values only, as FCM requires
+
+class PushError(Exception):
+    """A whole batch could not be sent (network, provider outage, quota); retry it later"""
+
+def backend() -> Optional[str]:
+    """http, firebase, or None when push is not configured"""
+    if config.PUSH_ENDPOINT_URL:
+        return "http"
+    if firebase_admin is not None and config.FIREBASE_CREDENTIALS:
+        return "firebase"
+    return None
+
+def _send_http(messages: List[PushMessage]) -> List[str]:
+    """
+    POST {"messages": [...]} to PUSH_ENDPOINT_URL; the gateway answers
+    {"results": [{"status": "sent" | "invalid" | "retry"}, ...]} in order
+    """
+    body = json.dumps({"messages": [message.__dict__ for message in messages]}).encode()
+    request = urllib.request.Request(
+        config.PUSH_ENDPOINT_URL, data=body, headers={"Content-Type": "application/json"}, method="POST"
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=config.PUSH_TIMEOUT) as response:
+            results = json.loads(response.read())["results"]
+    except (urllib.error.URLError, OSError, ValueError, KeyError) as e:
+        raise PushError(f"Push gateway request failed: {str(e)}")
+    if len(results) != len(messages):
+        raise PushError(f"Push gateway returned {len(results)} results for {len(messages)} messages")
+    return [result.get("status") if result.get("status") in (SENT, INVALID) else RETRY for result in results]
+
+_firebase_app = None
+_firebase_lock = threading.Lock()
+
+def _firebase():
+    global _firebase_app
+    with _firebase_lock:
+        if _firebase_app is None:
+            _firebase_app = firebase_admin.initialize_app(
+                credentials.Certificate(config.FIREBASE_CREDENTIALS), name="push"
+            )
+        return _firebase_app
+
+def _firebase_outcome(error: Optional[Exception]) -> str:
+    if error is None:
+        return SENT
+    # Only these say the token itself is dead. InvalidArgumentError also
+    # covers a bad payload, which must not cost the user their device.
+    if isinstance(error, (messaging.UnregisteredError, messaging.SenderIdMismatchError)):
+        return INVALID
+    return RETRY
+
+def _send_firebase(messages: List[PushMessage]) -> List[str]:
+    batch = [
+        messaging.Message(
+            token=message.token,
+            notification=messaging.Notification(title=message.title, body=message.body),
+            data=message.data,
+        )
+        for message in messages
+    ]
+    try:
+        response = messaging.send_each(batch, app=_firebase())
+    except (firebase_exceptions.FirebaseError, ValueError) as e:
+        raise PushError(f"FCM request failed: {str(e)}")
+    return [_firebase_outcome(result.exception) for result in response.responses]
+
+def send_batch(messages: List[PushMessage]) -> List[str]:
+    """
+    Send up to PUSH_BATCH_SIZE messages in one provider request and return
+    each message's outcome (SENT, INVALID or RETRY). Raises PushError if the
+    request as a whole failed. Blocking; run it off the event loop.
+    """
+    if backend() == "http":
+        return _send_http(messages)
+    return _send_firebase(messages)
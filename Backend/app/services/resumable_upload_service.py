@@ -0,0 +1,244 @@
+# app/services/resumable_upload_service.py
+import base64
+import binascii
+import hashlib
+import os
+import re
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional
+
+from fastapi import HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+from ..core import config
+from ..db import models, schemas
+from ..db.database import SessionLocal
+from . import incident_service, job_service, media_service, outbox_service
+from .job_service import job_handler
+from .upload_service import StoredFile, guess_content_type
+
+# How long one PUT may hold a session before another request may take over
+CHUNK_LEASE = timedelta(minutes=10)
+ATTACH_FIELDS = {"video", "media", "additional"}
+
+_HEX_SHA256 = re.compile(r"[0-9a-fA-F]{64}")
+
+def staging_path(upload_id: str) -> str:
+    return os.path.join(config.UPLOAD_STAGING_DIR, f"{upload_id}.upload")
+
+def _remove_quietly(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+# Session-first helpers, run with DbSession.run()
+
+def create_session(db: Session, user_id: int, data: schemas.UploadSessionCreate) -> models.UploadSession:
+    if data.size <= 0:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="size must be positive")
+    if data.size > config.RESUMABLE_MAX_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"File exceeds the maximum upload size of {config.RESUMABLE_MAX_SIZE} bytes",
+        )
+    if data.checksum and not _HEX_SHA256.fullmatch(data.checksum):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="checksum must be a hex SHA-256")
+
+    upload = models.UploadSession(
+        id=uuid.uuid4().hex,
+        user_id=user_id,
+        filename=data.filename,
+        content_type=guess_content_type(data.filename, data.content_type),
+        size=data.size,
+        checksum=data.checksum.lower() if data.checksum else None,
+        received=0,
+        chunks_received=0,
+        expires_at=datetime.utcnow() + timedelta(seconds=config.UPLOAD_SESSION_TTL),
+    )
+    os.makedirs(config.UPLOAD_STAGING_DIR, exist_ok=True)
+    open(staging_path(upload.id), "wb").close()
+    db.add(upload)
+    job_service.enqueue(db, "uploads.expire", {"upload_id": upload.id}, delay=config.UPLOAD_SESSION_TTL)
+    db.commit()
+    db.refresh(upload)
+    return upload
+
+def get_session(db: Session, upload_id: str, user_id: int) -> Optional[models.UploadSession]:
+    return db.query(models.UploadSession).filter(
+        models.UploadSession.id == upload_id, models.UploadSession.user_id == user_id
+    ).first()
+
+def _offset_conflict(upload: models.UploadSession, detail: str) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail={"message": detail, "received": upload.received, "chunks_received": upload.chunks_received},
+        headers={"Upload-Offset": str(upload.received)},
+    )
+
+def claim_session(db: Session, upload_id: str, user_id: int, offset: int, chunk_number: int) -> models.UploadSession:
+    """
+    Take the session's write lease for the chunk that starts at `offset`.
+    Only the expected next chunk can be claimed, and only by one request at
+    a time, so concurrent or replayed PUTs never interleave on disk.
+    """
+    now = datetime.utcnow()
+    claimed = db.query(models.UploadSession).filter(
+        models.UploadSession.id == upload_id,
+        models.UploadSession.user_id == user_id,
+        models.UploadSession.received == offset,
+        models.UploadSession.chunks_received == chunk_number,
+        or_(models.UploadSession.locked_until.is_(None), models.UploadSession.locked_until < now),
+    ).update({"locked_until": now + CHUNK_LEASE}, synchronize_session=False)
+    db.commit()
+
+    upload = get_session(db, upload_id, user_id)
+    if upload is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Upload not found")
+    if not claimed:
+        if upload.received != offset or upload.chunks_received != chunk_number:
+            raise _offset_conflict(upload, "Chunk does not continue the upload")
+        raise _offset_conflict(upload, "Another request is writing to this upload")
+    return upload
+
+def complete_chunk(db: Session, upload_id: str, received: int) -> models.UploadSession:
+    db.query(models.UploadSession).filter(models.UploadSession.id == upload_id).update({
+        "received": received,
+        "chunks_received": models.UploadSession.chunks_received + 1,
+        "locked_until": None,
+        "expires_at": datetime.utcnow() + timedelta(seconds=config.UPLOAD_SESSION_TTL),
+    }, synchronize_session=False)
+    db.commit()
+    return db.query(models.UploadSession).populate_existing().filter(models.UploadSession.id == upload_id).first()
+
+def release_session(db: Session, upload_id: str):
+    db.query(models.UploadSession).filter(
+        models.UploadSession.id == upload_id
+    ).update({"locked_until": None}, synchronize_session=False)
+    db.commit()
+
+def delete_session(db: Session, upload_id: str):
+    db.query(models.UploadSession).filter(models.UploadSession.id == upload_id).delete(synchronize_session=False)
+    db.commit()
+    _remove_quietly(staging_path(upload_id))
+
+def attach_upload(
+    db: Session, upload_id: str, user_id: int, incident_id: int, attach_as: str, stored: StoredFile
+) -> Optional[models.Incident]:
+    """
+    Store the finished file and attach it to one of the user's incidents, in
+    one commit with the session's removal. Returns None if the incident is
+    not the user's.
+    """
+    incident = incident_service.get_incident(db, incident_id)
+    if incident is None or incident.user_id != user_id:
+        return None
+
+    replaced = incident_service.attach_files(db, incident, [(attach_as, stored)])
+    media_service.release_references(db, replaced)
+    db.query(models.UploadSession).filter(models.UploadSession.id == upload_id).delete(synchronize_session=False)
+    job_service.enqueue(db, "incident.media_attached", {"incident_id": incident.id})
+    outbox_service.incident_updated(db, incident, ["attachments"])
+    db.commit()
+    return incident_service.get_incident(db, incident_id)
+
+# Disk work for the router, off the event loop
+
+def _parse_checksum(header: str) -> bytes:
+    """Upload-Checksum: sha256 <base64 digest>, as in the tus protocol"""
+    algorithm, _, encoded = header.partition(" ")
+    try:
+        digest = base64.b64decode(encoded.strip(), validate=True)
+    except binascii.Error:
+        digest = b""
+    if algorithm.lower() != "sha256" or len(digest) != 32:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Upload-Checksum header must be 'sha256 <base64 digest>'",
+        )
+    return digest
+
+async def write_chunk(request: Request, upload: models.UploadSession, checksum_header: str) -> int:
+    """
+    Append the request body to the upload's staging file at its current
+    offset, as it arrives. Returns the new offset; on any failure the file
+    is cut back to where the chunk started.
+    """
+    expected = _parse_checksum(checksum_header)
+    offset = upload.received
+    limit = min(config.UPLOAD_MAX_CHUNK_SIZE, upload.size - offset)
+    hasher = hashlib.sha256()
+    written = 0
+
+    handle = await run_in_threadpool(open, staging_path(upload.id), "r+b")
+    try:
+        await run_in_threadpool(handle.seek, offset)
+        async for data in request.stream():
+            if not data:
+                continue
+            written += len(data)
+            if written > limit:
+                raise HTTPException(
+                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                    detail=f"Chunk exceeds {limit} bytes (the chunk limit or the rest of the declared size)",
+                )
+            hasher.update(data)
+            await run_in_threadpool(handle.write, data)
+        if written == 0:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Empty chunk")
+        if hasher.digest() != expected:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Chunk checksum mismatch")
+    except BaseException:
+        await run_in_threadpool(handle.truncate, offset)
+        raise
+    finally:
+        await run_in_threadpool(handle.close)
+    return offset + written
+
+def _hash_file(path: str, size: int) -> str:
+    hasher = hashlib.sha256()
+    with open(path, "r+b") as f:
+        f.truncate(size)
+        while chunk := f.read(config.UPLOAD_CHUNK_SIZE):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+async def hash_upload(upload: models.UploadSession) -> str:
+    """Content ID of a finished upload; verifies the declared checksum if one was given"""
+    content_id = await run_in_threadpool(_hash_file, staging_path(upload.id), upload.size)
+    if upload.checksum and upload.checksum != content_id:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="File checksum does not match the checksum declared for this upload",
+        )
+    return content_id
+
+@job_handler("uploads.expire", concurrency=2)
+def expire_upload(payload: dict):
+    """Remove a session (and its bytes) once it has seen no chunk for UPLOAD_SESSION_TTL"""
+    db = SessionLocal()
+    try:
+        upload = db.query(models.UploadSession).filter(models.UploadSession.id == payload["upload_id"]).first()
+        if upload is None:
+            return  # Finalized or already removed
+        now = datetime.utcnow()
+        if upload.expires_at > now:
+            # Still active: check again when it would next expire
+            delay = (upload.expires_at - now).total_seconds()
+            job_service.enqueue(db, "uploads.expire", payload, delay=delay)
+            db.commit()
+            return
+        upload_id = upload.id
+        deleted = db.query(models.UploadSession).filter(
+            models.UploadSession.id == upload_id,
+            models.UploadSession.expires_at <= now,
+            or_(models.UploadSession.locked_until.is_(None), models.UploadSession.locked_until < now),
+        ).delete(synchronize_session=False)
+        db.commit()
+        if deleted:
+            _remove_quietly(staging_path(upload_id))
+    finally:
+        db.close()
@@ -0,0 +1,90 @@
+# app/services/stats_service.py
+import asyncio
+from datetime import datetime, timedelta
+
+from sqlalchemy import case, desc, func
+from sqlalchemy.orm import Session, selectinload
+
+from ..core import config
+from ..core.cache import TTLCache
+from ..db import models, schemas
+from ..db.database import DbSession
+from . import media_service
+
+# Legacy status names are still counted with their current equivalents
+SUBMITTED_STATUSES = {"submitted", "pending"}
+UNDER_PROCESS_STATUSES = {"under_process", "in_progress"}
+
+_STATS_KEY = "admin_stats"
+_stats_cache = TTLCache(maxsize=1, ttl=config.ADMIN_STATS_TTL)
+# Only one request recomputes an expired payload; the rest wait for it
+_stats_lock = asyncio.Lock()
+# Bumped on every invalidation so a recompute that raced a write is not cached
+_stats_generation = 0
+
+def _compute_admin_stats(db: Session) -> schemas.AdminStats:
+    now = datetime.now()  # Matches the database default of func.now()
+    week_ago = now - timedelta(days=7)
+    month_ago = now - timedelta(days=30)
+
+    # One GROUP BY for the whole status breakdown and the weekly window
+    incident_rows = db.query(
+        models.Incident.status,
+        func.count(models.Incident.id),
+        func.sum(case((models.Incident.created_at >= week_ago, 1), else_=0)),
+    ).group_by(models.Incident.status).all()
+
+    by_status = {}
+    incidents_last_week = 0
+    for status, count, last_week in incident_rows:
+        by_status[status] = count
+        incidents_last_week += int(last_week or 0)
+
+    total_users, admin_users, users_last_month = db.query(
+        func.count(models.User.id),
+        func.sum(case((models.User.is_admin == True, 1), else_=0)),
+        func.sum(case((models.User.created_at >= month_ago, 1), else_=0)),
+    ).one()
+
+    recent_incidents = db.query(models.Incident).options(selectinload(models.Incident.media_items)).order_by(
+        desc(models.Incident.created_at)
+    ).limit(5).all()
+
+    return schemas.AdminStats(
+        total_incidents=sum(by_status.values()),
+        pending_incidents=sum(by_status.get(s, 0) for s in SUBMITTED_STATUSES),  # For backward compatibility
+        in_progress_incidents=sum(by_status.get(s, 0) for s in UNDER_PROCESS_STATUSES),  # For backward compatibility
+        resolved_incidents=by_status.get("resolved", 0),
+        rejected_incidents=by_status.get("rejected", 0),
+        total_users=total_users or 0,
+        admin_users=int(admin_users or 0),
+        incidents_last_week=incidents_last_week,
+        users_last_month=int(users_last_month or 0),
+        recent_incidents=recent_incidents,
+    )
+
+async def get_admin_stats(db: DbSession) -> schemas.AdminStats:
+    """
+    Dashboard statistics, served from a per-process cache for ADMIN_STATS_TTL
+    seconds. New incidents show up when it expires, so a surge of reports
+    costs one aggregate per TTL rather than one per dashboard refresh.
+    """
+    stats = _stats_cache.get(_STATS_KEY)
+    if stats is None:
+        async with _stats_lock:
+            stats = _stats_cache.get(_STATS_KEY)
+            if stats is None:
+                generation = _stats_generation
+                stats = await db.run(_compute_admin_stats)
+                if generation == _stats_generation:
+                    _stats_cache.set(_STATS_KEY, stats)
+    # Signed per response, so cached entries never hand out expired links
+    recent = [incident.model_dump() for incident in stats.recent_incidents]
+    await media_service.attach_signed_urls(db, recent)
+    return schemas.AdminStats.model_validate({**stats.model_dump(exclude={"recent_incidents"}), "recent_incidents": recent})
+
+def invalidate_admin_stats():
+    """Call after admin edits that change incident or user counts; new incidents wait for the TTL"""
+    global _stats_generation
+    _stats_generation += 1
+    _stats_cache.clear()
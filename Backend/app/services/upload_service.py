@@ -0,0 +1,392 @@
+# app/services/upload_service.py
+import asyncio
+import hashlib
+import mimetypes
+import os
+import uuid
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set, Type
+
+from fastapi import HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.exceptions import RequestValidationError
+from pydantic import BaseModel, ValidationError
+
+from ..core import config
+
+try:
+    import python_multipart as multipart
+    from python_multipart.multipart import parse_options_header
+except ModuleNotFoundError:  # Older python-multipart releases
+    import multipart
+    from multipart.multipart import parse_options_header
+
+
+@dataclass
+class StoredFile:
+    """A file part that has been written to disk and hashed."""
+    field_name: str
+    filename: str
+    content_type: str
+    path: str
+    size: int = 0
+    content_id: str = ""  # Hex SHA-256 of the content, set once the part is complete
+    staged: bool = True  # False once media_service has moved it into the media store
+
+
+@dataclass
+class StreamedForm:
+    """Text fields and stored files received from a multipart request."""
+    fields: Dict[str, str] = field(default_factory=dict)
+    files: Dict[str, List[StoredFile]] = field(default_factory=dict)
+
+    def first_file(self, name: str) -> Optional[StoredFile]:
+        files = self.files.get(name)
+        return files[0] if files else None
+
+    def all_files(self) -> List[StoredFile]:
+        return [stored for files in self.files.values() for stored in files]
+
+    def validate(self, model: Type[BaseModel]) -> BaseModel:
+        """
+        Validate the text fields against a schema, like FastAPI does for Form(...).
+        The stored files are discarded if validation fails.
+        """
+        try:
+            return model.model_validate(self.fields)
+        except ValidationError as e:
+            self.discard()
+            raise RequestValidationError(
+                [{**error, "loc": ("body", *error["loc"])} for error in e.errors()]
+            )
+
+    def discard(self):
+        """Remove this request's staged files (e.g. when the insert fails)"""
+        for stored in self.all_files():
+            if stored.staged:
+                _remove_quietly(stored.path)
+
+
+def _remove_quietly(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def guess_content_type(filename: str, declared: Optional[str]) -> str:
+    """
+    The declared content type, or one guessed from the file extension when
+    the client sent none or a generic one (mobile HTTP clients default to
+    application/octet-stream)
+    """
+    if declared and declared != "application/octet-stream":
+        return declared
+    return mimetypes.guess_type(filename or "")[0] or "application/octet-stream"
+
+
+def _decode(value: bytes, charset: str) -> str:
+    try:
+        return value.decode(charset)
+    except (UnicodeDecodeError, LookupError):
+        return value.decode("latin-1")
+
+
+class _Part:
+    def __init__(self):
+        self.headers: Dict[bytes, bytes] = {}
+        self.name = ""
+        self.data = bytearray()
+        self.stored: Optional[StoredFile] = None
+        self.handle = None
+        self.hasher = None
+        self.skip = False
+        self.last_write: Optional[asyncio.Future] = None  # Tail of this part's write chain
+
+    def write(self, data: bytes):
+        self.handle.write(data)
+        self.hasher.update(data)
+
+    def close(self):
+        self.handle.close()
+        self.stored.content_id = self.hasher.hexdigest()
+
+
+class _StreamingMultipartParser:
+    """
+    Multipart parser that writes file parts straight to the staging directory.
+
+    Starlette's form parser spools every file into a temporary file before the
+    endpoint runs, and the endpoint then has to copy it again. Here each file
+    part is opened in the staging directory as soon as its headers arrive and
+    the body is appended (and hashed) in fixed-size chunks as it comes off the
+    socket. media_service later moves the staged file into the media store
+    with a rename.
+
+    Disk writes run in the threadpool while the next chunks are read, chained
+    per part so each file is written in order, and with at most
+    max_pending_writes of them in flight per request. That bounds both memory
+    (chunks waiting for the disk) and the threadpool share of one request.
+    """
+
+    def __init__(
+        self,
+        request: Request,
+        file_fields: Set[str],
+        upload_dir: str,
+        max_file_size: int,
+        chunk_size: int,
+        max_pending_writes: int,
+    ):
+        self.request = request
+        self.file_fields = file_fields
+        self.upload_dir = upload_dir
+        self.max_file_size = max_file_size
+        self.chunk_size = chunk_size
+        self.max_pending_writes = max(1, max_pending_writes)
+        self.form = StreamedForm()
+        self._charset = "utf-8"
+        self._part = _Part()
+        self._header_name = b""
+        self._header_value = b""
+        # Callbacks from python-multipart are synchronous, so disk work is
+        # queued here and performed in the threadpool after each write().
+        self._pending: List[tuple] = []
+        self._open_parts: List[_Part] = []
+        self._writes: Set[asyncio.Future] = set()
+
+    # python-multipart callbacks
+    def on_part_begin(self):
+        self._part = _Part()
+
+    def on_header_field(self, data: bytes, start: int, end: int):
+        self._header_name += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+
+    def on_header_end(self):
+        self._part.headers[self._header_name.lower()] = self._header_value
+        self._header_name = b""
+        self._header_value = b""
+
+    def on_headers_finished(self):
+        part = self._part
+        _, options = parse_options_header(part.headers.get(b"content-disposition"))
+        if b"name" not in options:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail='The Content-Disposition header field "name" must be provided',
+            )
+        part.name = _decode(options[b"name"], self._charset)
+
+        if b"filename" not in options:
+            return
+
+        filename = _decode(options[b"filename"], self._charset)
+        if part.name not in self.file_fields or not filename:
+            # Unexpected or empty file inputs are drained without being stored
+            part.skip = True
+            return
+
+        extension = os.path.splitext(filename)[1]
+        part.stored = StoredFile(
+            field_name=part.name,
+            filename=filename,
+            content_type=guess_content_type(filename, _decode(part.headers.get(b"content-type", b""), "latin-1")),
+            path=os.path.join(self.upload_dir, f"{uuid.uuid4()}{extension}"),
+        )
+        self.form.files.setdefault(part.name, []).append(part.stored)
+        self._pending.append(("open", part))
+
+    def on_part_data(self, data: bytes, start: int, end: int):
+        part = self._part
+        if part.skip:
+            return
+        if part.stored is None:
+            if len(part.data) + (end - start) > config.MAX_FORM_FIELD_SIZE:
+                raise HTTPException(
+                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                    detail=f"Form field '{part.name}' is too large",
+                )
+            part.data += data[start:end]
+            return
+
+        part.stored.size += end - start
+        if part.stored.size > self.max_file_size:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"File '{part.stored.filename}' exceeds the maximum upload size of {self.max_file_size} bytes",
+            )
+        part.data += data[start:end]
+        if len(part.data) >= self.chunk_size:
+            self._pending.append(("write", part, bytes(part.data)))
+            part.data.clear()
+
+    def on_part_end(self):
+        part = self._part
+        if part.stored is not None:
+            if part.data:
+                self._pending.append(("write", part, bytes(part.data)))
+                part.data.clear()
+            self._pending.append(("close", part))
+        elif not part.skip:
+            self.form.fields[part.name] = _decode(bytes(part.data), self._charset)
+
+    # Disk work, off the event loop
+    def _chain(self, part: _Part, action, *args):
+        """Run a disk action for a part once its previous one has finished"""
+        previous = part.last_write
+
+        async def run():
+            if previous is not None:
+                await previous
+            await run_in_threadpool(action, *args)
+
+        part.last_write = asyncio.ensure_future(run())
+        self._writes.add(part.last_write)
+        part.last_write.add_done_callback(self._writes.discard)
+
+    async def _flush(self):
+        pending, self._pending = self._pending, []
+        for action, part, *payload in pending:
+            if action == "open":
+                part.handle = await run_in_threadpool(open, part.stored.path, "wb")
+                part.hasher = hashlib.sha256()
+                self._open_parts.append(part)
+            elif action == "write":
+                self._chain(part, part.write, payload[0])
+            else:
+                self._chain(part, part.close)
+        # Back-pressure: stop reading the body while too many writes are pending
+        while len(self._writes) > self.max_pending_writes:
+            done, _ = await asyncio.wait(self._writes, return_when=asyncio.FIRST_COMPLETED)
+            self._writes -= done
+            for task in done:
+                task.result()  # Raise the first write error
+
+    async def _wait_for_writes(self):
+        """Wait until every part's chained writes (and close) are done"""
+        await asyncio.gather(*[part.last_write for part in self._open_parts if part.last_write])
+        self._open_parts.clear()
+
+    async def _close_open_files(self):
+        # Let queued writes settle first so nothing reopens or writes to a discarded file
+        await asyncio.gather(*[part.last_write for part in self._open_parts if part.last_write],
+                             return_exceptions=True)
+        for part in self._open_parts:
+            await run_in_threadpool(part.handle.close)
+        self._open_parts.clear()
+
+    async def parse(self) -> StreamedForm:
+        content_type, params = parse_options_header(self.request.headers.get("content-type"))
+        if content_type != b"multipart/form-data" or b"boundary" not in params:
+            raise HTTPException(
+                status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+                detail="Expected a multipart/form-data request body",
+            )
+        charset = params.get(b"charset", b"utf-8")
+        self._charset = charset.decode("latin-1") if isinstance(charset, bytes) else charset
+
+        parser = multipart.MultipartParser(params[b"boundary"], {
+            "on_part_begin": self.on_part_begin,
+            "on_part_data": self.on_part_data,
+            "on_part_end": self.on_part_end,
+            "on_header_field": self.on_header_field,
+            "on_header_value": self.on_header_value,
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+        })
+
+        os.makedirs(self.upload_dir, exist_ok=True)
+        try:
+            async for chunk in self.request.stream():
+                parser.write(chunk)
+                await self._flush()
+            parser.finalize()
+            await self._flush()
+            await self._wait_for_writes()
+        except Exception as e:
+            await self._close_open_files()
+            self.form.discard()
+            if isinstance(e, HTTPException):
+                raise
+            if isinstance(e, OSError):
+                raise HTTPException(
+                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                    detail=f"Could not store upload: {str(e)}",
+                )
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Malformed multipart body: {str(e)}",
+            )
+        except asyncio.CancelledError:
+            # Client went away mid-upload: drop the partial files
+            await self._close_open_files()
+            self.form.discard()
+            raise
+        return self.form
+
+
+async def receive_multipart(
+    request: Request,
+    file_fields: Set[str],
+    upload_dir: str = config.UPLOAD_STAGING_DIR,
+    max_file_size: int = config.MAX_UPLOAD_SIZE,
+    chunk_size: int = config.UPLOAD_CHUNK_SIZE,
+    max_pending_writes: int = config.UPLOAD_WRITE_CONCURRENCY,
+) -> StreamedForm:
+    """
+    Read a multipart/form-data request body, streaming the parts named in
+    file_fields to upload_dir and enforcing max_file_size per file.
+    Stored files carry the SHA-256 content_id computed while streaming.
+    """
+    parser = _StreamingMultipartParser(
+        request, file_fields, upload_dir, max_file_size, chunk_size, max_pending_writes
+    )
+    return await parser.parse()
+
+
+async def read_body(request: Request, limit: int) -> bytes:
+    """
+    The whole request body, refused with 413 as soon as it is known to
+    exceed limit bytes: up front from Content-Length, or while reading.
+    """
+    too_large = HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=f"Request body exceeds {limit} bytes"
+    )
+    declared = request.headers.get("content-length", "")
+    if declared.isdigit() and int(declared) > limit:
+        raise too_large
+    body = bytearray()
+    async for data in request.stream():
+        body += data
+        if len(body) > limit:
+            raise too_large
+    return bytes(body)
+
+
+def multipart_openapi(model: Type[BaseModel], file_fields: Dict[str, bool]) -> dict:
+    """
+    OpenAPI requestBody for endpoints that parse their own multipart body.
+    file_fields maps each file field name to whether it accepts several files.
+    """
+    schema = model.model_json_schema()
+    properties = dict(schema.get("properties", {}))
+    for name, multiple in file_fields.items():
+        binary = {"type": "string", "format": "binary"}
+        properties[name] = {"type": "array", "items": binary} if multiple else binary
+    return {
+        "requestBody": {
+            "required": True,
+            "content": {
+                "multipart/form-data": {
+                    "schema": {
+                        "type": "object",
+                        "properties": properties,
+                        "required": schema.get("required", []),
+                    }
+                }
+            },
+        }
+    }
@@ -0,0 +1,26 @@
+# app/services/user_service.py
+from sqlalchemy.orm import Session
+from ..db import models
+
+# Query helpers take the Session first so routers can run them with
+# `await db.run(user_service.<fn>, ...)` on either engine.
+
+def get_user(db: Session, user_id: int):
+    return db.query(models.User).filter(models.User.id == user_id).first()
+
+def get_user_by_email(db: Session, email: str):
+    return db.query(models.User).filter(models.User.email == email).first()
+
+def list_users(db: Session):
+    return db.query(models.User).all()
+
+def save_user(db: Session, user: models.User) -> models.User:
+    """Insert a new user or commit changes to a loaded one"""
+    db.add(user)
+    db.commit()
+    db.refresh(user)
+    return user
+
+def delete_user(db: Session, user: models.User):
+    db.delete(user)
+    db.commit()
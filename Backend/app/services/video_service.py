@@ -0,0 +1,144 @@
+# app/services/video_service.py
+import json
+import os
+import shutil
+import subprocess
+import uuid
+from typing import List, Optional
+
+from ..core import config
+
+# HLS ladder: name, short side in pixels, video and audio bitrates.
+# Renditions larger than the source are skipped (the smallest is always kept).
+RENDITIONS = (
+    ("360p", 360, "800k", "96k"),
+    ("720p", 720, "2800k", "128k"),
+)
+SEGMENT_SECONDS = 2  # Short segments so players can start after the first one
+PLAYLIST_NAME = "master.m3u8"
+POSTER_NAME = "poster.jpg"
+CONTENT_TYPES = {
+    ".m3u8": "application/vnd.apple.mpegurl",
+    ".ts": "video/mp2t",
+    ".jpg": "image/jpeg",
+}
+
+class VideoError(Exception):
+    """The file could not be probed or transcoded (not a video, or ffmpeg failed)"""
+
+def _binary(name: str) -> Optional[str]:
+    return shutil.which(name)
+
+def available() -> bool:
+    return bool(_binary(config.FFMPEG_BINARY) and _binary(config.FFPROBE_BINARY))
+
+def supports(content_type: str) -> bool:
+    return available() and bool(content_type) and content_type.startswith("video/")
+
+def _run(args: List[str]) -> subprocess.CompletedProcess:
+    try:
+        result = subprocess.run(args, capture_output=True, timeout=config.VIDEO_TRANSCODE_TIMEOUT)
+    except subprocess.TimeoutExpired:
+        raise VideoError(f"{os.path.basename(args[0])} timed out after {config.VIDEO_TRANSCODE_TIMEOUT}s")
+    except OSError as e:
+        raise VideoError(str(e))
+    if result.returncode != 0:
+        raise VideoError(result.stderr.decode(errors="replace").strip()[-2000:] or f"exit code {result.returncode}")
+    return result
+
+def probe(source_path: str) -> dict:
+    """Duration (seconds), codec, width, height and whether there is audio"""
+    result = _run([
+        _binary(config.FFPROBE_BINARY) or config.FFPROBE_BINARY,
+        "-v", "error", "-print_format", "json", "-show_format", "-show_streams", source_path,
+    ])
+    try:
+        info = json.loads(result.stdout)
+    except ValueError as e:
+        raise VideoError(f"Unreadable ffprobe output: {str(e)}")
+    streams = info.get("streams", [])
+    video = next((s for s in streams if s.get("codec_type") == "video"), None)
+    if video is None or not video.get("width") or not video.get("height"):
+        raise VideoError("No video stream")
+    width, height = int(video["width"]), int(video["height"])
+    # Phones record landscape frames with a rotation tag for portrait video
+    rotation = video.get("tags", {}).get("rotate") or next(
+        (side.get("rotation") for side in video.get("side_data_list", []) if "rotation" in side), 0
+    )
+    if abs(int(float(rotation))) % 180 == 90:
+        width, height = height, width
+    duration = info.get("format", {}).get("duration") or video.get("duration")
+    return {
+        "duration": float(duration) if duration else None,
+        "codec": video.get("codec_name"),
+        "width": width,
+        "height": height,
+        "has_audio": any(s.get("codec_type") == "audio" for s in streams),
+    }
+
+def _ladder(width: int, height: int) -> list:
+    short_side = min(width, height)
+    ladder = [rendition for rendition in RENDITIONS if rendition[1] <= short_side]
+    if not ladder:
+        name, _, video_rate, audio_rate = RENDITIONS[0]
+        ladder = [(name, short_side - short_side % 2, video_rate, audio_rate)]
+    return ladder
+
+def _scale(size: int, width: int, height: int) -> str:
+    # Scale the short side, keeping the aspect ratio and even dimensions
+    return f"scale=-2:{size}" if width >= height else f"scale={size}:-2"
+
+def transcode_hls(source_path: str, target_dir: str, info: dict) -> List[str]:
+    """
+    Write an HLS ladder and a poster frame for a probed video into
+    target_dir: master.m3u8, <rendition>/index.m3u8 with its segments, and
+    poster.jpg. The source is decoded once for all renditions. Everything is
+    written to a temporary directory that is renamed into place, so readers
+    never see a partial ladder. Returns the rendition names.
+    """
+    width, height = info["width"], info["height"]
+    ladder = _ladder(width, height)
+    temp_dir = f"{target_dir}.{uuid.uuid4().hex}.tmp"
+    ffmpeg = _binary(config.FFMPEG_BINARY) or config.FFMPEG_BINARY
+    try:
+        for name, *_ in ladder:
+            os.makedirs(os.path.join(temp_dir, name))
+
+        split = f"[0:v]split={len(ladder)}" + "".join(f"[s{i}]" for i in range(len(ladder)))
+        scales = [f"[s{i}]{_scale(size, width, height)}[v{i}]" for i, (_, size, _, _) in enumerate(ladder)]
+        args = [ffmpeg, "-hide_banner", "-loglevel", "error", "-y", "-i", source_path,
+                "-filter_complex", ";".join([split] + scales)]
+        stream_map = []
+        for i, (name, _, video_rate, audio_rate) in enumerate(ladder):
+            args += ["-map", f"[v{i}]", f"-c:v:{i}", "libx264", f"-b:v:{i}", video_rate,
+                     f"-maxrate:v:{i}", video_rate, f"-bufsize:v:{i}", video_rate]
+            if info.get("has_audio"):
+                args += ["-map", "0:a:0", f"-c:a:{i}", "aac", f"-b:a:{i}", audio_rate]
+                stream_map.append(f"v:{i},a:{i},name:{name}")
+            else:
+                stream_map.append(f"v:{i},name:{name}")
+        args += [
+            "-preset", "veryfast", "-pix_fmt", "yuv420p",
+            # A keyframe at every segment boundary, so each segment starts playback on its own
+            "-force_key_frames", f"expr:gte(t,n_forced*{SEGMENT_SECONDS})", "-sc_threshold", "0",
+            "-f", "hls", "-hls_time", str(SEGMENT_SECONDS), "-hls_playlist_type", "vod",
+            "-hls_flags", "independent_segments",
+            "-hls_segment_filename", os.path.join(temp_dir, "%v", "segment_%04d.ts"),
+            "-master_pl_name", PLAYLIST_NAME,
+            "-var_stream_map", " ".join(stream_map),
+            os.path.join(temp_dir, "%v", "index.m3u8"),
+        ]
+        _run(args)
+
+        poster_at = min(1.0, (info.get("duration") or 0) / 2)
+        _run([ffmpeg, "-hide_banner", "-loglevel", "error", "-y", "-ss", f"{poster_at:.2f}", "-i", source_path,
+              "-frames:v", "1", "-vf", _scale(ladder[-1][1], width, height), "-q:v", "3",
+              os.path.join(temp_dir, POSTER_NAME)])
+
+        if os.path.isdir(target_dir):
+            shutil.rmtree(target_dir)  # Left by an earlier attempt
+        os.replace(temp_dir, target_dir)
+    except BaseException:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        raise
+    return [name for name, *_ in ladder]
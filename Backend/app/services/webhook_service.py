@@ -0,0 +1,429 @@
+# app/services/webhook_service.py
+import hashlib
+import hmac
+import http.client
+import json
+import random
+import secrets
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from fastapi import HTTPException, status
+from sqlalchemy import func, insert, or_
+from sqlalchemy.orm import Session
+
+from ..core import config
+from ..core.metrics import LatencyStats
+from ..db import models, schemas
+from ..db.database import SessionLocal
+from . import job_service
+from .job_service import job_handler, sweeper
+from .outbox_service import EVENT_TYPES
+
+# How long one delivery run may hold a subscription before another takes over
+DELIVERY_LEASE = timedelta(minutes=5)
+
+# Connection pooling
+
+class ConnectionPool:
+    """
+    Keep-alive HTTP(S) connections per endpoint host, so a partner receiving
+    a steady stream of batches is not paying a TCP/TLS handshake for each
+    """
+
+    def __init__(self, max_idle_per_host: int, timeout: float):
+        self.max_idle_per_host = max_idle_per_host
+        self.timeout = timeout
+        self._idle: Dict[Tuple[str, str, int], List[http.client.HTTPConnection]] = {}
+        self._lock = threading.Lock()
+        self.opened = 0
+        self.reused = 0
+
+    def _checkout(self, key) -> Tuple[http.client.HTTPConnection, bool]:
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                self.reused += 1
+                return idle.pop(), True
+            self.opened += 1
+        scheme, host, port = key
+        connection_class = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+        return connection_class(host, port, timeout=self.timeout), False
+
+    def _checkin(self, key, connection: http.client.HTTPConnection):
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_idle_per_host:
+                idle.append(connection)
+                return
+        connection.close()
+
+    def post(self, url: str, body: bytes, headers: Dict[str, str]) -> Tuple[int, bytes]:
+        """POST and return (status, response body); raises OSError or http.client.HTTPException"""
+        parts = urlsplit(url)
+        scheme = parts.scheme.lower()
+        key = (scheme, parts.hostname, parts.port or (443 if scheme == "https" else 80))
+        path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        while True:
+            connection, reused = self._checkout(key)
+            try:
+                connection.request("POST", path, body=body, headers=headers)
+                response = connection.getresponse()
+                data = response.read()
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                if reused:
+                    continue  # The server closed an idle connection; retry on a fresh one
+                raise
+            if response.will_close:
+                connection.close()
+            else:
+                self._checkin(key, connection)
+            return response.status, data
+
+    def stats(self) -> dict:
+        with self._lock:
+            idle = sum(len(connections) for connections in self._idle.values())
+        return {"opened": self.opened, "reused": self.reused, "idle": idle}
+
+pool = ConnectionPool(config.WEBHOOK_POOL_SIZE, config.WEBHOOK_TIMEOUT)
+
+# Worker-local delivery metrics, for /admin/metrics
+delivery_lag = LatencyStats()  # Outbox write to acknowledged delivery, per event
+request_latency = LatencyStats()  # Per POST
+_counters = {"delivered": 0, "failed_attempts": 0, "dead_lettered": 0}
+_counters_lock = threading.Lock()
+
+def _count(name: str, n: int = 1):
+    with _counters_lock:
+        _counters[name] += n
+
+def delivery_stats() -> dict:
+    with _counters_lock:
+        counters = dict(_counters)
+    return {
+        **counters,
+        "lag": delivery_lag.snapshot(),
+        "requests": request_latency.snapshot(),
+        "connections": pool.stats(),
+    }
+
+# Subscriptions. Session-first helpers, run with DbSession.run().
+
+def _check_event_types(event_types: Optional[List[str]]):
+    unknown = set(event_types or ()) - set(EVENT_TYPES)
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown event types: {', '.join(sorted(unknown))}; use {', '.join(EVENT_TYPES)}",
+        )
+
+def _check_url(url: str):
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="url must be an http(s) URL")
+
+def create_subscription(db: Session, data: schemas.WebhookSubscriptionCreate) -> models.WebhookSubscription:
+    """New subscriptions receive events from now on, not the outbox's history"""
+    _check_url(data.url)
+    _check_event_types(data.event_types)
+    subscription = models.WebhookSubscription(
+        name=data.name,
+        url=data.url,
+        secret=secrets.token_hex(32),
+        event_types=data.event_types,
+        active=True,
+        last_event_id=db.query(func.max(models.OutboxEvent.id)).scalar() or 0,
+        attempts=0,
+    )
+    db.add(subscription)
+    db.commit()
+    db.refresh(subscription)
+    return subscription
+
+def list_subscriptions(db: Session) -> List[dict]:
+    """Subscriptions with their backlog: events not yet delivered, and the age of the oldest"""
+    subscriptions = db.query(models.WebhookSubscription).order_by(models.WebhookSubscription.id).all()
+    now = datetime.utcnow()
+    results = []
+    for subscription in subscriptions:
+        pending, oldest = db.query(func.count(models.OutboxEvent.id), func.min(models.OutboxEvent.created_at)).filter(
+            models.OutboxEvent.id > subscription.last_event_id
+        ).one()
+        result = schemas.WebhookSubscription.model_validate(subscription).model_dump()
+        result["pending_events"] = pending
+        result["lag_seconds"] = round((now - oldest).total_seconds(), 3) if oldest else 0.0
+        results.append(result)
+    return results
+
+def get_subscription(db: Session, subscription_id: int) -> Optional[models.WebhookSubscription]:
+    return db.query(models.WebhookSubscription).populate_existing().filter(
+        models.WebhookSubscription.id == subscription_id
+    ).first()
+
+def update_subscription(
+    db: Session, subscription: models.WebhookSubscription, data: schemas.WebhookSubscriptionUpdate
+) -> models.WebhookSubscription:
+    if data.url is not None:
+        _check_url(data.url)
+        subscription.url = data.url
+    if data.name is not None:
+        subscription.name = data.name
+    if data.event_types is not None:
+        _check_event_types(data.event_types)
+        subscription.event_types = data.event_types or None
+    if data.active is not None:
+        subscription.active = data.active
+        # Resume straight away rather than at the end of a backoff
+        subscription.attempts = 0
+        subscription.next_attempt_at = None
+    if data.active:
+        job_service.enqueue(db, "webhooks.deliver")
+    db.commit()
+    db.refresh(subscription)
+    return subscription
+
+def rotate_secret(db: Session, subscription: models.WebhookSubscription) -> models.WebhookSubscription:
+    subscription.secret = secrets.token_hex(32)
+    db.commit()
+    db.refresh(subscription)
+    return subscription
+
+def delete_subscription(db: Session, subscription: models.WebhookSubscription):
+    db.query(models.WebhookDeadLetter).filter(
+        models.WebhookDeadLetter.subscription_id == subscription.id
+    ).delete(synchronize_session=False)
+    db.delete(subscription)
+    db.commit()
+
+def list_dead_letters(db: Session, subscription_id: int, limit: int) -> List[models.WebhookDeadLetter]:
+    return db.query(models.WebhookDeadLetter).filter(
+        models.WebhookDeadLetter.subscription_id == subscription_id
+    ).order_by(models.WebhookDeadLetter.id.desc()).limit(limit).all()
+
+# Delivery engine, run by the job worker. Each subscription is held by one
+# run at a time and its cursor only moves past a batch once the endpoint
+# acknowledged it (or it was dead-lettered), so every subscriber sees events
+# in outbox order, at least once.
+
+def _claimable(now: datetime):
+    return (
+        models.WebhookSubscription.active.is_(True),
+        or_(models.WebhookSubscription.next_attempt_at.is_(None), models.WebhookSubscription.next_attempt_at <= now),
+        or_(models.WebhookSubscription.locked_until.is_(None), models.WebhookSubscription.locked_until < now),
+    )
+
+def _claim_subscriptions(db: Session, run_id: str) -> List[int]:
+    """Take every subscription that is due and has undelivered events"""
+    now = datetime.utcnow()
+    newest = db.query(func.max(models.OutboxEvent.id)).scalar()
+    if newest is None:
+        return []
+    candidate_ids = [row.id for row in db.query(models.WebhookSubscription.id).filter(
+        *_claimable(now), models.WebhookSubscription.last_event_id < newest
+    )]
+    if not candidate_ids:
+        return []
+    db.query(models.WebhookSubscription).filter(
+        models.WebhookSubscription.id.in_(candidate_ids), *_claimable(now)
+    ).update({"locked_by": run_id, "locked_until": now + DELIVERY_LEASE}, synchronize_session=False)
+    db.commit()
+    return [row.id for row in db.query(models.WebhookSubscription.id).filter(
+        models.WebhookSubscription.id.in_(candidate_ids), models.WebhookSubscription.locked_by == run_id
+    )]
+
+def _next_events(db: Session, after: int) -> Tuple[List[models.OutboxEvent], float]:
+    """
+    The next batch after the cursor, stopping short of an id gap: a lower
+    id may belong to a transaction that has not committed yet. A gap that
+    stays open for WEBHOOK_GAP_TIMEOUT was a rollback and is skipped.
+    Also returns how many seconds to wait before looking past the gap.
+    """
+    events = db.query(models.OutboxEvent).filter(
+        models.OutboxEvent.id > after
+    ).order_by(models.OutboxEvent.id).limit(config.WEBHOOK_BATCH_SIZE).all()
+    now = datetime.utcnow()
+    expected = after + 1
+    for index, event in enumerate(events):
+        if event.id != expected:
+            age = (now - event.created_at).total_seconds()
+            if age < config.WEBHOOK_GAP_TIMEOUT:
+                return events[:index], config.WEBHOOK_GAP_TIMEOUT - age
+        expected = event.id + 1
+    return events, 0.0
+
+def _sign(secret: str, timestamp: str, body: bytes) -> str:
+    digest = hmac.new(secret.encode(), timestamp.encode() + b"." + body, hashlib.sha256).hexdigest()
+    return f"sha256={digest}"
+
+def _post(subscription: models.WebhookSubscription, events: List[models.OutboxEvent]) -> Tuple[Optional[int], str]:
+    """POST one batch; returns (HTTP status or None if unreachable, error text)"""
+    body = json.dumps({"events": [{
+        "id": event.id,
+        "type": event.event_type,
+        "occurred_at": event.created_at.isoformat() + "Z",
+        "data": event.payload,
+    } for event in events]}, default=str, separators=(",", ":")).encode()
+    timestamp = str(int(time.time()))
+    headers = {
+        "Content-Type": "application/json",
+        "User-Agent": "incident-app-webhooks",
+        "X-Webhook-Subscription": str(subscription.id),
+        "X-Webhook-Timestamp": timestamp,
+        "X-Webhook-Signature": _sign(subscription.secret, timestamp, body),
+    }
+    started = time.perf_counter()
+    try:
+        code, response = pool.post(subscription.url, body, headers)
+    except (OSError, http.client.HTTPException) as e:
+        return None, f"Request failed: {str(e)}"
+    finally:
+        request_latency.observe(time.perf_counter() - started)
+    return code, "" if 200 <= code < 300 else f"HTTP {code}: {response[:500].decode(errors='replace')}"
+
+def _is_permanent(code: Optional[int]) -> bool:
+    """Client errors other than timeouts and rate limits will not succeed on retry"""
+    return code is not None and 400 <= code < 500 and code not in (408, 425, 429)
+
+def _retry_delay(attempts: int) -> float:
+    """Exponential backoff, jittered so subscriptions failing together do not retry in lockstep"""
+    ceiling = min(config.WEBHOOK_RETRY_MAX_DELAY, config.WEBHOOK_RETRY_BASE_DELAY * (2 ** (attempts - 1)))
+    return random.uniform(ceiling / 2, ceiling)
+
+def _dead_letter(db: Session, subscription: models.WebhookSubscription, events: List[models.OutboxEvent], error: str):
+    db.execute(insert(models.WebhookDeadLetter), [{
+        "subscription_id": subscription.id,
+        "event_id": event.id,
+        "event_type": event.event_type,
+        "payload": event.payload,
+        "error": error,
+        "attempts": (subscription.attempts or 0) + 1,
+    } for event in events])
+    _count("dead_lettered", len(events))
+    print(f"Dead-lettered {len(events)} event(s) for webhook {subscription.id}: {error}")
+
+def _drain(subscription_id: int, run_id: str) -> float:
+    """
+    Deliver a claimed subscription's events batch by batch until it is
+    caught up or failing; then release it. Returns seconds until it should
+    be looked at again (0 if not needed).
+    """
+    db = SessionLocal()
+    try:
+        held = db.query(models.WebhookSubscription).filter(
+            models.WebhookSubscription.id == subscription_id, models.WebhookSubscription.locked_by == run_id
+        )
+        while True:
+            subscription = db.query(models.WebhookSubscription).populate_existing().filter(
+                models.WebhookSubscription.id == subscription_id
+            ).first()
+            if subscription is None or subscription.locked_by != run_id or not subscription.active:
+                held.update({"locked_by": None, "locked_until": None}, synchronize_session=False)
+                db.commit()
+                return 0.0
+            events, wait = _next_events(db, subscription.last_event_id)
+            if not events:
+                held.update({
+                    "next_attempt_at": datetime.utcnow() + timedelta(seconds=wait) if wait else None,
+                    "locked_by": None,
+                    "locked_until": None,
+                }, synchronize_session=False)
+                db.commit()
+                return wait
+            wanted = [event for event in events if not subscription.event_types or event.event_type in subscription.event_types]
+            code, error = _post(subscription, wanted) if wanted else (200, "")
+            now = datetime.utcnow()
+            if not error:
+                for event in wanted:
+                    delivery_lag.observe((now - event.created_at).total_seconds())
+                _count("delivered", len(wanted))
+                held.update({
+                    "last_event_id": events[-1].id,
+                    "attempts": 0,
+                    "next_attempt_at": None,
+                    "last_error": None,
+                    "locked_until": now + DELIVERY_LEASE,
+                }, synchronize_session=False)
+                db.commit()
+                continue
+
+            _count("failed_attempts")
+            attempts = (subscription.attempts or 0) + 1
+            if _is_permanent(code) or attempts >= config.WEBHOOK_MAX_ATTEMPTS:
+                # Give up on this batch so the ones behind it are not held up forever
+                _dead_letter(db, subscription, wanted, error)
+                held.update({
+                    "last_event_id": events[-1].id,
+                    "attempts": 0,
+                    "next_attempt_at": None,
+                    "last_error": error,
+                    "locked_until": now + DELIVERY_LEASE,
+                }, synchronize_session=False)
+                db.commit()
+                continue
+            delay = _retry_delay(attempts)
+            held.update({
+                "attempts": attempts,
+                "next_attempt_at": now + timedelta(seconds=delay),
+                "last_error": error,
+                "locked_by": None,
+                "locked_until": None,
+            }, synchronize_session=False)
+            db.commit()
+            return delay
+    finally:
+        db.close()
+
+def _schedule(db: Session, delay: float):
+    """Make sure a delivery run happens within `delay` seconds, without piling up duplicate runs"""
+    run_after = datetime.utcnow() + timedelta(seconds=delay)
+    pending = db.query(models.Job.id).filter(
+        models.Job.job_type == "webhooks.deliver",
+        models.Job.status == "queued",
+        models.Job.run_after <= run_after,
+    ).first()
+    if pending is None:
+        job_service.enqueue(db, "webhooks.deliver", delay=delay)
+    db.commit()
+
+@job_handler("webhooks.deliver", concurrency=1)
+def deliver_webhooks(payload: dict):
+    """Deliver outbox events to every due subscription, WEBHOOK_CONCURRENCY subscriptions at a time"""
+    run_id = uuid.uuid4().hex[:12]
+    # Hand over to a fresh job well before this one's visibility timeout
+    deadline = time.monotonic() + config.JOBS_VISIBILITY_TIMEOUT / 2
+    db = SessionLocal()
+    try:
+        waits = []
+        with ThreadPoolExecutor(max_workers=max(1, config.WEBHOOK_CONCURRENCY)) as executor:
+            while True:
+                if time.monotonic() > deadline:
+                    waits.append(0.0)
+                    break
+                subscription_ids = _claim_subscriptions(db, run_id)
+                if not subscription_ids:
+                    break
+                results = executor.map(lambda subscription_id: _drain(subscription_id, run_id), subscription_ids)
+                waits.extend(wait for wait in results if wait > 0)
+        if waits:
+            _schedule(db, min(waits))
+    finally:
+        db.close()
+
+@sweeper
+def sweep_webhooks(db: Session):
+    """Start a delivery run for backlogs no run is handling, e.g. after a worker died mid-delivery"""
+    now = datetime.utcnow()
+    newest = db.query(func.max(models.OutboxEvent.id)).scalar()
+    if newest is None:
+        return
+    waiting = db.query(models.WebhookSubscription.id).filter(
+        *_claimable(now), models.WebhookSubscription.last_event_id < newest
+    ).first()
+    if waiting is not None:
+        _schedule(db, 0)
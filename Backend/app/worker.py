@@ -0,0 +1,40 @@
+# app/worker.py
+"""
+Standalone background job worker.
+
+Run alongside the API when JOBS_IN_PROCESS=false (or to add capacity):
+
+    python -m app.worker                      # all registered job types
+    python -m app.worker --type incident.created
+"""
+import argparse
+import asyncio
+import signal
+import sys
+
+from .services import job_service
+# Importing the services registers their job handlers and sweepers
+from .services import (  # noqa: F401
+    idempotency_service, incident_service, media_service, notification_service, outbox_service,
+    resumable_upload_service, webhook_service,
+)
+
+async def _run(job_types):
+    worker = job_service.JobWorker(job_types=job_types)
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, lambda: asyncio.ensure_future(worker.stop()))
+    print(f"Job worker {worker.worker_id} started")
+    await worker.run()
+    await worker.stop()
+    print(f"Job worker {worker.worker_id} stopped")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Background job worker")
+    parser.add_argument("--type", dest="job_types", action="append", default=None,
+                        help="Only run this job type (repeatable)")
+    args = parser.parse_args(argv)
+    asyncio.run(_run(args.job_types))
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,48 @@
+"""
+Local stand-in for a push gateway, for trying status-change notifications
+without FCM credentials:
+
+    python fake_push.py [port]                       # default 8787
+    PUSH_ENDPOINT_URL=http://127.0.0.1:8787/send uvicorn app.main:app
+
+Prints each batch it receives. Tokens starting with "invalid" are reported
+as unregistered (the backend forgets them) and tokens starting with "retry"
+as a transient failure (the backend backs off and sends again).
+"""
+import json
+import sys
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+def outcome(token):
+    if token.startswith("invalid"):
+        return "invalid"
+    if token.startswith("retry"):
+        return "retry"
+    return "sent"
+
+class FakePushHandler(BaseHTTPRequestHandler):
+    received = []  # Every message, in arrival order
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        messages = json.loads(self.rfile.read(length) or b"{}").get("messages", [])
+        FakePushHandler.received.extend(messages)
+        for message in messages:
+            print(f"push {outcome(message['token'])}: {message['token']} {message['title']!r} {message['body']!r} {message['data']}")
+        body = json.dumps({"results": [{"status": outcome(message["token"])} for message in messages]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def serve(port=8787):
+    server = ThreadingHTTPServer(("127.0.0.1", port), FakePushHandler)
+    print(f"Fake push gateway on http://127.0.0.1:{port}/send")
+    return server
+
+if __name__ == "__main__":
+    serve(int(sys.argv[1]) if len(sys.argv) > 1 else 8787).serve_forever()
@@ -0,0 +1,76 @@
+"""
+Local stand-in for a partner's webhook receiver, for trying incident event
+delivery end to end:
+
+    python fake_webhook.py [--port 8789] [--secret SECRET] [--fail-rate 0.3]
+
+Subscribe it from the admin API with url http://127.0.0.1:8789/hook and pass
+the returned secret with --secret to verify signatures. --fail-rate answers
+that share of batches with 503 to exercise retries; --reject answers 400 to
+exercise dead-lettering. Each batch is printed with its event ids, and
+out-of-order ids are flagged.
+"""
+import argparse
+import hashlib
+import hmac
+import json
+import random
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class FakeWebhookHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, as the sender pools connections
+    secret = None
+    fail_rate = 0.0
+    reject = False
+    received = []  # Every delivered event, in arrival order
+    last_id = {}  # Subscription -> highest event id seen
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        subscription = self.headers.get("X-Webhook-Subscription")
+        if self.secret is not None:
+            timestamp = self.headers.get("X-Webhook-Timestamp", "")
+            expected = "sha256=" + hmac.new(self.secret.encode(), timestamp.encode() + b"." + body, hashlib.sha256).hexdigest()
+            if not hmac.compare_digest(expected, self.headers.get("X-Webhook-Signature", "")):
+                return self._answer(401, "bad signature")
+        if self.reject:
+            return self._answer(400, "rejected")
+        if random.random() < self.fail_rate:
+            return self._answer(503, "try again")
+
+        events = json.loads(body)["events"]
+        ids = [event["id"] for event in events]
+        previous = FakeWebhookHandler.last_id.get(subscription, 0)
+        in_order = ids == sorted(ids) and (not ids or ids[0] > previous)
+        FakeWebhookHandler.last_id[subscription] = max([previous] + ids)
+        FakeWebhookHandler.received.extend(events)
+        print(f"subscription {subscription}: {len(events)} event(s) {ids[0]}..{ids[-1]}{'' if in_order else ' OUT OF ORDER'}")
+        self._answer(200, "ok")
+
+    def _answer(self, code, text):
+        body = text.encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "text/plain")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def serve(port=8789, secret=None, fail_rate=0.0, reject=False):
+    FakeWebhookHandler.secret = secret
+    FakeWebhookHandler.fail_rate = fail_rate
+    FakeWebhookHandler.reject = reject
+    server = ThreadingHTTPServer(("127.0.0.1", port), FakeWebhookHandler)
+    print(f"Fake webhook receiver on http://127.0.0.1:{port}/hook")
+    return server
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local webhook receiver")
+    parser.add_argument("--port", type=int, default=8789)
+    parser.add_argument("--secret", help="Verify X-Webhook-Signature with this secret")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Share of batches answered with 503")
+    parser.add_argument("--reject", action="store_true", help="Answer every batch with 400")
+    args = parser.parse_args()
+    serve(args.port, args.secret, args.fail_rate, args.reject).serve_forever()
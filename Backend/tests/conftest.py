@@ -0,0 +1,22 @@
+import os
+import sys
+
+# Run from Backend/ (`python -m pytest`) or anywhere else
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+
+@pytest.fixture
+def session_factory():
+    """sessionmaker over a fresh in-memory SQLite schema, shared across threads"""
+    from app.db import models  # noqa: F401 (registers the tables)
+    from app.db.database import Base
+
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    yield sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    engine.dispose()
@@ -0,0 +1,122 @@
+import asyncio
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.core import config
+from app.db import models
+from app.db.database import Base
+from app.services import event_service
+
+START = datetime(2026, 1, 1, 12, 0, 0)
+
+class _Db:
+    """DbSession.run() over a plain Session"""
+
+    def __init__(self, session):
+        self.session = session
+
+    async def run(self, fn, *args, **kwargs):
+        return fn(self.session, *args, **kwargs)
+
+@pytest.fixture
+def session(monkeypatch):
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    monkeypatch.setattr(event_service, "broadcaster", event_service.EventBroadcaster(100, 16, 10))
+    monkeypatch.setattr(event_service, "_published", event_service.TTLCache(maxsize=1000, ttl=60))
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+    engine.dispose()
+
+def _add(session, title, created_at, updated_at=None, status="submitted"):
+    # As committed by another process
+    incident = models.Incident(
+        user_id=1, title=title, status=status, created_at=created_at, updated_at=updated_at or created_at
+    )
+    session.add(incident)
+    session.commit()
+    return incident
+
+def _events():
+    return [(event_type, json.loads(data)) for _, event_type, data in event_service.broadcaster._recent]
+
+def test_publishes_changes_from_other_processes_once(session):
+    first = _add(session, "Before", START)
+    poller = event_service.ChangePoller()
+    db = _Db(session)
+    asyncio.run(poller.poll(db))  # Starts from the latest change
+    assert _events() == []
+
+    second = _add(session, "Pothole", START + timedelta(seconds=10))
+    first.status = "resolved"
+    first.updated_at = START + timedelta(seconds=11)
+    session.commit()
+    asyncio.run(poller.poll(db))
+    asyncio.run(poller.poll(db))  # The overlap finds them again
+
+    events = _events()
+    assert [(event_type, data["id"]) for event_type, data in events] == [
+        ("incident.created", second.id),
+        ("incident.updated", first.id),
+    ]
+    assert events[0][1]["title"] == "Pothole"
+    assert events[1][1]["status"] == "resolved"
+
+def test_skips_changes_this_process_published(session):
+    poller = event_service.ChangePoller()
+    db = _Db(session)
+    asyncio.run(poller.poll(db))
+
+    incident = _add(session, "Local", START)
+    event_service.incident_created(incident)
+    asyncio.run(poller.poll(db))
+
+    assert [event_type for event_type, _ in _events()] == ["incident.created"]
+
+def test_a_burst_of_changes_resyncs_dashboards_once(session, monkeypatch):
+    monkeypatch.setattr(config, "EVENTS_POLL_BATCH", 3)
+    subscriber = event_service._Subscriber(16)
+    event_service.broadcaster._subscribers.add(subscriber)
+    poller = event_service.ChangePoller()
+    db = _Db(session)
+    asyncio.run(poller.poll(db))
+
+    for n in range(5):  # e.g. one /incidents/batch: all in the same second
+        _add(session, f"Bulk {n}", START)
+    asyncio.run(poller.poll(db))
+
+    assert _events() == []
+    assert subscriber.queue.get_nowait() is event_service._RESYNC
+    subscriber.overflowed = False  # As when the stream has sent the resync
+
+    # The burst is covered by the reload, not found again by the overlap
+    for _ in range(3):
+        asyncio.run(poller.poll(db))
+    assert subscriber.queue.empty()
+    assert event_service.broadcaster.resyncs == 1
+
+    later = _add(session, "After", START + timedelta(seconds=1))
+    asyncio.run(poller.poll(db))
+    assert [(event_type, data["id"]) for event_type, data in _events()] == [("incident.created", later.id)]
+
+def test_updates_from_other_processes_keep_their_remarks(session):
+    incident = _add(session, "Flood", START)
+    poller = event_service.ChangePoller()
+    db = _Db(session)
+    asyncio.run(poller.poll(db))
+
+    incident.status = "under_process"
+    incident.admin_remarks = "Crew dispatched"
+    incident.updated_at = START + timedelta(seconds=3)
+    session.commit()
+    asyncio.run(poller.poll(db))
+
+    [(event_type, data)] = _events()
+    assert event_type == "incident.updated"
+    assert (data["status"], data["admin_remarks"]) == ("under_process", "Crew dispatched")
@@ -0,0 +1,71 @@
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+
+from app.db import models
+from app.services import idempotency_service, incident_service
+
+ENDPOINT = "POST /incidents/"
+
+@pytest.fixture
+def db(session_factory):
+    session = session_factory()
+    session.add(models.User(id=1, email="reporter@example.com", password="x"))
+    session.commit()
+    yield session
+    session.close()
+
+def _claim(db):
+    return idempotency_service.claim(db, 1, "upload-1", ENDPOINT)
+
+def _lock_expires(db):
+    db.query(models.IdempotencyKey).update({"locked_until": datetime.utcnow() - timedelta(seconds=1)})
+    db.commit()
+
+def _incident(title):
+    return models.Incident(user_id=1, title=title, description="", status="submitted")
+
+def _taken_over(db):
+    first = _claim(db)
+    first_token = first.claim_token
+    with pytest.raises(HTTPException) as raised:
+        _claim(db)  # In flight
+    assert raised.value.status_code == 409
+    _lock_expires(db)
+    second = _claim(db)
+    assert second.claim_token != first_token
+    # The first request's view of its own claim
+    first = models.IdempotencyKey(id=second.id, claim_token=first_token)
+    return first, second
+
+def test_a_superseded_request_cannot_release_the_retrys_claim(db):
+    first, second = _taken_over(db)
+    idempotency_service.release(db, first)
+
+    with pytest.raises(HTTPException) as raised:
+        _claim(db)  # Still held by the retry, so a third attempt must wait
+    assert raised.value.status_code == 409
+
+    idempotency_service.release(db, second)
+    assert db.query(models.IdempotencyKey).count() == 0
+
+def test_a_superseded_request_cannot_complete_and_inserts_nothing(db):
+    first, second = _taken_over(db)
+    # The slow original finishes first, while the retry is still uploading
+    with pytest.raises(HTTPException) as raised:
+        incident_service.add_incident(db, _incident("Slow original"), (), first)
+    assert raised.value.status_code == 409
+    incident = incident_service.add_incident(db, _incident("Retry"), (), second)
+
+    assert [title for title, in db.query(models.Incident.title)] == ["Retry"]
+    replay = _claim(db)
+    assert replay.incident_id == incident.id
+
+def test_completing_the_current_claim_binds_the_incident(db):
+    record = _claim(db)
+    incident = incident_service.add_incident(db, _incident("Pothole"), (), record)
+
+    replay = _claim(db)
+    assert replay.incident_id == incident.id
+    assert replay.locked_until is None
@@ -0,0 +1,31 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db import models
+from app.db.database import Base
+from app.services import incident_service
+
+@pytest.fixture(params=[True, False], ids=["returning", "no-returning"])
+def db(request):
+    engine = create_engine("sqlite://")
+    # Without RETURNING the MySQL fallback is used
+    engine.dialect.insert_executemany_returning_sort_by_parameter_order = request.param
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+    engine.dispose()
+
+def _rows(user_id, titles):
+    return [{"user_id": user_id, "title": title, "description": "", "status": "submitted"} for title in titles]
+
+def test_insert_incidents_returns_each_rows_id_in_order(db):
+    # Another user's rows in between leave gaps a range query would misread
+    incident_service._insert_incidents(db, _rows(2, ["other"]))
+    ids = incident_service._insert_incidents(db, _rows(1, ["c", "a", "b"]))
+    incident_service._insert_incidents(db, _rows(2, ["later"]))
+    db.commit()
+
+    titles = dict(db.query(models.Incident.id, models.Incident.title))
+    assert [titles[incident_id] for incident_id in ids] == ["c", "a", "b"]
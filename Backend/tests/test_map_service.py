@@ -0,0 +1,84 @@
+import pytest
+
+from app.db import models
+from app.services import map_service
+
+mapbox_vector_tile = pytest.importorskip("mapbox_vector_tile")
+
+def _decode(tile: bytes) -> dict:
+    return mapbox_vector_tile.decode(tile, default_options={"y_coord_down": True})
+
+def test_encoded_tile_decodes_as_a_vector_tile():
+    tile = map_service.encode_tile("incidents", [
+        (10, 20, {"count": 3, "incident_id": None, "status": None}),
+        (4095, 0, {"count": 1, "incident_id": 7, "status": "resolved"}),
+        (-5, 4100, {"count": 1, "incident_id": 300, "status": "resolved"}),  # Buffer around the tile
+    ])
+    layer = _decode(tile)["incidents"]
+
+    assert layer["extent"] == map_service.TILE_EXTENT
+    assert layer["version"] == 2
+    assert [(feature["id"], feature["geometry"]) for feature in layer["features"]] == [
+        (1, {"type": "Point", "coordinates": [10, 20]}),
+        (2, {"type": "Point", "coordinates": [4095, 0]}),
+        (3, {"type": "Point", "coordinates": [-5, 4100]}),
+    ]
+    assert [feature["properties"] for feature in layer["features"]] == [
+        {"count": 3},
+        {"count": 1, "incident_id": 7, "status": "resolved"},
+        {"count": 1, "incident_id": 300, "status": "resolved"},
+    ]
+
+def test_empty_tile_has_no_layers():
+    assert map_service.encode_tile("incidents", []) == b""
+
+def _add(session, latitude, longitude, status="submitted"):
+    incident = models.Incident(
+        user_id=1, title="Report", status=status, latitude=latitude, longitude=longitude,
+        geohash=map_service.encode_geohash(latitude, longitude),
+    )
+    session.add(incident)
+    map_service.touch_incidents(session, [incident])
+    session.commit()
+    return incident
+
+def test_cached_tiles_see_changes_made_by_other_processes(session_factory, monkeypatch):
+    monkeypatch.setattr(map_service, "_tile_cache", map_service.TTLCache(maxsize=100, ttl=3600))
+    session = session_factory()
+    incident = _add(session, 52.52, 13.40)
+    z = 12
+    x, y = map_service.tile_for(52.52, 13.40, z)
+
+    def tile():
+        data, _ = map_service.get_tile(session, z, x, y, ("all",), lambda query: query)
+        return [feature["properties"] for feature in _decode(data)["incidents"]["features"]]
+
+    assert tile() == [{"count": 1, "incident_id": incident.id, "status": "submitted"}]
+
+    # Written through another process: this one's cache was never told
+    other = session_factory()
+    other.query(models.Incident).update({"status": "resolved"})
+    map_service.touch(other, [(52.52, 13.40)])
+    other.commit()
+    assert tile() == [{"count": 1, "incident_id": incident.id, "status": "resolved"}]
+
+    _add(other, 52.5201, 13.4001)
+    assert tile() == [{"count": 2}]
+
+    # A change elsewhere leaves this tile's cached copy in use
+    built = map_service._tile_cache.get((z, x, y, "all"))
+    _add(other, -33.86, 151.21)
+    tile()
+    assert map_service._tile_cache.get((z, x, y, "all")) is built
+    other.close()
+    session.close()
+
+def test_touch_counts_every_change_per_cell(session_factory):
+    session = session_factory()
+    map_service.touch(session, [(52.52, 13.40), (52.5201, 13.4001), (None, None)])
+    map_service.touch(session, [(52.52, 13.40)])
+    session.commit()
+
+    cell = map_service.encode_geohash(52.52, 13.40, map_service.VERSION_PRECISION)
+    assert dict(session.query(models.MapCellVersion.cell, models.MapCellVersion.version)) == {cell: 2}
+    session.close()
@@ -0,0 +1,68 @@
+import hashlib
+import os
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.routers import media_router
+from app.services import media_service
+
+BLOB = bytes(range(256)) * 40  # 10240 bytes
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(media_service, "MEDIA_DIR", str(tmp_path))
+    app = FastAPI()
+    app.include_router(media_router.router)
+    return TestClient(app)
+
+@pytest.fixture
+def url():
+    content_id = hashlib.sha256(BLOB).hexdigest()
+    path = media_service.content_path(content_id)
+    os.makedirs(os.path.dirname(path))
+    with open(path, "wb") as blob:
+        blob.write(BLOB)
+    return media_service.signed_url(content_id, "video/mp4")
+
+def test_whole_file_advertises_ranges(client, url):
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.content == BLOB
+    assert response.headers["accept-ranges"] == "bytes"
+
+def test_range_returns_206_with_content_range(client, url):
+    response = client.get(url, headers={"Range": "bytes=10-19"})
+    assert response.status_code == 206
+    assert response.headers["content-range"] == f"bytes 10-19/{len(BLOB)}"
+    assert response.headers["content-length"] == "10"
+    assert response.headers["content-type"] == "video/mp4"
+    assert response.content == BLOB[10:20]
+
+def test_open_and_suffix_ranges(client, url):
+    response = client.get(url, headers={"Range": "bytes=10000-"})
+    assert response.status_code == 206
+    assert response.headers["content-range"] == f"bytes 10000-{len(BLOB) - 1}/{len(BLOB)}"
+    assert response.content == BLOB[10000:]
+
+    response = client.get(url, headers={"Range": "bytes=-100"})
+    assert response.status_code == 206
+    assert response.headers["content-range"] == f"bytes {len(BLOB) - 100}-{len(BLOB) - 1}/{len(BLOB)}"
+    assert response.content == BLOB[-100:]
+
+def test_range_past_the_end_is_416(client, url):
+    response = client.get(url, headers={"Range": f"bytes={len(BLOB)}-"})
+    assert response.status_code == 416
+    assert response.headers["content-range"] == f"bytes */{len(BLOB)}"
+
+def test_if_range_for_another_version_sends_the_whole_file(client, url):
+    etag = client.get(url).headers["etag"]
+
+    response = client.get(url, headers={"Range": "bytes=0-9", "If-Range": etag})
+    assert response.status_code == 206
+    assert response.content == BLOB[:10]
+
+    response = client.get(url, headers={"Range": "bytes=0-9", "If-Range": '"stale"'})
+    assert response.status_code == 200
+    assert response.content == BLOB
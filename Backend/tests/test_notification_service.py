@@ -0,0 +1,114 @@
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+import fake_push
+from app.core import config
+from app.db import models
+from app.services import notification_service, push_service
+
+@pytest.fixture
+def gateway(monkeypatch):
+    fake_push.FakePushHandler.received = []
+    server = fake_push.serve(0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(config, "PUSH_ENDPOINT_URL", f"http://127.0.0.1:{server.server_address[1]}/send")
+    yield fake_push.FakePushHandler.received
+    server.shutdown()
+    server.server_close()
+
+@pytest.fixture
+def db(session_factory, monkeypatch):
+    monkeypatch.setattr(notification_service, "SessionLocal", session_factory)
+    monkeypatch.setattr(config, "PUSH_COALESCE_SECONDS", 10)
+    session = session_factory()
+    session.add(models.User(id=1, email="reporter@example.com", password="x"))
+    session.add(models.Incident(id=1, user_id=1, title="Broken light", status="submitted"))
+    session.commit()
+    yield session
+    session.close()
+
+def _change_status(db, new_status):
+    incident = db.get(models.Incident, 1)
+    previous, incident.status = incident.status, new_status
+    notification_service.status_changed(db, incident, previous)
+    db.commit()
+
+def _make_due(db):
+    db.query(models.PendingNotification).update({"due_at": datetime.utcnow() - timedelta(seconds=1)})
+    db.commit()
+
+def _pending(db):
+    return db.query(models.PendingNotification).populate_existing().one_or_none()
+
+def _dispatch_jobs(db):
+    return db.query(models.Job).filter(models.Job.job_type == "notifications.dispatch").count()
+
+def test_changes_within_the_window_send_one_push_with_the_latest_status(db, gateway):
+    notification_service.register_device(db, 1, "phone-1", "android")
+    for new_status in ("under_process", "rejected", "resolved"):
+        _change_status(db, new_status)
+
+    pending = _pending(db)
+    assert (pending.from_status, pending.status) == ("submitted", "resolved")
+    assert pending.due_at > datetime.utcnow() + timedelta(seconds=5)
+    assert _dispatch_jobs(db) == 1
+
+    _make_due(db)
+    notification_service.dispatch_notifications({})
+    assert [(message["token"], message["data"]["status"]) for message in gateway] == [("phone-1", "resolved")]
+    assert _pending(db) is None
+
+def test_a_change_undone_within_the_window_sends_nothing(db, gateway):
+    notification_service.register_device(db, 1, "phone-1", "android")
+    _change_status(db, "under_process")
+    _change_status(db, "submitted")
+
+    _make_due(db)
+    notification_service.dispatch_notifications({})
+    assert gateway == []
+    assert _pending(db) is None
+
+def test_retryable_failures_back_off_exponentially(db, gateway, monkeypatch):
+    monkeypatch.setattr(config, "PUSH_RETRY_BASE_DELAY", 30)
+    monkeypatch.setattr(config, "PUSH_MAX_ATTEMPTS", 3)
+    notification_service.register_device(db, 1, "retry-1", "ios")
+    _change_status(db, "resolved")
+
+    for attempt, delay in ((1, 30), (2, 60)):
+        _make_due(db)
+        notification_service.dispatch_notifications({})
+        pending = _pending(db)
+        assert pending.attempts == attempt
+        assert pending.locked_by is None
+        expected = datetime.utcnow() + timedelta(seconds=delay)
+        assert abs((pending.due_at - expected).total_seconds()) < 5
+    assert len(gateway) == 2
+
+    _make_due(db)
+    notification_service.dispatch_notifications({})
+    assert _pending(db) is None  # Given up after PUSH_MAX_ATTEMPTS
+    assert db.query(models.DeviceToken).count() == 1  # A transient failure keeps the token
+
+def test_unregistered_tokens_are_removed(db, gateway):
+    notification_service.register_device(db, 1, "invalid-1", "android")
+    notification_service.register_device(db, 1, "phone-2", "ios")
+    _change_status(db, "resolved")
+
+    _make_due(db)
+    notification_service.dispatch_notifications({})
+    assert sorted(message["token"] for message in gateway) == ["invalid-1", "phone-2"]
+    assert [token for token, in db.query(models.DeviceToken.token)] == ["phone-2"]
+    assert _pending(db) is None  # Delivered to the device that is still registered
+
+def test_only_dead_tokens_count_as_invalid_on_fcm():
+    messaging = pytest.importorskip("firebase_admin.messaging")
+    exceptions = pytest.importorskip("firebase_admin.exceptions")
+
+    assert push_service._firebase_outcome(None) == push_service.SENT
+    assert push_service._firebase_outcome(messaging.UnregisteredError("gone")) == push_service.INVALID
+    assert push_service._firebase_outcome(messaging.SenderIdMismatchError("other sender")) == push_service.INVALID
+    # A malformed message is our fault, not the device's
+    assert push_service._firebase_outcome(exceptions.InvalidArgumentError("bad payload")) == push_service.RETRY
+    assert push_service._firebase_outcome(exceptions.UnavailableError("outage")) == push_service.RETRY
@@ -0,0 +1,151 @@
+import asyncio
+import os
+import threading
+import time
+
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+from app.services import upload_service
+
+MB = 1024 * 1024
+BOUNDARY = "----incident-test-boundary"
+CHUNK = 64 * 1024  # Bytes per ASGI message, as uvicorn hands them over
+
+def _multipart_request(file_size: int, sent: list) -> Request:
+    """
+    A POST carrying a title field and a media_file of file_size bytes. The
+    body is generated as it is read, so the test itself holds one chunk;
+    `sent` collects the number of body bytes handed to the app.
+    """
+    head = (
+        f"--{BOUNDARY}\r\n"
+        'Content-Disposition: form-data; name="title"\r\n\r\n'
+        "Flooded underpass\r\n"
+        f"--{BOUNDARY}\r\n"
+        'Content-Disposition: form-data; name="media_file"; filename="clip.mp4"\r\n'
+        "Content-Type: video/mp4\r\n\r\n"
+    ).encode()
+    tail = f"\r\n--{BOUNDARY}--\r\n".encode()
+    block = b"x" * CHUNK
+
+    def pieces():
+        yield head
+        remaining = file_size
+        while remaining > 0:
+            size = min(CHUNK, remaining)
+            yield block if size == CHUNK else block[:size]
+            remaining -= size
+        yield tail
+
+    body = pieces()
+
+    async def receive():
+        piece = next(body, None)
+        if piece is None:
+            return {"type": "http.request", "body": b"", "more_body": False}
+        sent.append(len(piece))
+        return {"type": "http.request", "body": piece, "more_body": True}
+
+    scope = {
+        "type": "http",
+        "method": "POST",
+        "path": "/incidents/",
+        "headers": [(b"content-type", f"multipart/form-data; boundary={BOUNDARY}".encode())],
+    }
+    return Request(scope, receive)
+
+def _rss() -> int:
+    with open("/proc/self/statm") as statm:
+        return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+def _peak_rss_growth(fn) -> int:
+    """Highest resident set size seen while fn runs, above where it started"""
+    start = _rss()
+    peak = [start]
+    done = threading.Event()
+
+    def sample():
+        while not done.is_set():
+            peak[0] = max(peak[0], _rss())
+            time.sleep(0.002)
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    try:
+        fn()
+    finally:
+        done.set()
+        sampler.join()
+    return max(peak[0], _rss()) - start
+
+def _upload(tmp_path, file_size: int, max_file_size: int = 1024 * MB, sent: list = None):
+    request = _multipart_request(file_size, sent if sent is not None else [])
+    return asyncio.run(upload_service.receive_multipart(
+        request, {"media_file"}, upload_dir=str(tmp_path), max_file_size=max_file_size,
+        chunk_size=CHUNK, max_pending_writes=4,
+    ))
+
+@pytest.mark.skipif(not os.path.exists("/proc/self/statm"), reason="Reads RSS from /proc")
+def test_memory_stays_flat_as_file_size_grows(tmp_path):
+    _upload(tmp_path / "warmup", 4 * MB)  # Imports, thread pool and allocator arenas
+
+    growth = {}
+    for size in (16 * MB, 256 * MB):
+        target = tmp_path / str(size)
+        forms = []
+        growth[size] = _peak_rss_growth(lambda: forms.append(_upload(target, size)))
+        stored = forms[0].first_file("media_file")
+        assert stored.size == size
+        assert os.path.getsize(stored.path) == size
+        assert forms[0].fields["title"] == "Flooded underpass"
+        os.remove(stored.path)
+
+    # Only the chunks in flight are held: 16x the file costs no more memory
+    assert growth[256 * MB] < 16 * MB, growth
+    assert growth[256 * MB] - growth[16 * MB] < 8 * MB, growth
+
+def test_size_cap_rejects_partway_through_the_body(tmp_path):
+    sent = []
+    with pytest.raises(HTTPException) as raised:
+        _upload(tmp_path, 64 * MB, max_file_size=1 * MB, sent=sent)
+
+    assert raised.value.status_code == 413
+    # Stopped just past the cap rather than after reading the whole body
+    assert sum(sent) < 2 * MB
+    assert os.listdir(tmp_path) == []  # The partial file was removed
+
+def _json_request(chunks, content_length=None, read=None):
+    headers = [(b"content-type", b"application/json")]
+    if content_length is not None:
+        headers.append((b"content-length", str(content_length).encode()))
+    pieces = iter(chunks)
+
+    async def receive():
+        piece = next(pieces, None)
+        if piece is None:
+            return {"type": "http.request", "body": b"", "more_body": False}
+        if read is not None:
+            read.append(len(piece))
+        return {"type": "http.request", "body": piece, "more_body": True}
+
+    return Request({"type": "http", "method": "POST", "path": "/incidents/batch", "headers": headers}, receive)
+
+def test_read_body_returns_a_body_within_the_limit():
+    request = _json_request([b"[1, ", b"2]"])
+    assert asyncio.run(upload_service.read_body(request, 16)) == b"[1, 2]"
+
+def test_read_body_rejects_a_declared_length_before_reading():
+    read = []
+    with pytest.raises(HTTPException) as raised:
+        asyncio.run(upload_service.read_body(_json_request([b"x" * CHUNK] * 32, 32 * CHUNK, read), MB))
+    assert raised.value.status_code == 413
+    assert read == []
+
+def test_read_body_stops_once_an_undeclared_body_passes_the_limit():
+    read = []
+    with pytest.raises(HTTPException) as raised:
+        asyncio.run(upload_service.read_body(_json_request([b"x" * CHUNK] * 1024, read=read), MB))
+    assert raised.value.status_code == 413
+    assert sum(read) <= MB + CHUNK
@@ -0,0 +1,147 @@
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+import fake_webhook
+from app.core import config
+from app.db import models, schemas
+from app.services import outbox_service, webhook_service
+
+Receiver = fake_webhook.FakeWebhookHandler
+
+@pytest.fixture
+def db(session_factory, monkeypatch):
+    monkeypatch.setattr(webhook_service, "SessionLocal", session_factory)
+    monkeypatch.setattr(webhook_service, "pool", webhook_service.ConnectionPool(2, 5))
+    monkeypatch.setattr(config, "WEBHOOK_CONCURRENCY", 1)
+    monkeypatch.setattr(config, "WEBHOOK_BATCH_SIZE", 3)
+    session = session_factory()
+    yield session
+    session.close()
+
+@pytest.fixture
+def subscription(db):
+    server = fake_webhook.serve(0)
+    Receiver.received, Receiver.last_id = [], {}
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    subscription = webhook_service.create_subscription(db, schemas.WebhookSubscriptionCreate(
+        name="partner", url=f"http://127.0.0.1:{server.server_address[1]}/hook",
+    ))
+    Receiver.secret = subscription.secret  # Every batch must carry a valid signature
+    yield subscription
+    server.shutdown()
+    server.server_close()
+    Receiver.secret, Receiver.fail_rate, Receiver.reject = None, 0.0, False
+
+@pytest.fixture
+def batches(monkeypatch):
+    """Event ids of each POST, in order"""
+    posted = []
+    post = webhook_service._post
+
+    def recording_post(subscription, events):
+        posted.append([event.id for event in events])
+        return post(subscription, events)
+
+    monkeypatch.setattr(webhook_service, "_post", recording_post)
+    return posted
+
+def _record(db, count):
+    outbox_service.record_many(db, "incident.created", [{"id": n, "title": f"Report {n}"} for n in range(count)])
+    db.commit()
+    return [event_id for event_id, in db.query(models.OutboxEvent.id).order_by(models.OutboxEvent.id)]
+
+def _reload(db, subscription):
+    return webhook_service.get_subscription(db, subscription.id)
+
+def _make_due(db, subscription):
+    db.query(models.WebhookSubscription).filter(models.WebhookSubscription.id == subscription.id).update(
+        {"next_attempt_at": None}
+    )
+    db.commit()
+
+def test_events_arrive_in_order_in_batches(db, subscription, batches):
+    ids = _record(db, 7)
+    webhook_service.deliver_webhooks({})
+
+    assert batches == [ids[0:3], ids[3:6], ids[6:7]]
+    assert [event["id"] for event in Receiver.received] == ids
+    assert Receiver.last_id == {str(subscription.id): ids[-1]}
+    assert _reload(db, subscription).last_event_id == ids[-1]
+
+def test_a_failed_batch_keeps_the_cursor_and_backs_off(db, subscription, batches):
+    ids = _record(db, 2)
+    Receiver.fail_rate = 1.0  # Every batch answered with 503
+    webhook_service.deliver_webhooks({})
+
+    held = _reload(db, subscription)
+    assert held.last_event_id == 0  # Still before the failed batch
+    assert held.attempts == 1
+    assert held.next_attempt_at > datetime.utcnow()
+    assert held.last_error.startswith("HTTP 503")
+    assert held.locked_by is None
+    assert Receiver.received == []
+    assert db.query(models.WebhookDeadLetter).count() == 0
+    # A run is scheduled for when the backoff ends
+    assert db.query(models.Job).filter(models.Job.job_type == "webhooks.deliver", models.Job.status == "queued").count()
+
+    # Not retried before then
+    webhook_service.deliver_webhooks({})
+    assert len(batches) == 1
+
+    Receiver.fail_rate = 0.0
+    _make_due(db, subscription)
+    webhook_service.deliver_webhooks({})
+    assert batches == [ids, ids]  # The same batch again, then caught up
+    assert [event["id"] for event in Receiver.received] == ids
+    assert _reload(db, subscription).attempts == 0
+
+def test_retries_then_dead_letters_on_a_permanent_error(db, subscription, batches):
+    ids = _record(db, 4)
+    Receiver.fail_rate = 1.0
+    webhook_service.deliver_webhooks({})
+    assert _reload(db, subscription).attempts == 1
+
+    Receiver.fail_rate, Receiver.reject = 0.0, True  # Now 400: retrying will not help
+    _make_due(db, subscription)
+    webhook_service.deliver_webhooks({})
+
+    dead = db.query(models.WebhookDeadLetter).order_by(models.WebhookDeadLetter.event_id).all()
+    assert [letter.event_id for letter in dead] == ids
+    assert all(letter.error.startswith("HTTP 400") and letter.attempts == 1 for letter in dead[3:])
+    assert dead[0].attempts == 2  # The batch that was retried first
+    held = _reload(db, subscription)
+    assert held.last_event_id == ids[-1]  # Moved on so later events are not held up
+    assert held.attempts == 0
+    assert batches == [ids[0:3], ids[0:3], ids[3:4]]
+
+def test_an_id_gap_is_held_until_the_gap_timeout(db, subscription, batches, monkeypatch):
+    monkeypatch.setattr(config, "WEBHOOK_GAP_TIMEOUT", 30)
+    now = datetime.utcnow()
+    for event_id in (1, 2, 4):  # 3 may still be in an uncommitted transaction
+        db.add(models.OutboxEvent(id=event_id, event_type="incident.created", incident_id=event_id,
+                                  payload={"id": event_id}, created_at=now))
+    db.commit()
+    webhook_service.deliver_webhooks({})
+
+    held = _reload(db, subscription)
+    assert batches == [[1, 2]]
+    assert held.last_event_id == 2
+    assert 20 < (held.next_attempt_at - now).total_seconds() <= 31
+
+    # Still open: nothing more is sent
+    _make_due(db, subscription)
+    webhook_service.deliver_webhooks({})
+    assert batches == [[1, 2]]
+
+    # 3 never committed; after the timeout 4 goes out
+    db.query(models.OutboxEvent).filter(models.OutboxEvent.id == 4).update(
+        {"created_at": now - timedelta(seconds=31)}
+    )
+    db.commit()
+    _make_due(db, subscription)
+    webhook_service.deliver_webhooks({})
+    assert batches == [[1, 2], [4]]
+    assert [event["id"] for event in Receiver.received] == [1, 2, 4]
+    assert _reload(db, subscription).last_event_id == 4